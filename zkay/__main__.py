@@ -94,6 +94,8 @@ def parse_arguments():
     typecheck_parser = subparsers.add_parser('check', parents=[config_parser], help='Only type-check, do not compile.', formatter_class=ShowSuppressedInHelpFormatter)
     typecheck_parser.add_argument('input', help='The zkay source file', metavar='<zkay_file>').completer = FilesCompleter(zkay_files)
     typecheck_parser.add_argument('--solc-version', help=solc_version_help, metavar='<cfg_val>')
+    msg = 'Also print the estimated size (number of constraints and wires) of all proof circuits, without compiling them.'
+    typecheck_parser.add_argument('--cost', action='store_true', help=msg)
 
     # 'solify' parser
     msg = 'Output solidity code which corresponds to zkay code with all privacy features and comments removed, ' \
@@ -259,11 +261,21 @@ def main():
 
             code = read_file(str(input_path))
             try:
-                get_processed_ast(code)
+                if a.cost:
+                    costs = frontend.estimate_circuit_costs(code)
+                else:
+                    get_processed_ast(code)
             except ZkayCompilerError as e:
                 with fail_print():
                     print(f'{e}')
                 exit(3)
+
+            if a.cost:
+                print(f'\nEstimated circuit sizes (crypto backend: {cfg.crypto_backend}):')
+                width = max([len('Function')] + [len(name) for name in costs])
+                print(f'{"Function":<{width}}  {"Constraints":>12}  {"Wires":>12}')
+                for name, cost in costs.items():
+                    print(f'{name:<{width}}  {cost.constraints:>12}  {cost.wires:>12}')
         elif a.cmd == 'solify':
             was_unit_test = cfg.is_unit_test
             cfg._is_unit_test = True  # Suppress other output
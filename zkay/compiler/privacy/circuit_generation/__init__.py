@@ -6,7 +6,10 @@ Submodules
 ==========
 * :py:mod:`.circuit_helper`:     Helper class to construct high-level abstract proof circuits
 * :py:mod:`.circuit_constraints` Defines the different types of abstract circuit statements
+* :py:mod:`.circuit_optimizer`   Common subexpression and dead code elimination on abstract proof circuits
+* :py:mod:`.circuit_cost`        Static estimation of the number of constraints and wires of proof circuits
 * :py:mod:`.circuit_generator`   Compiles abstract proof circuits generated by circuit_helper into concrete proof circuits and generates verification contracts
+* :py:mod:`.key_store`           Content-addressed store for compiled circuits and snark keys, which is shared among projects
 
 ===========
 Subpackages
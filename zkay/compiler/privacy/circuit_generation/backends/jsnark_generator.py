@@ -1,20 +1,23 @@
 """Circuit Generator implementation for the jsnark backend"""
 
 import os
-from typing import List, Optional, Union, Tuple
+import re
+from typing import List, Optional, Union, Tuple, Dict
 
 import zkay.jsnark_interface.jsnark_interface as jsnark
 import zkay.jsnark_interface.libsnark_interface as libsnark
 from zkay.compiler.privacy.circuit_generation.circuit_constraints import CircComment, CircIndentBlock, \
     CircGuardModification, CircCall, CircSymmEncConstraint
+from zkay.compiler.privacy.circuit_generation.circuit_cost import CircuitCostEstimator
 from zkay.compiler.privacy.circuit_generation.circuit_generator import CircuitGenerator
 from zkay.compiler.privacy.circuit_generation.circuit_helper import CircuitHelper, CircuitStatement, \
     CircVarDecl, CircEqConstraint, CircEncConstraint, HybridArgumentIdf
+from zkay.compiler.privacy.circuit_generation.key_store import KeyStore
 from zkay.compiler.privacy.proving_scheme.backends.gm17 import ProvingSchemeGm17
 from zkay.compiler.privacy.proving_scheme.backends.groth16 import ProvingSchemeGroth16
 from zkay.compiler.privacy.proving_scheme.proving_scheme import VerifyingKey, G2Point, G1Point, ProvingScheme
 from zkay.config import cfg, zk_print
-from zkay.utils.helpers import hash_file, hash_string
+from zkay.utils.helpers import hash_file_cached, hash_string, link_or_copy
 from zkay.zkay_ast.ast import FunctionCallExpr, BuiltinFunction, IdentifierExpr, BooleanLiteralExpr, \
     IndexExpr, NumberLiteralExpr, MemberAccessExpr, TypeName, indent, PrimitiveCastExpr, EnumDefinition, Expression
 from zkay.zkay_ast.visitor.visitor import AstVisitor
@@ -165,36 +168,85 @@ def add_function_circuit_arguments(circuit: CircuitHelper):
     return input_init_stmts
 
 
+_comment_pattern = re.compile(r'//.*$', re.MULTILINE)
+_name_pattern = re.compile(r'"([A-Za-z_]\w*)"|\b_(\w+)(?=\(\))')
+"""Matches names in the generated java code: string literals which are identifiers, and circuit function names"""
+
+
+def _get_canonical_code(code: str) -> str:
+    """
+    Return code without comments and indentation, with all names replaced by canonical names in the order of their first use.
+
+    Circuits whose java code only differs in variable, function or circuit names have the same canonical code.
+    """
+    code = _comment_pattern.sub('', code)
+    code = '\n'.join(line.strip() for line in code.splitlines() if line.strip())
+
+    names: Dict[str, str] = {}
+
+    def rename(m):
+        is_literal = m.group(1) is not None
+        canonical_name = names.setdefault(m.group(1) if is_literal else m.group(2), f'n{len(names)}')
+        return f'"{canonical_name}"' if is_literal else f'_{canonical_name}'
+    return _name_pattern.sub(rename, code)
+
+
 class JsnarkGenerator(CircuitGenerator):
     def __init__(self, circuits: List[CircuitHelper], proving_scheme: ProvingScheme, output_dir: str):
-        super().__init__(circuits, proving_scheme, output_dir, False)
-
-    def _generate_zkcircuit(self, import_keys: bool, circuit: CircuitHelper) -> bool:
+        super().__init__(circuits, proving_scheme, output_dir, True)
+        self.key_store = KeyStore(os.path.join(cfg.data_dir, 'key_store'), cfg.key_store_size_limit) if cfg.key_store else None
+        self._circuit_code: Dict[CircuitHelper, str] = {}
+
+    def _get_circuit_code(self, circuit: CircuitHelper) -> str:
+        """Return the java code of the circuit (cached, the code is needed more than once)."""
+        if circuit not in self._circuit_code:
+            # Generate java code for all functions which are transitively called by the fct corresponding to this circuit
+            # (outside private expressions)
+            fdefs = []
+            for fct in list(circuit.transitively_called_functions.keys()):
+                target_circuit = self.circuits[fct]
+                body_stmts = JsnarkVisitor(target_circuit.phi).visitCircuit()
+
+                body = '\n'.join([f'stepIn("{fct.name}");'] +
+                                 add_function_circuit_arguments(target_circuit) + [''] +
+                                 [stmt for stmt in body_stmts] +
+                                 ['stepOut();'])
+                fdef = f'private void _{fct.name}() {{\n' + indent(body) + '\n}'
+                fdefs.append(f'{fdef}')
+
+            # Generate java code for the function corresponding to this circuit
+            input_init_stmts = add_function_circuit_arguments(circuit)
+            constraints = JsnarkVisitor(circuit.phi).visitCircuit()
+
+            # Inject the function definitions into the java template
+            self._circuit_code[circuit] = jsnark.get_jsnark_circuit_class_str(circuit, fdefs, input_init_stmts + [''] + constraints)
+        return self._circuit_code[circuit]
+
+    def _get_canonical_circuit_digest(self, circuit: CircuitHelper) -> Optional[str]:
+        code = _get_canonical_code(self._get_circuit_code(circuit))
+        return hash_string((jsnark.circuit_builder_jar_hash + code + cfg.proving_scheme).encode('utf-8')).hex()
+
+    def _share_circuit(self, source: CircuitHelper, target: CircuitHelper):
+        source_dir, target_dir = self._get_circuit_output_dir(source), self._get_circuit_output_dir(target)
+        if not os.path.exists(target_dir):
+            os.mkdir(target_dir)
+
+        # The java code of the target does not correspond to the shared circuit files, make sure that the target is
+        # compiled again if it is no longer identical to the source
+        for fname in [f'{cfg.jsnark_circuit_classname}.java', f'{cfg.jsnark_circuit_classname}.hash']:
+            f = os.path.join(target_dir, fname)
+            if os.path.exists(f):
+                os.remove(f)
+        for fname in self._get_key_store_filenames():
+            link_or_copy(os.path.join(source_dir, fname), os.path.join(target_dir, fname))
+
+    def _generate_zkcircuit(self, import_keys: bool, circuit: CircuitHelper, memory_limit: int) -> bool:
         # Create output directory
         output_dir = self._get_circuit_output_dir(circuit)
         if not os.path.exists(output_dir):
             os.mkdir(output_dir)
 
-        # Generate java code for all functions which are transitively called by the fct corresponding to this circuit
-        # (outside private expressions)
-        fdefs = []
-        for fct in list(circuit.transitively_called_functions.keys()):
-            target_circuit = self.circuits[fct]
-            body_stmts = JsnarkVisitor(target_circuit.phi).visitCircuit()
-
-            body = '\n'.join([f'stepIn("{fct.name}");'] +
-                             add_function_circuit_arguments(target_circuit) + [''] +
-                             [stmt for stmt in body_stmts] +
-                             ['stepOut();'])
-            fdef = f'private void _{fct.name}() {{\n' + indent(body) + '\n}'
-            fdefs.append(f'{fdef}')
-
-        # Generate java code for the function corresponding to this circuit
-        input_init_stmts = add_function_circuit_arguments(circuit)
-        constraints = JsnarkVisitor(circuit.phi).visitCircuit()
-
-        # Inject the function definitions into the java template
-        code = jsnark.get_jsnark_circuit_class_str(circuit, fdefs, input_init_stmts + [''] + constraints)
+        code = self._get_circuit_code(circuit)
 
         # Compute combined hash of the current jsnark interface jar and of the contents of the java file
         hashfile = os.path.join(output_dir, f'{cfg.jsnark_circuit_classname}.hash')
@@ -207,12 +259,25 @@ class JsnarkGenerator(CircuitGenerator):
 
         # Invoke jsnark compilation if either the jsnark-wrapper or the current circuit was modified (based on hash comparison)
         if oldhash != digest or not os.path.exists(os.path.join(output_dir, 'circuit.arith')):
+            # Remove old circuit files (they may be linked into the key store, so they must not be overwritten in place)
+            old_files = ['circuit.arith', f'{cfg.jsnark_circuit_classname}.class']
             if not import_keys:
                 # Remove old keys
-                for f in self._get_vk_and_pk_paths(circuit):
-                    if os.path.exists(f):
-                        os.remove(f)
-            jsnark.compile_circuit(output_dir, code)
+                old_files += self.get_vk_and_pk_filenames()
+            for fname in old_files:
+                f = os.path.join(output_dir, fname)
+                if os.path.exists(f):
+                    os.remove(f)
+
+            # Reuse circuit and keys from the key store if the same circuit was already compiled elsewhere
+            if not import_keys and self.key_store is not None and self.key_store.fetch(digest, output_dir, self._get_key_store_filenames()):
+                jsnark.write_circuit_code(output_dir, code)
+                with open(hashfile, 'w') as f:
+                    f.write(digest)
+                zk_print(f'Circuit \'{circuit.get_verification_contract_name()}\' found in key store, skipping compilation')
+                return False
+
+            jsnark.compile_circuit(output_dir, code, memory_limit)
             with open(hashfile, 'w') as f:
                 f.write(digest)
             return True
@@ -223,8 +288,31 @@ class JsnarkGenerator(CircuitGenerator):
     def _generate_keys(self, circuit: CircuitHelper):
         # Invoke the custom libsnark interface to generate keys
         output_dir = self._get_circuit_output_dir(circuit)
+        for f in self._get_vk_and_pk_paths(circuit):
+            # Keys from the key store must not be overwritten in place
+            if os.path.exists(f):
+                os.remove(f)
         libsnark.generate_keys(output_dir, output_dir, self.proving_scheme.name)
 
+        if self.key_store is not None:
+            with open(os.path.join(output_dir, f'{cfg.jsnark_circuit_classname}.hash')) as f:
+                digest = f.read()
+            self.key_store.add(digest, output_dir, self._get_key_store_filenames())
+
+    def _get_key_store_filenames(self) -> Tuple[str, ...]:
+        """Return the names of all files which are required to generate proofs for a compiled circuit."""
+        return ('circuit.arith', f'{cfg.jsnark_circuit_classname}.class') + self.get_vk_and_pk_filenames()
+
+    def _create_cost_estimator(self) -> Optional[CircuitCostEstimator]:
+        return CircuitCostEstimator(self.circuits)
+
+    def _estimate_compilation_memory(self, circuit: CircuitHelper) -> int:
+        constraint_count = self.cost_estimator.estimate(circuit).constraints
+        return jsnark.estimate_compilation_memory(self._get_circuit_output_dir(circuit), constraint_count)
+
+    def _estimate_keygen_memory(self, circuit: CircuitHelper) -> int:
+        return libsnark.estimate_keygen_memory(self._get_circuit_output_dir(circuit))
+
     @classmethod
     def get_vk_and_pk_filenames(cls) -> Tuple[str, ...]:
         return 'verification.key', 'proving.key', 'verification.key.bin'
@@ -257,7 +345,7 @@ class JsnarkGenerator(CircuitGenerator):
             raise NotImplementedError()
 
     def _get_prover_key_hash(self, circuit: CircuitHelper) -> bytes:
-        return hash_file(self._get_vk_and_pk_paths(circuit)[1])
+        return hash_file_cached(self._get_vk_and_pk_paths(circuit)[1])
 
     def _get_primary_inputs(self, circuit: CircuitHelper) -> List[str]:
         # Jsnark requires an additional public input with the value 1 as first input
@@ -0,0 +1,227 @@
+"""
+Static estimation of the size of proof circuits, based on the abstract circuit statements (CircuitHelper.phi).
+
+The estimate models how the jsnark backend translates circuit statements into arithmetic constraints, without running
+jsnark. Typed operations are priced based on their bit decompositions (overflow handling, comparisons, bitwise operations),
+cryptographic gadgets based on the approximate size of the corresponding jsnark gadgets for the configured crypto backend.
+
+The numbers are rough (within a small factor of the real circuit size), they are meant to compare circuits and to make
+scheduling decisions before a circuit is compiled, not to replace the constraint count reported by jsnark.
+"""
+
+from typing import Dict, Tuple, Set, Optional, List
+
+from zkay.compiler.privacy.circuit_generation.circuit_constraints import CircuitStatement, CircIndentBlock, CircCall, \
+    CircVarDecl, CircEqConstraint, CircEncConstraint, CircSymmEncConstraint, CircGuardModification
+from zkay.compiler.privacy.circuit_generation.circuit_helper import CircuitHelper
+from zkay.config import cfg
+from zkay.zkay_ast.ast import Expression, FunctionCallExpr, BuiltinFunction, PrimitiveCastExpr, LiteralExpr, TypeName, \
+    ConstructorOrFunctionDefinition
+
+SHA256_BLOCK_CONSTRAINTS = 25600
+"""Approximate number of constraints of a single SHA256 compression (512 bit block)"""
+
+EC_SCALAR_MUL_CONSTRAINTS = 4000
+"""Approximate number of constraints of a scalar multiplication on the embedded elliptic curve (incl. scalar decomposition)"""
+
+asymmetric_enc_constraints = {
+    'dummy': 0,
+    'rsa-pkcs1.5': 92000,  # 2048 bit modular exponentiation with e = 65537
+    'rsa-oaep': 297000,  # modular exponentiation + 8 SHA256 blocks for the OAEP mask generation
+}
+"""Approximate number of constraints of a single encryption gadget for each asymmetric crypto backend"""
+
+block_cipher_constraints = {
+    'ecdh-aes': (14500, 2500),
+    'ecdh-chaskey': (4200, 0),
+}
+"""Approximate number of constraints (per 128 bit block, per key preparation) of the block cipher of each symmetric crypto backend"""
+
+
+class CircuitCost:
+    """Estimated number of constraints and wires (variables) of a circuit."""
+
+    def __init__(self, constraints: int = 0, wires: int = 0):
+        self.constraints = constraints
+        self.wires = wires
+
+    def __iadd__(self, other: 'CircuitCost'):
+        self.constraints += other.constraints
+        self.wires += other.wires
+        return self
+
+    def __add__(self, other: 'CircuitCost') -> 'CircuitCost':
+        return CircuitCost(self.constraints + other.constraints, self.wires + other.wires)
+
+    def __eq__(self, other):
+        return isinstance(other, CircuitCost) and (self.constraints, self.wires) == (other.constraints, other.wires)
+
+    def __repr__(self):
+        return f'CircuitCost(constraints={self.constraints}, wires={self.wires})'
+
+
+def _bitwidth(t: Optional[TypeName]) -> int:
+    try:
+        return 256 if t is None else t.elem_bitwidth
+    except NotImplementedError:
+        return 256
+
+
+def _expr_bitwidth(expr: Expression) -> int:
+    return _bitwidth(None if expr.annotated_type is None else expr.annotated_type.type_name)
+
+
+def _split_cost(bits: int) -> int:
+    """Number of constraints required to decompose a value into bits (values >= 2^253 require a full field decomposition)."""
+    return min(bits, 253) + 1
+
+
+class CircuitCostEstimator:
+    """
+    Estimates the size of compiled circuits without compiling them.
+
+    Most gadgets introduce one new wire per constraint (bit decompositions, products), so the wire count is estimated
+    as the number of constraints plus the number of circuit IO wires.
+    """
+
+    def __init__(self, circuits: Dict[ConstructorOrFunctionDefinition, CircuitHelper]):
+        """
+        :param circuits: circuit helpers of all functions, required to include the statements of called functions
+        """
+        self.circuits = circuits
+        self._cache: Dict[CircuitHelper, CircuitCost] = {}
+
+        self._shared_keys: Set[str] = set()
+        """Names of the public keys for which a shared key was already derived in the current circuit"""
+
+        self._guard_depth = 0
+
+    def estimate(self, circuit: CircuitHelper) -> CircuitCost:
+        """Return the estimated size of the complete circuit for circuit.fct (including called functions and input hashing)."""
+        if circuit not in self._cache:
+            self._shared_keys, self._guard_depth = set(), 0
+            cost = self._estimate_function(circuit)
+
+            # Public inputs and outputs, and the constant one wire
+            pub_count = circuit.in_size_trans + circuit.out_size_trans
+            cost.wires += pub_count + 1
+            if cfg.should_use_hash(circuit):
+                # All public IO values become private inputs, which are hashed in 256 bit chunks
+                blocks = (pub_count * 32 + 9 + 63) // 64
+                cost.constraints += blocks * SHA256_BLOCK_CONSTRAINTS + pub_count * _split_cost(256)
+                cost.wires += 1
+
+            if self._shared_keys:
+                # Derivation of the own public key from the secret key
+                cost.constraints += EC_SCALAR_MUL_CONSTRAINTS
+            cost.wires += cost.constraints
+            self._cache[circuit] = cost
+        return self._cache[circuit]
+
+    def _estimate_function(self, circuit: CircuitHelper) -> CircuitCost:
+        """Return the cost of the statements and private inputs of a single (possibly called) function."""
+        cost = CircuitCost()
+        for idf in circuit.sec_idfs:
+            cost.wires += idf.t.size_in_uints
+            bits = _bitwidth(idf.t) if idf.t.size_in_uints == 1 else 256
+            if bits < 256:
+                # Private inputs of bounded types are range checked
+                cost.constraints += _split_cost(bits)
+        self._estimate_statements(circuit.phi, cost)
+        return cost
+
+    def _estimate_statements(self, stmts: List[CircuitStatement], cost: CircuitCost):
+        for stmt in stmts:
+            if isinstance(stmt, CircIndentBlock):
+                self._estimate_statements(stmt.statements, cost)
+            else:
+                cost += self._estimate_statement(stmt)
+
+    def _estimate_statement(self, stmt: CircuitStatement) -> CircuitCost:
+        if isinstance(stmt, CircVarDecl):
+            return CircuitCost(self._estimate_expr(stmt.expr)[0])
+        elif isinstance(stmt, CircEqConstraint):
+            return CircuitCost(stmt.tgt.t.size_in_uints)
+        elif isinstance(stmt, CircEncConstraint):
+            return CircuitCost(asymmetric_enc_constraints[cfg.crypto_backend] + cfg.cipher_len)
+        elif isinstance(stmt, CircSymmEncConstraint):
+            constraints = 0
+            if stmt.other_pk.name not in self._shared_keys:
+                # Shared keys are derived once per key (ECDH + SHA256 based key derivation)
+                self._shared_keys.add(stmt.other_pk.name)
+                constraints += EC_SCALAR_MUL_CONSTRAINTS + SHA256_BLOCK_CONSTRAINTS
+            per_block, key_preparation = block_cipher_constraints[cfg.crypto_backend]
+            cipher_bits = cfg.cipher_bytes_payload * 8
+            blocks = (cipher_bits - 128) // 128
+            # Block cipher (CBC mode) + decomposition of plaintext, iv and ciphertext + equality check
+            constraints += key_preparation + blocks * per_block + _split_cost(256) + cipher_bits + cfg.cipher_len
+            return CircuitCost(constraints)
+        elif isinstance(stmt, CircGuardModification):
+            if stmt.new_cond is None:
+                self._guard_depth -= 1
+                return CircuitCost()
+            self._guard_depth += 1
+            # Nested guard conditions are combined with the enclosing condition
+            return CircuitCost(1 if self._guard_depth > 1 else 0)
+        elif isinstance(stmt, CircCall):
+            # The called function is included again for every call
+            return self._estimate_function(self.circuits[stmt.fct])
+        else:
+            return CircuitCost()
+
+    def _estimate_expr(self, expr: Expression) -> Tuple[int, bool]:
+        """Return the number of constraints required to evaluate expr, and whether expr is a constant."""
+        if isinstance(expr, LiteralExpr):
+            return 0, True
+        elif isinstance(expr, PrimitiveCastExpr):
+            constraints, is_const = self._estimate_expr(expr.expr)
+            return constraints + (0 if is_const else self._cast_cost(expr.expr, expr.elem_type)), is_const
+        elif isinstance(expr, FunctionCallExpr):
+            args = [self._estimate_expr(arg) for arg in expr.args]
+            constraints = sum(c for c, _ in args)
+            const_args = [is_const for _, is_const in args]
+            if all(const_args):
+                # Constant expressions are evaluated by jsnark at compile time
+                return constraints, True
+            if isinstance(expr.func, BuiltinFunction):
+                constraints += self._op_cost(expr.func.op, expr, const_args)
+            else:
+                # Enum to uint cast
+                constraints += self._cast_cost(expr.args[0], TypeName.uint_type())
+            return constraints, False
+        else:
+            # Variable
+            return 0, False
+
+    @staticmethod
+    def _cast_cost(expr: Expression, t: TypeName) -> int:
+        from_type = expr.annotated_type.type_name
+        from_bits, to_bits = _expr_bitwidth(expr), _bitwidth(t)
+        if from_bits <= to_bits and not from_type.is_signed_numeric:
+            return 0
+        # Truncation and sign extension require a bit decomposition of the source value
+        return _split_cost(from_bits)
+
+    @staticmethod
+    def _op_cost(op: str, expr: FunctionCallExpr, const_args) -> int:
+        """Return the number of constraints of a single typed jsnark operation."""
+        bits = max(_expr_bitwidth(arg) for arg in expr.args) if op not in ['ite', '&&', '||', '!'] else 1
+        bounded = bits < 256
+        if op in ['parenthesis', '!', 'sign+']:
+            return 0
+        elif op in ['ite', '&&', '||', '==', '!=']:
+            return 1 if op in ['ite', '&&', '||'] else 2
+        elif op in ['+', '-', 'sign-']:
+            # Result is reduced modulo 2^bits (uint256 arithmetic is done modulo the field prime)
+            return _split_cost(bits + 1) if bounded else 0
+        elif op == '*':
+            mul = 0 if any(const_args) else 1
+            return mul + (_split_cost(2 * bits) if bounded else 0)
+        elif op in ['<', '<=', '>', '>=']:
+            return _split_cost(bits + 1)
+        elif op in ['&', '|', '^']:
+            return sum(_split_cost(bits) for is_const in const_args if not is_const) + min(bits, 253)
+        elif op in ['~', '<<', '>>']:
+            return _split_cost(bits)
+        else:
+            raise ValueError(f'Unsupported operation {op} inside circuit')
@@ -1,12 +1,16 @@
 import functools
 import os
+import threading
 from abc import ABCMeta, abstractmethod
-from multiprocessing import Pool, Value
-from typing import List, Tuple
+from typing import List, Tuple, Optional, Dict
 
+from zkay import my_logging
+from zkay.compiler.privacy.circuit_generation.circuit_cost import CircuitCost, CircuitCostEstimator
 from zkay.compiler.privacy.circuit_generation.circuit_helper import CircuitHelper
+from zkay.compiler.privacy.circuit_generation.circuit_optimizer import optimize_circuit, CircuitOptimizationStats
 from zkay.compiler.privacy.proving_scheme.proving_scheme import ProvingScheme, VerifyingKey
 from zkay.config import cfg, zk_print
+from zkay.utils.job_scheduler import MemoryAwareScheduler, Job
 from zkay.utils.progress_printer import print_step
 from zkay.utils.timer import time_measure
 
@@ -26,7 +30,7 @@ class CircuitGenerator(metaclass=ABCMeta):
         :param circuits: list which contains the corresponding circuit helper for every function in the contract which requires verification
         :param proving_scheme: the proving scheme instance to be used for verification contract generation
         :param output_dir: base directory where the zkay compilation output is located
-        :param parallel_keygen: if true, multiple python processes are used to generate keys in parallel
+        :param parallel_keygen: if true, keys for multiple circuits may be generated in parallel (within cfg.circuit_compilation_memory_limit)
         """
 
         self.circuits = {circ.fct: circ for circ in circuits}
@@ -35,6 +39,16 @@ class CircuitGenerator(metaclass=ABCMeta):
         self.output_dir = output_dir
         self.parallel_keygen = parallel_keygen
         self.p_count = min(os.cpu_count(), len(self.circuits_to_prove))
+        self.cost_estimator = self._create_cost_estimator()
+        self._circuits_prepared = False
+        self._shared_circuits: Optional[Dict[CircuitHelper, CircuitHelper]] = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # A backend which deduplicates circuits must also be able to share them
+        if cls._get_canonical_circuit_digest is not CircuitGenerator._get_canonical_circuit_digest \
+                and cls._share_circuit is CircuitGenerator._share_circuit:
+            raise TypeError(f'{cls.__name__} overrides _get_canonical_circuit_digest but does not implement _share_circuit')
 
     def generate_circuits(self, *, import_keys: bool):
         """
@@ -44,37 +58,52 @@ class CircuitGenerator(metaclass=ABCMeta):
                             are expected to be already present in the respective output directories
         """
         # Generate proof circuit code
+        self.prepare_circuits()
 
-        # Compile circuits
+        # Compile circuits and generate keys. Keys for a circuit are generated as soon as it is compiled, such that
+        # key generation for one circuit can overlap with compilation of another one.
         c_count = len(self.circuits_to_prove)
         zk_print(f'Compiling {c_count} circuits...')
+        if not import_keys:
+            zk_print(f'Generating keys for {c_count} circuits...')
 
-        gen_circs = functools.partial(self._generate_zkcircuit, import_keys)
-        with time_measure('circuit_compilation', True):
-            if cfg.is_unit_test:
-                modified = list(map(gen_circs, self.circuits_to_prove))
-            else:
-                with Pool(processes=self.p_count) as pool:
-                    modified = pool.map(gen_circs, self.circuits_to_prove)
+        scheduler = MemoryAwareScheduler(1 if cfg.is_unit_test else self.p_count, cfg.circuit_compilation_memory_limit)
+        keygen_count = [0]
+        keygen_lock = threading.Lock()
+        prev_keygen_job = None
+        shared_circuits = {} if import_keys else self.get_shared_circuits()
+        final_jobs = {}
+        for circ in self.circuits_to_prove:
+            name = circ.get_verification_contract_name()
+
+            # Circuits which are identical up to naming are only compiled and keyed once
+            rep = shared_circuits.get(circ, circ)
+            if rep is not circ:
+                zk_print(f'Circuit \'{name}\' is identical to \'{rep.get_verification_contract_name()}\', sharing circuit and keys')
+                scheduler.add_job(f'share {name}', functools.partial(self._share_circuit, rep, circ), 0, [final_jobs[rep]])
+                continue
+
+            compile_job = scheduler.add_job(f'compile {name}', functools.partial(self._generate_zkcircuit, import_keys, circ),
+                                            functools.partial(self._estimate_compilation_memory, circ), pass_memory=True,
+                                            retry_memory=cfg.circuit_compilation_memory_limit)
+            if not import_keys:
+                needs_keys = functools.partial(self._needs_new_keys, compile_job, circ)
+                dependencies = [compile_job]
+                if not self.parallel_keygen and prev_keygen_job is not None:
+                    dependencies.append(prev_keygen_job)
+                prev_keygen_job = scheduler.add_job(f'keygen {name}',
+                                                    functools.partial(self._generate_keys_if_needed, needs_keys, circ, keygen_lock, keygen_count, c_count),
+                                                    lambda needs_keys=needs_keys, circ=circ: self._estimate_keygen_memory(circ) if needs_keys() else 0,
+                                                    dependencies)
+                final_jobs[circ] = prev_keygen_job
+
+        with time_measure('circuit_compilation_and_key_generation', True):
+            scheduler.run()
 
         if import_keys:
             for path in self.get_all_key_paths():
                 if not os.path.exists(path):
                     raise RuntimeError("Zkay contract import failed: Missing keys")
-        else:
-            modified_circuits_to_prove = [circ for t, circ in zip(modified, self.circuits_to_prove)
-                                          if t or not all(map(os.path.exists, self._get_vk_and_pk_paths(circ)))]
-
-            # Generate keys in parallel
-            zk_print(f'Generating keys for {c_count} circuits...')
-            with time_measure('key_generation', True):
-                if self.parallel_keygen and not cfg.is_unit_test:
-                    counter = Value('i', 0)
-                    with Pool(processes=self.p_count, initializer=self.__init_worker, initargs=(counter, c_count,)) as pool:
-                        pool.map(self._generate_keys_par, modified_circuits_to_prove)
-                else:
-                    for circ in modified_circuits_to_prove:
-                        self._generate_keys(circ)
 
         with print_step('Write verification contracts'):
             for circuit in self.circuits_to_prove:
@@ -84,6 +113,68 @@ class CircuitGenerator(metaclass=ABCMeta):
                     primary_inputs = self._get_primary_inputs(circuit)
                     f.write(self.proving_scheme.generate_verification_contract(vk, circuit, primary_inputs, pk_hash))
 
+    def get_shared_circuits(self) -> Dict[CircuitHelper, CircuitHelper]:
+        """
+        Return a dict which maps every circuit that is identical up to naming to an earlier circuit (its representative).
+
+        A shared circuit is only compiled and keyed for its representative, and it is verified by the deployed verification
+        contract of the representative (see Manifest.shared_verifiers).
+        """
+        if self._shared_circuits is None:
+            self.prepare_circuits()
+            representatives = {}
+            self._shared_circuits = {}
+            for circ in self.circuits_to_prove:
+                digest = self._get_canonical_circuit_digest(circ)
+                rep = circ if digest is None else representatives.setdefault(digest, circ)
+                if rep is not circ:
+                    self._shared_circuits[circ] = rep
+        return self._shared_circuits
+
+    def prepare_circuits(self):
+        """Apply backend independent transformations (optimizations) to the abstract circuits, only the first call has an effect."""
+        if self._circuits_prepared:
+            return
+        self._circuits_prepared = True
+        if cfg.opt_simplify_circuits:
+            self._optimize_circuits()
+
+    def estimate_circuit_costs(self) -> Dict[CircuitHelper, CircuitCost]:
+        """
+        Return the estimated size of all circuits which require a proof, without compiling them.
+
+        The circuits are prepared in the same way as in generate_circuits.
+        """
+        if self.cost_estimator is None:
+            raise NotImplementedError('Circuit cost estimation is not supported by this backend')
+        self.prepare_circuits()
+        return {circuit: self.cost_estimator.estimate(circuit) for circuit in self.circuits_to_prove}
+
+    def _optimize_circuits(self):
+        """Optimize the abstract circuits of all functions in place and log how many statements were folded or removed."""
+        constraints_before = self._estimate_total_constraints()
+        stats = CircuitOptimizationStats()
+        for circuit in self.circuits.values():
+            stats += optimize_circuit(circuit.phi)
+        my_logging.data('circuit_opt_folded_constants', stats.folded_constants)
+        my_logging.data('circuit_opt_common_subexpressions', stats.common_subexpressions)
+        my_logging.data('circuit_opt_removed_constraints', stats.duplicate_constraints)
+        my_logging.data('circuit_opt_removed_dead_statements', stats.dead_statements)
+
+        if self.cost_estimator is not None:
+            # The estimator caches the costs of the unoptimized circuits
+            self.cost_estimator = self._create_cost_estimator()
+            my_logging.data('circuit_opt_estimated_constraint_reduction', constraints_before - self._estimate_total_constraints())
+
+    def _create_cost_estimator(self) -> Optional[CircuitCostEstimator]:
+        """Return a circuit cost estimator for this backend (None if not supported), see estimate_circuit_costs."""
+        return None
+
+    def _estimate_total_constraints(self) -> Optional[int]:
+        if self.cost_estimator is None:
+            return None
+        return sum(self.cost_estimator.estimate(circuit).constraints for circuit in self.circuits_to_prove)
+
     def get_all_key_paths(self) -> List[str]:
         """Return paths of all key files for this contract."""
         paths = []
@@ -95,20 +186,18 @@ class CircuitGenerator(metaclass=ABCMeta):
         """Return file paths for all verification contracts generated by this CircuitGenerator"""
         return [os.path.join(self.output_dir, circuit.verifier_contract_filename) for circuit in self.circuits_to_prove]
 
-    @staticmethod
-    def __init_worker(counter, total_count):
-        global finish_counter
-        global c_count
+    def _needs_new_keys(self, compile_job: Job, circuit: CircuitHelper) -> bool:
+        """Return true if the circuit was modified by compile_job or if any of its key files is missing."""
+        return compile_job.result or not all(map(os.path.exists, self._get_vk_and_pk_paths(circuit)))
 
-        finish_counter = counter
-        c_count = total_count
-
-    def _generate_keys_par(self, circuit: CircuitHelper):
+    def _generate_keys_if_needed(self, needs_keys, circuit: CircuitHelper, lock: threading.Lock, counter: List[int], total_count: int):
+        if not needs_keys():
+            return
         self._generate_keys(circuit)
-        with finish_counter.get_lock():
-            finish_counter.value += 1
+        with lock:
+            counter[0] += 1
             zk_print(f'Generated keys for circuit '
-                  f'\'{circuit.verifier_contract_type.code()}\' [{finish_counter.value}/{c_count}]')
+                     f'\'{circuit.verifier_contract_type.code()}\' [{counter[0]}/{total_count}]')
 
     def _get_circuit_output_dir(self, circuit: CircuitHelper):
         """Return the output directory for an individual circuit"""
@@ -120,7 +209,7 @@ class CircuitGenerator(metaclass=ABCMeta):
         return tuple(os.path.join(output_dir, fname) for fname in self.get_vk_and_pk_filenames())
 
     @abstractmethod
-    def _generate_zkcircuit(self, import_keys: bool, circuit: CircuitHelper) -> bool:
+    def _generate_zkcircuit(self, import_keys: bool, circuit: CircuitHelper, memory_limit: int) -> bool:
         """
         Generate code and compile a single circuit.
 
@@ -134,6 +223,10 @@ class CircuitGenerator(metaclass=ABCMeta):
 
         It should be stored in self._get_circuit_output_dir(circuit)
 
+        :param memory_limit: memory (in MiB) which the scheduler reserved for the compilation (see _estimate_compilation_memory),
+                             as other compilations may run in parallel. Compilation must not use more memory than that.
+                             If it fails because the estimate was too low, it is called once more with the whole
+                             cfg.circuit_compilation_memory_limit reserved (while no other job is running)
         :return: True if the circuit was modified since last generation (need to generate new keys)
         """
         pass
@@ -143,6 +236,31 @@ class CircuitGenerator(metaclass=ABCMeta):
         """Generate prover and verification keys for the circuit stored in self._get_circuit_output_dir(circuit)."""
         pass
 
+    def _get_canonical_circuit_digest(self, circuit: CircuitHelper) -> Optional[str]:
+        """
+        Return a digest which is the same for all circuits that are identical up to naming (None: no deduplication).
+
+        All circuits of the contract with the same digest share the compiled circuit and keys of the first one, a backend
+        which overrides this must also implement _share_circuit (checked when the backend class is defined).
+        """
+        return None
+
+    def _share_circuit(self, source: CircuitHelper, target: CircuitHelper):
+        """Make the compiled circuit and keys of source (already generated) available in the output directory of target."""
+        pass
+
+    def _estimate_compilation_memory(self, circuit: CircuitHelper) -> int:
+        """
+        Return an estimate of the peak memory consumption (in MiB) of self._generate_zkcircuit(circuit).
+
+        Used to decide how many circuits are compiled in parallel, the default estimate of 0 only limits the number of workers.
+        """
+        return 0
+
+    def _estimate_keygen_memory(self, circuit: CircuitHelper) -> int:
+        """Return an estimate of the peak memory consumption (in MiB) of self._generate_keys(circuit) (called after compilation)."""
+        return 0
+
     @classmethod
     @abstractmethod
     def get_vk_and_pk_filenames(cls) -> Tuple[str, ...]:
@@ -0,0 +1,389 @@
+"""
+Optimization pass over abstract proof circuits (CircuitHelper.phi), which runs before backend code generation.
+
+The pass exploits that abstract circuits are in SSA form and that CircVarDecl statements are pure (guards only affect
+assertions, conditional assignments are explicit ite expressions):
+
+* Constant folding: A CircVarDecl whose value can be computed at compile time (boolean operations, comparisons and
+  wrapping arithmetic on unsigned integers narrower than 256 bits) is replaced by a constant, and ite expressions with a
+  constant condition are replaced by the selected branch. uint256 arithmetic (modulo the field prime) and signed
+  arithmetic are not folded.
+* Common subexpression elimination: A CircVarDecl whose expression was already computed by an earlier CircVarDecl is
+  replaced by a copy of the earlier variable. Constants are handled the same way.
+* Copy propagation: Copies are resolved when comparing expressions and substituted in constraints and guard conditions.
+* Duplicate constraint removal: An equality or encryption constraint which was already asserted is removed.
+* Dead code elimination: CircVarDecls whose variable never reaches a constraint, a guard condition or a call are removed,
+  as are guard scopes which no longer contain any live statement.
+
+Reusing a result (or constraint) from an earlier statement is only allowed if the earlier statement was in the same
+guard scope or in an enclosing scope, since the backend may weaken assertions inside guarded scopes.
+"""
+
+from typing import List, Dict, Tuple, Optional, Set, Hashable, Union
+
+from zkay.compiler.privacy.circuit_generation.circuit_constraints import CircuitStatement, CircComment, CircIndentBlock, \
+    CircVarDecl, CircGuardModification, CircEqConstraint, CircEncConstraint, CircSymmEncConstraint
+from zkay.zkay_ast.ast import Expression, IdentifierExpr, MemberAccessExpr, NumberLiteralExpr, BooleanLiteralExpr, \
+    FunctionCallExpr, BuiltinFunction, PrimitiveCastExpr, EnumDefinition, HybridArgumentIdf, TypeName
+
+GuardStack = Tuple[Tuple[str, bool], ...]
+
+
+class CircuitOptimizationStats:
+    """Number of statements which were removed or simplified by optimize_circuit."""
+
+    def __init__(self):
+        self.folded_constants = 0
+        self.common_subexpressions = 0
+        self.duplicate_constraints = 0
+        self.dead_statements = 0
+
+    def __iadd__(self, other: 'CircuitOptimizationStats'):
+        self.folded_constants += other.folded_constants
+        self.common_subexpressions += other.common_subexpressions
+        self.duplicate_constraints += other.duplicate_constraints
+        self.dead_statements += other.dead_statements
+        return self
+
+
+def optimize_circuit(phi: List[CircuitStatement]) -> CircuitOptimizationStats:
+    """
+    Optimize the abstract circuit phi in place.
+
+    Circuit IO is not modified, only temporary circuit variables and redundant constraints are removed.
+
+    :param phi: circuit statements of a single circuit (not including the statements of called functions)
+    :return: statistics about the applied optimizations
+    """
+    stats = CircuitOptimizationStats()
+    replacements = _SubexpressionEliminator(stats).run(_flatten(phi))
+    phi[:] = _rebuild(phi, replacements)
+    replacements = _eliminate_dead_code(_flatten(phi), stats)
+    phi[:] = _rebuild(phi, replacements)
+    return stats
+
+
+def _flatten(stmts: List[CircuitStatement]) -> List[CircuitStatement]:
+    """Return all statements in stmts (and nested CircIndentBlocks) which are not CircIndentBlocks, in order."""
+    leaves = []
+    for stmt in stmts:
+        if isinstance(stmt, CircIndentBlock):
+            leaves += _flatten(stmt.statements)
+        else:
+            leaves.append(stmt)
+    return leaves
+
+
+def _only_comments(stmts: List[CircuitStatement]) -> bool:
+    return all(isinstance(stmt, CircComment) for stmt in _flatten(stmts))
+
+
+def _rebuild(stmts: List[CircuitStatement], replacements: Dict[int, Optional[CircuitStatement]]) -> List[CircuitStatement]:
+    """
+    Return stmts with replacements applied (maps id(stmt) -> new statement or None to remove it).
+
+    Blocks which only contain comments after removing statements are removed entirely.
+    """
+    new_stmts = []
+    for stmt in stmts:
+        if isinstance(stmt, CircIndentBlock):
+            had_code = not _only_comments(stmt.statements)
+            stmt.statements = _rebuild(stmt.statements, replacements)
+            if had_code and _only_comments(stmt.statements):
+                continue
+            new_stmts.append(stmt)
+        elif id(stmt) in replacements:
+            if replacements[id(stmt)] is not None:
+                new_stmts.append(replacements[id(stmt)])
+        else:
+            new_stmts.append(stmt)
+    return new_stmts
+
+
+def _type_key(t: Optional[TypeName]) -> Hashable:
+    """Return the properties of t which are relevant for circuit evaluation."""
+    if t is None:
+        return None
+    try:
+        return t.elem_bitwidth, t.is_signed_numeric
+    except NotImplementedError:
+        return None
+
+
+def _get_used_names(expr: Expression) -> Set[str]:
+    """Return the names of all circuit variables which are read by expr."""
+    if isinstance(expr, IdentifierExpr):
+        return {expr.idf.name}
+    elif isinstance(expr, MemberAccessExpr) and isinstance(expr.member, HybridArgumentIdf):
+        return {expr.member.name}
+    names = set()
+    for child in expr.children():
+        if isinstance(child, Expression):
+            names |= _get_used_names(child)
+    return names
+
+
+def _get_constraint_idfs(stmt: CircuitStatement) -> List[HybridArgumentIdf]:
+    """Return the circuit variables referenced by a constraint statement."""
+    if isinstance(stmt, CircEqConstraint):
+        return [stmt.tgt, stmt.val]
+    elif isinstance(stmt, CircEncConstraint):
+        return [stmt.plain, stmt.rnd, stmt.pk, stmt.cipher]
+    elif isinstance(stmt, CircSymmEncConstraint):
+        return [stmt.plain, stmt.other_pk, stmt.iv_cipher]
+    else:
+        return []
+
+
+def _is_small_uint(t: Optional[TypeName]) -> bool:
+    """Return true if t is an unsigned integer type whose circuit arithmetic wraps around (i.e. not uint256)."""
+    return t is not None and t.is_numeric and not t.is_literal and not t.signed and t.elem_bitwidth < 256
+
+
+def _is_foldable_type(t: Optional[TypeName]) -> bool:
+    return t is not None and (t.is_boolean or _is_small_uint(t))
+
+
+Constant = Union[bool, int]
+
+_comparison_ops = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '>': lambda a, b: a > b,
+    '<=': lambda a, b: a <= b,
+    '>=': lambda a, b: a >= b,
+}
+
+_arithmetic_ops = {
+    '+': lambda a, b: a + b,
+    '-': lambda a, b: a - b,
+    '*': lambda a, b: a * b,
+    '&': lambda a, b: a & b,
+    '|': lambda a, b: a | b,
+    '^': lambda a, b: a ^ b,
+}
+
+
+class _SubexpressionEliminator:
+    def __init__(self, stats: CircuitOptimizationStats):
+        self.stats = stats
+
+        self.copy_of: Dict[str, HybridArgumentIdf] = {}
+        """Maps the name of a variable which is a copy of another variable to the original variable"""
+
+        self.constants: Dict[str, Constant] = {}
+        """Maps the names of variables whose value is known at compile time to their value"""
+
+        self.available: Dict[Hashable, List[Tuple[GuardStack, HybridArgumentIdf]]] = {}
+        """Maps expression keys to the variables which hold the expression value, and the guard scope of their declaration"""
+
+        self.asserted: Dict[Hashable, List[GuardStack]] = {}
+        """Maps constraint keys to the guard scopes in which they were asserted"""
+
+        self.guards: List[Tuple[str, bool]] = []
+
+    def run(self, leaves: List[CircuitStatement]) -> Dict[int, Optional[CircuitStatement]]:
+        replacements = {}
+        for stmt in leaves:
+            new_stmt = self.visit(stmt)
+            if new_stmt is not stmt:
+                replacements[id(stmt)] = new_stmt
+        return replacements
+
+    def resolve(self, idf: HybridArgumentIdf) -> HybridArgumentIdf:
+        return self.copy_of.get(idf.name, idf)
+
+    def is_available(self, scopes: List[GuardStack]) -> bool:
+        """Return true if any of the given guard scopes is the current scope or encloses it."""
+        guards = tuple(self.guards)
+        return any(guards[:len(scope)] == scope for scope in scopes)
+
+    def visit(self, stmt: CircuitStatement) -> Optional[CircuitStatement]:
+        if isinstance(stmt, CircGuardModification):
+            if stmt.new_cond is None:
+                self.guards.pop()
+                return stmt
+            cond = self.resolve(stmt.new_cond)
+            self.guards.append((cond.name, stmt.is_true))
+            return stmt if cond is stmt.new_cond else CircGuardModification(cond, stmt.is_true)
+        elif isinstance(stmt, CircVarDecl):
+            return self.visit_var_decl(stmt)
+        elif isinstance(stmt, (CircEqConstraint, CircEncConstraint, CircSymmEncConstraint)):
+            return self.visit_constraint(stmt)
+        return stmt
+
+    def visit_var_decl(self, stmt: CircVarDecl) -> CircuitStatement:
+        if isinstance(stmt.expr, IdentifierExpr) and isinstance(stmt.expr.idf, HybridArgumentIdf):
+            # Copy of another variable
+            original = self.resolve(stmt.expr.idf)
+            if _type_key(original.t) == _type_key(stmt.lhs.t):
+                self.copy_of[stmt.lhs.name] = original
+            return stmt
+
+        folded = self.fold(stmt)
+        if folded is not stmt:
+            self.stats.folded_constants += 1
+            # The replacement may itself be a copy or a common subexpression
+            new_stmt = self.visit_var_decl(folded)
+            return folded if new_stmt is folded else new_stmt
+
+        key = self.get_expr_key(stmt.expr)
+        if key is None:
+            return stmt
+        key = (key, _type_key(stmt.lhs.t))
+        for scope, idf in self.available.get(key, []):
+            if self.is_available([scope]):
+                self.copy_of[stmt.lhs.name] = idf
+                self.stats.common_subexpressions += 1
+                return CircVarDecl(stmt.lhs, idf.get_idf_expr())
+        self.available.setdefault(key, []).append((tuple(self.guards), stmt.lhs))
+        return stmt
+
+    def fold(self, stmt: CircVarDecl) -> CircVarDecl:
+        """Record the value of stmt.lhs if it is a constant and return stmt with a folded expression (if possible)."""
+        expr = stmt.expr
+        if isinstance(expr, FunctionCallExpr) and isinstance(expr.func, BuiltinFunction) and expr.func.op == 'ite':
+            cond = self.get_constant(expr.args[0])
+            if isinstance(cond, bool):
+                return CircVarDecl(stmt.lhs, expr.args[1] if cond else expr.args[2])
+
+        value = self.get_constant(expr)
+        if value is None or not _is_foldable_type(stmt.lhs.t) or isinstance(value, bool) != stmt.lhs.t.is_boolean:
+            return stmt
+        self.constants[stmt.lhs.name] = value
+        if not isinstance(expr, FunctionCallExpr):
+            # Already a constant
+            return stmt
+        if isinstance(value, bool):
+            return CircVarDecl(stmt.lhs, BooleanLiteralExpr(value))
+        return CircVarDecl(stmt.lhs, PrimitiveCastExpr(stmt.lhs.t, NumberLiteralExpr(value), is_implicit=True).as_type(stmt.lhs.t))
+
+    def get_constant(self, expr: Expression) -> Optional[Constant]:
+        """Return the value of expr if it is known at compile time and expr only involves foldable types, otherwise None."""
+        if isinstance(expr, BooleanLiteralExpr):
+            return expr.value
+        elif isinstance(expr, NumberLiteralExpr):
+            return expr.value if expr.value >= 0 else None
+        elif isinstance(expr, IdentifierExpr) and isinstance(expr.idf, HybridArgumentIdf):
+            idf = self.resolve(expr.idf)
+            return self.constants.get(idf.name) if _is_foldable_type(idf.t) else None
+        elif isinstance(expr, PrimitiveCastExpr):
+            value = self.get_constant(expr.expr)
+            if value is None or isinstance(value, bool) or not _is_small_uint(expr.elem_type):
+                return None
+            return value % (1 << expr.elem_type.elem_bitwidth)
+        elif isinstance(expr, FunctionCallExpr) and isinstance(expr.func, BuiltinFunction):
+            args = [self.get_constant(arg) for arg in expr.args]
+            if any(arg is None for arg in args):
+                return None
+            return self.fold_op(expr, args)
+        return None
+
+    @staticmethod
+    def fold_op(expr: FunctionCallExpr, args: List[Constant]) -> Optional[Constant]:
+        op = expr.func.op
+        bools = all(isinstance(arg, bool) for arg in args)
+        ints = not any(isinstance(arg, bool) for arg in args)
+        if op == 'parenthesis':
+            return args[0]
+        elif op == 'ite':
+            return args[1] if args[0] else args[2]
+        elif op == '!' and bools:
+            return not args[0]
+        elif op == '&&' and bools:
+            return args[0] and args[1]
+        elif op == '||' and bools:
+            return args[0] or args[1]
+        elif op in ['==', '!='] and (bools or ints):
+            return _comparison_ops[op](*args)
+        elif op in _comparison_ops and ints:
+            return _comparison_ops[op](*args)
+        elif op in _arithmetic_ops and ints:
+            t = None if expr.annotated_type is None else expr.annotated_type.type_name
+            if not _is_small_uint(t):
+                return None
+            return _arithmetic_ops[op](*args) % (1 << t.elem_bitwidth)
+        return None
+
+    def visit_constraint(self, stmt: CircuitStatement) -> Optional[CircuitStatement]:
+        idfs = _get_constraint_idfs(stmt)
+        resolved = [self.resolve(idf) for idf in idfs]
+        key = (type(stmt), getattr(stmt, 'is_dec', None), tuple(idf.name for idf in resolved))
+        if self.is_available(self.asserted.get(key, [])):
+            self.stats.duplicate_constraints += 1
+            return None
+        self.asserted.setdefault(key, []).append(tuple(self.guards))
+
+        if all(new is old for new, old in zip(resolved, idfs)):
+            return stmt
+        if isinstance(stmt, CircEqConstraint):
+            return CircEqConstraint(*resolved)
+        elif isinstance(stmt, CircEncConstraint):
+            return CircEncConstraint(*resolved, stmt.is_dec)
+        else:
+            return CircSymmEncConstraint(*resolved, stmt.is_dec)
+
+    def get_expr_key(self, expr: Expression) -> Hashable:
+        """Return a key which is equal for expressions which compute the same value (None if not supported)."""
+        if isinstance(expr, IdentifierExpr) and isinstance(expr.idf, HybridArgumentIdf):
+            return 'var', self.resolve(expr.idf).name
+        elif isinstance(expr, MemberAccessExpr) and isinstance(expr.member, HybridArgumentIdf):
+            return 'var', self.resolve(expr.member).name
+        elif isinstance(expr, BooleanLiteralExpr):
+            return 'bool', expr.value
+        elif isinstance(expr, NumberLiteralExpr):
+            return 'num', expr.value, _type_key(expr.annotated_type.type_name)
+        elif isinstance(expr, PrimitiveCastExpr):
+            inner = self.get_expr_key(expr.expr)
+            return None if inner is None else ('cast', _type_key(expr.elem_type), inner)
+        elif isinstance(expr, FunctionCallExpr):
+            args = [self.get_expr_key(arg) for arg in expr.args]
+            if any(arg is None for arg in args):
+                return None
+            t = None if expr.annotated_type is None else _type_key(expr.annotated_type.type_name)
+            if isinstance(expr.func, BuiltinFunction):
+                return ('op', expr.func.op, t, *args)
+            elif expr.is_cast and isinstance(expr.func.target, EnumDefinition):
+                return ('enum_cast', t, *args)
+        return None
+
+
+def _eliminate_dead_code(leaves: List[CircuitStatement], stats: CircuitOptimizationStats) -> Dict[int, Optional[CircuitStatement]]:
+    """Return replacements which remove all statements that do not contribute to any constraint."""
+    removed: Dict[int, Optional[CircuitStatement]] = {}
+    live: Set[str] = set()
+
+    # One entry per enclosing guard scope: [scope contains live statements, corresponding CircGuardModification(None)]
+    scopes: List[list] = []
+
+    def mark_live(names: Set[str]):
+        live.update(names)
+        if scopes:
+            scopes[-1][0] = True
+
+    for stmt in reversed(leaves):
+        if isinstance(stmt, CircComment):
+            continue
+        elif isinstance(stmt, CircGuardModification):
+            if stmt.new_cond is None:
+                scopes.append([False, stmt])
+            elif scopes:
+                has_live, end_stmt = scopes.pop()
+                if has_live:
+                    mark_live({stmt.new_cond.name})
+                else:
+                    removed[id(stmt)] = removed[id(end_stmt)] = None
+                    stats.dead_statements += 2
+            else:
+                mark_live({stmt.new_cond.name})
+        elif isinstance(stmt, CircVarDecl):
+            if stmt.lhs.name in live:
+                mark_live(_get_used_names(stmt.expr))
+            else:
+                removed[id(stmt)] = None
+                stats.dead_statements += 1
+        else:
+            # Constraints and calls
+            mark_live({idf.name for idf in _get_constraint_idfs(stmt)})
+    return removed
@@ -0,0 +1,121 @@
+"""
+Content-addressed store for compiled circuits and their snark keys, which is shared among all zkay projects.
+
+Every entry is a directory named after the digest of the circuit, which contains the circuit files and keys. Files are
+hard-linked into the output directories of the projects (copied if hard links are not supported). Since an entry shares
+its files with the projects, the files must never be modified in place, circuit generators remove (unlink) the files of a
+circuit before they are regenerated.
+
+The store may be used by several zkay processes at the same time. Entries are only ever published and removed via
+atomic directory renames, so readers either see a complete entry or none at all.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+from typing import Iterable, List, Tuple
+
+from zkay.utils.helpers import link_or_copy
+
+
+class KeyStore:
+    def __init__(self, store_dir: str, size_limit: int):
+        """
+        Create a handle for the key store in store_dir.
+
+        :param store_dir: store location (created on first use)
+        :param size_limit: maximum total size of all entries in MiB
+        """
+        self.store_dir = store_dir
+        self.size_limit = size_limit
+
+    def get_entry_dir(self, digest: str) -> str:
+        """Return the directory of the entry for digest."""
+        return os.path.join(self.store_dir, digest)
+
+    def fetch(self, digest: str, output_dir: str, filenames: Iterable[str]) -> bool:
+        """
+        Link the files of the entry for digest into output_dir.
+
+        :param digest: circuit digest
+        :param output_dir: directory into which the files are linked (existing files are replaced)
+        :param filenames: names of the files to link
+        :return: True if the entry was found, otherwise output_dir is not modified
+        """
+        entry_dir = self.get_entry_dir(digest)
+        links: List[Tuple[str, str]] = []
+        try:
+            for fname in filenames:
+                tmp = os.path.join(output_dir, f'.{fname}.{os.getpid()}.{threading.get_ident()}')
+                link_or_copy(os.path.join(entry_dir, fname), tmp)
+                links.append((tmp, os.path.join(output_dir, fname)))
+
+            # Mark as recently used
+            os.utime(entry_dir)
+        except OSError:
+            # Entry missing or incomplete (or evicted concurrently)
+            for tmp, _ in links:
+                os.remove(tmp)
+            return False
+
+        for tmp, dst in links:
+            os.replace(tmp, dst)
+        return True
+
+    def add(self, digest: str, output_dir: str, filenames: Iterable[str]):
+        """
+        Store the files from output_dir as entry for digest and evict least recently used entries if the store is too large.
+
+        The files in output_dir are linked into the store, to regenerate them they have to be removed first.
+        Errors are ignored, the store is only a cache.
+        """
+        entry_dir = self.get_entry_dir(digest)
+        if os.path.exists(entry_dir):
+            return
+        try:
+            os.makedirs(self.store_dir, exist_ok=True)
+            tmp_dir = tempfile.mkdtemp(dir=self.store_dir, prefix='.tmp')
+        except OSError:
+            return
+
+        try:
+            for fname in filenames:
+                link_or_copy(os.path.join(output_dir, fname), os.path.join(tmp_dir, fname))
+
+            # Fails if another process stored the same circuit in the meantime
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self.evict(keep=digest)
+
+    def evict(self, keep: str = None):
+        """Remove least recently used entries (except keep) until the store is within its size limit."""
+        entries = []
+        total_size = 0
+        try:
+            for entry in os.scandir(self.store_dir):
+                if entry.name.startswith('.') or not entry.is_dir():
+                    continue
+                size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                entries.append((entry.stat().st_mtime, entry.name, size))
+                total_size += size
+        except OSError:
+            return
+
+        for _, name, size in sorted(entries):
+            if total_size <= self.size_limit << 20:
+                break
+            if name == keep:
+                continue
+            # Rename first, such that no other process can see a partially removed entry
+            trash_dir = os.path.join(self.store_dir, f'.del{name}.{os.getpid()}.{threading.get_ident()}')
+            try:
+                os.rename(self.get_entry_dir(name), trash_dir)
+            except OSError:
+                # Already evicted by another process
+                pass
+            else:
+                shutil.rmtree(trash_dir, ignore_errors=True)
+            total_size -= size
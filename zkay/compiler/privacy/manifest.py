@@ -1,9 +1,10 @@
 import json
 import os
 from contextlib import contextmanager
-from typing import ContextManager
+from typing import ContextManager, List, Dict, Optional
 
 from zkay.config import cfg
+from zkay.utils.helpers import hash_string
 from zkay.utils.progress_printer import warn_print
 
 
@@ -12,6 +13,9 @@ class Manifest:
     zkay_version = 'zkay-version'
     solc_version = 'solc-version'
     zkay_options = 'zkay-options'
+    contract_hash = 'contract-hash'
+    verifier_names = 'verifier-names'
+    shared_verifiers = 'shared-verifiers'
 
     @staticmethod
     def load(project_dir):
@@ -20,6 +24,52 @@ class Manifest:
             j = json.loads(f.read())
         return j
 
+    @staticmethod
+    def get_contract_hash(code: str) -> str:
+        """Return the hash of the zkay code, which identifies the contract.zkay file a manifest was generated for."""
+        return hash_string(code.encode('utf-8')).hex()
+
+    @staticmethod
+    def get_verifier_names(project_dir) -> List[str]:
+        """
+        Return the names of the verification contracts required by the zkay contract located in project_dir.
+
+        The names are read from the manifest, unless the manifest is missing or was generated for a different contract.zkay file.
+        In that case, they are determined by analyzing the zkay code.
+        """
+        with open(os.path.join(project_dir, 'contract.zkay')) as f:
+            code = f.read()
+        manifest = Manifest._load_if_current(project_dir, code)
+        if manifest is not None and Manifest.verifier_names in manifest:
+            return manifest[Manifest.verifier_names]
+
+        from zkay.zkay_ast.process_ast import get_verification_contract_names
+        return get_verification_contract_names(code)
+
+    @staticmethod
+    def get_shared_verifiers(project_dir) -> Dict[str, str]:
+        """
+        Return a dict which maps the name of every verification contract, whose circuit is identical to the one of another
+        verification contract, to the name of the latter (only the latter is deployed and used for proof generation).
+
+        The dict is empty if the manifest is missing or was generated for a different contract.zkay file.
+        """
+        zkay_filename = os.path.join(project_dir, 'contract.zkay')
+        if not os.path.exists(zkay_filename):
+            return {}
+        with open(zkay_filename) as f:
+            code = f.read()
+        manifest = Manifest._load_if_current(project_dir, code)
+        return {} if manifest is None else manifest.get(Manifest.shared_verifiers, {})
+
+    @staticmethod
+    def _load_if_current(project_dir, code: str) -> Optional[Dict]:
+        if os.path.exists(os.path.join(project_dir, 'manifest.json')):
+            manifest = Manifest.load(project_dir)
+            if manifest.get(Manifest.contract_hash) == Manifest.get_contract_hash(code):
+                return manifest
+        return None
+
     @staticmethod
     def import_manifest_config(manifest):
         # Check if zkay version matches
@@ -14,7 +14,7 @@ from zkay.zkay_ast.ast import ContractDefinition, SourceUnit, ConstructorOrFunct
     CircuitComputationStatement, VariableDeclaration, Block, KeyLiteralExpr, VariableDeclarationStatement, LocationExpr, \
     PrimitiveCastExpr, EnumDefinition, EnumTypeName, UintTypeName, \
     StatementList, StructDefinition, NumberTypeName, EnterPrivateKeyStatement, ArrayLiteralExpr, NumberLiteralExpr, \
-    BoolTypeName
+    BoolTypeName, BooleanLiteralExpr, Mapping
 from zkay.zkay_ast.visitor.python_visitor import PythonCodeVisitor
 
 
@@ -50,6 +50,7 @@ class PythonOffchainVisitor(PythonCodeVisitor):
     transformed transaction (encrypted arguments, additional circuit output and proof arguments added).
     If a require statement fails during simulation, a RequireException is raised.
     When a state variable is read before it is written in a transaction, its initial value is pulled from the blockchain.
+    State locations which are statically known to be read by a function are requested in a single batch at function entry.
     Required foreign public keys are also downloaded from the PKI contract on the block chain.
 
     The main function simply loads the zkay configuration from the circuit's manifest, generates encryption keys if necessary
@@ -420,6 +421,13 @@ class PythonOffchainVisitor(PythonCodeVisitor):
         if serialize_str:
             serialize_str = f'\n# Serialize circuit outputs and/or secret circuit inputs\n' + serialize_str.lstrip()
 
+        # Request all state locations, which are known to be read by this function, from the chain at once
+        prefetch_str = ''
+        if not ast.is_constructor:
+            prefetch_locs = self.get_prefetch_locations(ast)
+            if len(prefetch_locs) > 1:
+                prefetch_str = f'# Prefetch state\nself.state.prefetch({", ".join(prefetch_locs)})'
+
         body_code = '\n'.join(dedent(s) for s in [
             f'\n## BEGIN Simulate body',
             body_str,
@@ -474,6 +482,7 @@ class PythonOffchainVisitor(PythonCodeVisitor):
             f'assert not {IS_EXTERNAL_CALL}' if not ast.can_be_external else None,
             dedent(preamble_str),
             pre_body_code,
+            prefetch_str,
             body_code,
             post_body_code
         ] if s)
@@ -487,6 +496,43 @@ class PythonOffchainVisitor(PythonCodeVisitor):
             func_ctx_params.append(f'name={fname}')
         return f'with self._function_ctx({", ".join(func_ctx_params)}) as {IS_EXTERNAL_CALL}:\n' + indent(code)
 
+    def get_prefetch_locations(self, ast: ConstructorOrFunctionDefinition) -> List[str]:
+        """
+        Return the state locations which are read by ast (or its callees) and which can already be determined at function entry.
+
+        These are primitive state variables and mapping entries whose key is a parameter of ast, me or a literal.
+
+        :param ast: the function
+        :return: list of python tuple expressions (state variable name and index key values) in a deterministic order
+        """
+        params = {id(p): self.visit(p.idf) for p in self.current_params}
+        state_vars = {sv.idf.name for sv in ast.parent.state_variable_declarations
+                      if isinstance(sv, StateVariableDeclaration) and not self.is_special_var(sv.idf)}
+        locs = set()
+        for val in ast.read_values:
+            if not isinstance(val.target, StateVariableDeclaration) or val.target.idf.name not in state_vars:
+                continue
+            t = val.target.annotated_type.type_name
+            name = f'"{val.target.idf.name}"'
+            if val.key is None:
+                if not isinstance(t, (Mapping, Array)) or isinstance(t, CipherText):
+                    locs.add(f'({name}, )')
+            elif isinstance(t, Mapping):
+                value_t = t.value_type.type_name
+                if isinstance(value_t, (Mapping, Array)) and not isinstance(value_t, CipherText):
+                    continue
+                if isinstance(val.key, MeExpr):
+                    key = 'msg.sender'
+                elif isinstance(val.key, IdentifierExpr) and id(val.key.target) in params:
+                    # Keys which refer to parameters of a callee are unknown at function entry
+                    key = params[id(val.key.target)]
+                elif isinstance(val.key, (NumberLiteralExpr, BooleanLiteralExpr)):
+                    key = self.visit(val.key)
+                else:
+                    continue
+                locs.add(f'({name}, {key})')
+        return sorted(locs)
+
     def visitStatementList(self, ast: StatementList):
         if ast.excluded_from_simulation:
             return None
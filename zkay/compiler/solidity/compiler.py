@@ -1,14 +1,19 @@
+import hashlib
 import json
 import os
 import pathlib
+import re
 import tempfile
+import threading
+from collections import OrderedDict
 # get relevant paths
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, Tuple, List
 
 from solcx import compile_standard
 from solcx.exceptions import SolcError
 
 from zkay.config import zk_print, cfg
+from zkay.utils.helpers import evict_lru_files
 from zkay.zkay_ast.ast import get_code_error_msg
 
 
@@ -17,6 +22,123 @@ class SolcException(Exception):
     pass
 
 
+_import_pattern = re.compile(r'^\s*import\s+(?:[^;]*?\bfrom\s+)?["\']([^"\']+)["\']', re.MULTILINE)
+
+_solc_cache: 'OrderedDict[str, str]' = OrderedDict()
+"""Maps solc cache key -> serialized compiler output, in least recently used order"""
+
+_solc_cache_lock = threading.Lock()
+
+_solc_memory_cache_entries = 32
+"""Maximum number of compiler outputs which are kept in memory"""
+
+
+def _get_solc_cache_key(json_in: Dict, cwd: pathlib.Path) -> Optional[str]:
+    """
+    Return a hash of everything which determines the output of solc for the given standard json input.
+
+    This includes the solc version, the json input and the contents of all source files and (transitively) imported
+    files, resolved the same way as solc does when running in cwd. The locations of the files are not part of the key.
+
+    :return: the key or None if a source file cannot be read
+    """
+    digest = hashlib.sha256()
+    key_in = dict(json_in, sources=sorted(json_in['sources']))
+    digest.update(f'{cfg.solc_version}\0{json.dumps(key_in, sort_keys=True)}\0'.encode())
+
+    todo = [(name, pathlib.Path(url)) for name, source in sorted(json_in['sources'].items()) for url in source['urls']]
+    seen = set()
+    while todo:
+        unit_name, path = todo.pop()
+        if unit_name in seen:
+            continue
+        seen.add(unit_name)
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except OSError:
+            return None
+        digest.update(f'{unit_name}\0{len(content)}\0'.encode())
+        digest.update(content)
+
+        for imp in _import_pattern.findall(content.decode(errors='replace')):
+            if imp.startswith('.'):
+                imp = os.path.normpath(os.path.join(os.path.dirname(unit_name), imp))
+            todo.append((imp, cwd / imp))
+    return digest.hexdigest()
+
+
+def _compile_standard_cached(json_in: Dict, cwd: pathlib.Path) -> Dict:
+    """
+    Run solc on json_in in working directory cwd, reusing the output of a previous run with the same input if possible.
+
+    If cfg.solc_cache is enabled, outputs are cached in memory and in cfg.data_dir (both with least recently used
+    eviction). Failed compilations are not cached.
+    """
+    key = _get_solc_cache_key(json_in, cwd) if cfg.solc_cache else None
+    if key is None:
+        return _compile_standard(json_in, cwd)
+
+    cache_dir = os.path.join(cfg.data_dir, 'solc_cache')
+    cache_file = os.path.join(cache_dir, f'{key}.json')
+    out = _get_cached_output(key, cache_file)
+    if out is not None:
+        return json.loads(out)
+
+    ret = _compile_standard(json_in, cwd)
+    out = json.dumps(ret)
+    _put_cached_output(key, out)
+    tmp_file = f'{cache_file}.{os.getpid()}.{threading.get_ident()}'
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(tmp_file, 'w') as f:
+            f.write(out)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        # Disk cache is optional (e.g. read-only data directory)
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    else:
+        evict_lru_files(cache_dir, '.json', cfg.solc_cache_size_limit, keep=cache_file)
+    return ret
+
+
+def _get_cached_output(key: str, cache_file: str) -> Optional[str]:
+    with _solc_cache_lock:
+        if key in _solc_cache:
+            _solc_cache.move_to_end(key)
+            return _solc_cache[key]
+
+    try:
+        with open(cache_file) as f:
+            out = f.read()
+        json.loads(out)
+        # Mark as recently used
+        os.utime(cache_file)
+    except (OSError, ValueError):
+        # Missing or corrupt cache file (replaced by caller)
+        return None
+    _put_cached_output(key, out)
+    return out
+
+
+def _put_cached_output(key: str, out: str):
+    with _solc_cache_lock:
+        _solc_cache[key] = out
+        _solc_cache.move_to_end(key)
+        while len(_solc_cache) > _solc_memory_cache_entries:
+            _solc_cache.popitem(last=False)
+
+
+def _compile_standard(json_in: Dict, cwd: pathlib.Path) -> Dict:
+    # Imports are resolved relative to the solc base path instead of the working directory of the process.
+    # Source urls are passed relative to the base path, since old solc versions prepend it also to absolute paths.
+    sources = {name: dict(source, urls=[os.path.relpath(url, cwd) for url in source['urls']])
+               for name, source in json_in['sources'].items()}
+    allow_paths = sorted({str(cwd)} | {os.path.dirname(url) for source in json_in['sources'].values() for url in source['urls']})
+    return compile_standard(dict(json_in, sources=sources), base_path=str(cwd), allow_paths=allow_paths)
+
+
 def compile_solidity_json(sol_filename: str, libs: Optional[Dict[str, str]] = None, optimizer_runs: int = -1,
                           output_selection: Tuple = ('metadata', 'evm.bytecode', 'evm.deployedBytecode'),
                           cwd: str = None) -> Dict:
@@ -30,7 +152,26 @@ def compile_solidity_json(sol_filename: str, libs: Optional[Dict[str, str]] = No
     :param cwd: working directory
     :return: dictionary with the compilation results according to output_selection
     """
-    solp = pathlib.Path(sol_filename)
+    return compile_solidity_files_json([sol_filename], libs, optimizer_runs, output_selection, cwd)
+
+
+def compile_solidity_files_json(sol_filenames: List[str], libs: Optional[Dict[str, str]] = None, optimizer_runs: int = -1,
+                                output_selection: Tuple = ('metadata', 'evm.bytecode', 'evm.deployedBytecode'),
+                                cwd: str = None) -> Dict:
+    """
+    Compile multiple solidity files in a single solc job (files which are imported by several of them are only compiled once).
+
+    The results for file f are stored under the file name of f (without directory) in the output.
+
+    :param sol_filenames: paths to solidity files, file names must be unique
+    :param libs: [OPTIONAL] dictionary containing <LibraryContractName, LibraryContractAddress> pairs, used for linking all files
+    :param optimizer_runs: controls the optimize-runs flag, negative values disable the optimizer
+    :param output_selection: determines which fields are included in the compiler output dict
+    :param cwd: working directory (default: directory of the first file)
+    :return: dictionary with the compilation results according to output_selection
+    """
+    solps = [pathlib.Path(sol_filename) for sol_filename in sol_filenames]
+    assert len({solp.name for solp in solps}) == len(solps), 'Solidity file names must be unique'
     json_in = {
         'language': 'Solidity',
         'sources': {
@@ -38,7 +179,7 @@ def compile_solidity_json(sol_filename: str, libs: Optional[Dict[str, str]] = No
                 'urls': [
                     str(solp.absolute())
                 ]
-            }
+            } for solp in solps
         },
         'settings': {
             'outputSelection': {
@@ -55,16 +196,12 @@ def compile_solidity_json(sol_filename: str, libs: Optional[Dict[str, str]] = No
 
     if libs is not None:
         json_in['settings']['libraries'] = {
-            solp.name: libs
+            solp.name: libs for solp in solps
         }
 
     if cwd is None:
-        cwd = solp.absolute().parent
-    old_cwd = os.getcwd()
-    os.chdir(cwd)
-    ret = compile_standard(json_in, allow_paths='.')
-    os.chdir(old_cwd)
-    return ret
+        cwd = solps[0].absolute().parent
+    return _compile_standard_cached(json_in, pathlib.Path(cwd).absolute())
 
 
 def _get_line_col(code: str, idx: int):
@@ -136,6 +273,26 @@ def check_compilation(filename: str, show_errors: bool = False, display_code: st
             raise SolcException(fatal_error_report)
 
 
+def check_compilation_of_files(filenames: List[str]):
+    """
+    Run the given files through solc in a single job without output to check for compiler errors.
+
+    :param filenames: files to dry-compile (in the same directory)
+    :raise SolcException: raised if solc reports a compiler error in any of the files
+    """
+    try:
+        compile_solidity_files_json(filenames, None, -1, ())
+    except SolcError as e:
+        try:
+            errors = json.loads(e.stdout_data)['errors']
+        except (TypeError, ValueError, KeyError):
+            # solc did not produce json output
+            raise SolcException(str(e))
+        errors = sorted((error for error in errors if error['severity'] == 'error'),
+                        key=lambda error: (error.get('sourceLocation', {}).get('file', ''), get_error_order_key(error)))
+        raise SolcException('\n'.join(error.get('formattedMessage', error['message']) for error in errors))
+
+
 def check_for_zkay_solc_errors(zkay_code: str, fake_solidity_code: str):
     """
     Run fake solidity code (stripped privacy features) through solc and report errors in the context of the original zkay code.
@@ -146,11 +303,12 @@ def check_for_zkay_solc_errors(zkay_code: str, fake_solidity_code: str):
     :param fake_solidity_code: Corresponding "fake solidity code"
     """
 
-    # dump fake solidity code into temporary file
-    with tempfile.NamedTemporaryFile('w', suffix='.sol') as f:
-        f.write(fake_solidity_code)
-        f.flush()
-        check_compilation(f.name, True, display_code=zkay_code)
+    # dump fake solidity code into temporary file (with a fixed name, such that solc outputs can be cached)
+    with tempfile.TemporaryDirectory() as d:
+        filename = os.path.join(d, 'fake_solidity_code.sol')
+        with open(filename, 'w') as f:
+            f.write(fake_solidity_code)
+        check_compilation(filename, True, display_code=zkay_code)
 
 
 def compile_solidity_code(code: str, working_directory: Optional[str] = None, optimizer_runs=cfg.opt_solc_optimizer_runs) -> Dict:
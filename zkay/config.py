@@ -31,8 +31,10 @@ class Config(UserConfig):
         self._options_with_effect_on_circuit_output = [
             'proving_scheme', 'snark_backend', 'crypto_backend',
             'opt_solc_optimizer_runs', 'opt_hash_threshold',
-            'opt_eval_constexpr_in_circuit', 'opt_cache_circuit_inputs', 'opt_cache_circuit_outputs',
+            'opt_eval_constexpr_in_circuit', 'opt_cache_circuit_inputs', 'opt_cache_circuit_outputs', 'opt_simplify_circuits',
         ]
+        self._legacy_compiler_settings = {'opt_simplify_circuits': False}
+        """Values of options which are missing in the settings of older manifests (i.e. behavior before they were introduced)"""
 
         self._is_unit_test = False
         self._concrete_solc_version = None
@@ -79,6 +81,9 @@ class Config(UserConfig):
             if k not in self._options_with_effect_on_circuit_output:
                 raise KeyError(f'vals contains unknown option "{k}"')
             setattr(self, k, vals[k])
+        for k, v in self._legacy_compiler_settings.items():
+            if k not in vals:
+                setattr(self, k, v)
 
     @contextmanager
     def library_compilation_environment(self) -> ContextManager:
@@ -40,6 +40,10 @@ class UserConfig:
         self._crypto_backend: str = 'ecdh-aes'
         self._crypto_backend_values = ['dummy', 'rsa-pkcs1.5', 'rsa-oaep', 'ecdh-aes', 'ecdh-chaskey']
 
+        self._ecdh_engine: str = 'jsnark'
+        self._ecdh_engine_values = ['jsnark', 'python']
+        self._ecdh_key_cache_size: int = 256
+
         self._blockchain_backend: str = 'w3-eth-tester'
         self._blockchain_backend_values = ['w3-eth-tester', 'w3-ganache', 'w3-ipc', 'w3-websocket', 'w3-http', 'w3-custom']
 
@@ -47,18 +51,31 @@ class UserConfig:
         self._blockchain_pki_address: str = ''
         self._blockchain_crypto_lib_addresses: str = ''
         self._blockchain_default_account: Union[int, str, None] = 0
+        self._blockchain_state_cache: bool = False
+        self._blockchain_request_workers: int = 8
 
         self._indentation: str = ' ' * 4
+        self._jsnark_prover_idle_timeout: int = 300
+        self._proof_generation_workers: int = 1
+        self._proof_generation_memory_limit: int = 16384
         self._libsnark_check_verify_locally_during_proof_generation: bool = False
+        self._circuit_compilation_memory_limit: int = 16384
 
         self._opt_solc_optimizer_runs: int = 50
         self._opt_hash_threshold: int = 1
         self._opt_eval_constexpr_in_circuit: bool = True
         self._opt_cache_circuit_inputs: bool = True
         self._opt_cache_circuit_outputs: bool = True
+        self._opt_simplify_circuits: bool = True
 
         self._data_dir: str = self._appdirs.user_data_dir
         self._log_dir: str = self._appdirs.user_log_dir
+        self._parse_cache: bool = True
+        self._parse_cache_size_limit: int = 256
+        self._solc_cache: bool = True
+        self._solc_cache_size_limit: int = 256
+        self._key_store: bool = True
+        self._key_store_size_limit: int = 16384
         self._use_circuit_cache_during_testing_with_encryption: bool = True
         self._verbosity: int = 1
 
@@ -104,6 +121,40 @@ class UserConfig:
         _check_is_one_of(val, self._crypto_backend_values)
         self._crypto_backend = val
 
+    @property
+    def ecdh_engine(self) -> str:
+        """
+        Implementation of the ecdh key derivation used by the ecdh-aes and ecdh-chaskey crypto backends.
+
+        jsnark: ZkayECDHGenerator from the jsnark circuit builder jar (reference implementation)
+        python: native python implementation (no jvm required for key derivation), derives multiple key pairs in one batch
+
+        Both produce identical keys.
+
+        Available Options: [jsnark, python]
+        """
+        return self._ecdh_engine
+
+    @ecdh_engine.setter
+    def ecdh_engine(self, val: str):
+        _check_is_one_of(val, self._ecdh_engine_values)
+        self._ecdh_engine = val
+
+    @property
+    def ecdh_key_cache_size(self) -> int:
+        """
+        Maximum number of derived symmetric keys which the ecdh crypto backends keep in memory (0 disables the cache).
+
+        Encrypting or decrypting multiple values for the same (sender, receiver) pair only requires a single key derivation.
+        Cached keys stay in memory until they are evicted or the process exits (python cannot reliably erase them).
+        """
+        return self._ecdh_key_cache_size
+
+    @ecdh_key_cache_size.setter
+    def ecdh_key_cache_size(self, val: int):
+        _type_check(val, int)
+        self._ecdh_key_cache_size = val
+
     @property
     def blockchain_backend(self) -> str:
         """
@@ -187,6 +238,39 @@ class UserConfig:
         _type_check(val, (int, str, None))
         self._blockchain_default_account = val
 
+    @property
+    def blockchain_state_cache(self) -> bool:
+        """
+        If true, state variable values which were read from the chain are reused across transactions and view calls.
+
+        Cached values are tagged with the number of the block at which they were read, they are discarded as soon as
+        a new block is mined or when this client issues a transaction to the contract.
+        The block number is queried once per transaction or view call, direct state reads do not use the cache.
+        """
+        return self._blockchain_state_cache
+
+    @blockchain_state_cache.setter
+    def blockchain_state_cache(self, val: bool):
+        _type_check(val, bool)
+        self._blockchain_state_cache = val
+
+    @property
+    def blockchain_request_workers(self) -> int:
+        """
+        Maximum number of state variable requests which are sent to the blockchain node concurrently.
+
+        Only used by backends which cannot send multiple requests in a single batch and whose connection is thread safe
+        (http and ipc). Websocket and custom backends always request state sequentially.
+        """
+        return self._blockchain_request_workers
+
+    @blockchain_request_workers.setter
+    def blockchain_request_workers(self, val: int):
+        _type_check(val, int)
+        if val < 1:
+            raise ValueError('At least one blockchain request worker is required')
+        self._blockchain_request_workers = val
+
     @property
     def indentation(self) -> str:
         """Specifies the identation which should be used for the generated code output."""
@@ -197,6 +281,66 @@ class UserConfig:
         _type_check(val, str)
         self._indentation = val
 
+    @property
+    def jsnark_prover_idle_timeout(self) -> int:
+        """
+        Number of seconds after which an idle jsnark prover process is terminated.
+
+        Circuits are evaluated in a resident jvm process (one per circuit), which builds the circuit only once,
+        to avoid the jvm startup and circuit construction cost for every proof. At most proof_generation_workers such
+        processes exist at the same time, idle processes of other circuits are terminated early to make room for new ones.
+        If 0, a new jvm process is spawned for every proof instead.
+        """
+        return self._jsnark_prover_idle_timeout
+
+    @jsnark_prover_idle_timeout.setter
+    def jsnark_prover_idle_timeout(self, val: int):
+        _type_check(val, int)
+        self._jsnark_prover_idle_timeout = val
+
+    @property
+    def proof_generation_workers(self) -> int:
+        """Maximum number of proofs which are generated concurrently by generate_proof_async and generate_proofs_batch."""
+        return self._proof_generation_workers
+
+    @proof_generation_workers.setter
+    def proof_generation_workers(self, val: int):
+        _type_check(val, int)
+        if val < 1:
+            raise ValueError('At least one proof generation worker is required')
+        self._proof_generation_workers = val
+
+    @property
+    def proof_generation_memory_limit(self) -> int:
+        """
+        Maximum heap size (in MiB) of all jsnark jvm processes which evaluate circuits at the same time.
+
+        The limit is split evenly among the proof generation workers.
+        """
+        return self._proof_generation_memory_limit
+
+    @proof_generation_memory_limit.setter
+    def proof_generation_memory_limit(self, val: int):
+        _type_check(val, int)
+        self._proof_generation_memory_limit = val
+
+    @property
+    def circuit_compilation_memory_limit(self) -> int:
+        """
+        Memory budget (in MiB) for circuit compilation and key generation.
+
+        Circuits are compiled and keys are generated in parallel as long as the estimated memory consumption of all running
+        jobs stays within this limit.
+        """
+        return self._circuit_compilation_memory_limit
+
+    @circuit_compilation_memory_limit.setter
+    def circuit_compilation_memory_limit(self, val: int):
+        _type_check(val, int)
+        if val < 1:
+            raise ValueError('Circuit compilation memory limit must be positive')
+        self._circuit_compilation_memory_limit = val
+
     @property
     def libsnark_check_verify_locally_during_proof_generation(self) -> bool:
         """
@@ -284,6 +428,19 @@ class UserConfig:
         _type_check(val, bool)
         self._opt_cache_circuit_outputs = val
 
+    @property
+    def opt_simplify_circuits(self) -> bool:
+        """
+        If true, abstract circuits are optimized before code generation
+        (common subexpression elimination, removal of duplicate constraints and dead code elimination).
+        """
+        return self._opt_simplify_circuits
+
+    @opt_simplify_circuits.setter
+    def opt_simplify_circuits(self, val: bool):
+        _type_check(val, bool)
+        self._opt_simplify_circuits = val
+
     @property
     def data_dir(self) -> str:
         """Path to directory where to store user data (e.g. generated encryption keys)."""
@@ -297,6 +454,85 @@ class UserConfig:
             os.makedirs(val)
         self._data_dir = val
 
+    @property
+    def parse_cache(self) -> bool:
+        """
+        If true, parsed ASTs are cached in data_dir, such that unchanged contracts do not have to be parsed again.
+
+        Cache entries are specific to the source code and the zkay version.
+        """
+        return self._parse_cache
+
+    @parse_cache.setter
+    def parse_cache(self, val: bool):
+        _type_check(val, bool)
+        self._parse_cache = val
+
+    @property
+    def parse_cache_size_limit(self) -> int:
+        """Maximum size (in MiB) of the parse cache in data_dir, the least recently used ASTs are evicted when it is exceeded."""
+        return self._parse_cache_size_limit
+
+    @parse_cache_size_limit.setter
+    def parse_cache_size_limit(self, val: int):
+        _type_check(val, int)
+        if val < 0:
+            raise ValueError('Parse cache size limit must not be negative')
+        self._parse_cache_size_limit = val
+
+    @property
+    def solc_cache(self) -> bool:
+        """
+        If true, solc compilation outputs are cached in data_dir, such that unchanged contracts are not compiled again.
+
+        Cache entries are specific to the solc version, the compiler settings and the contents of all involved files.
+        """
+        return self._solc_cache
+
+    @solc_cache.setter
+    def solc_cache(self, val: bool):
+        _type_check(val, bool)
+        self._solc_cache = val
+
+    @property
+    def solc_cache_size_limit(self) -> int:
+        """Maximum size (in MiB) of the solc cache in data_dir, the least recently used outputs are evicted when it is exceeded."""
+        return self._solc_cache_size_limit
+
+    @solc_cache_size_limit.setter
+    def solc_cache_size_limit(self, val: int):
+        _type_check(val, int)
+        if val < 0:
+            raise ValueError('Solc cache size limit must not be negative')
+        self._solc_cache_size_limit = val
+
+    @property
+    def key_store(self) -> bool:
+        """
+        If true, compiled circuits and their snark keys are stored in data_dir and shared among all zkay projects.
+
+        Circuits which are found in the store (same circuit code, backend version and proving scheme) are linked into the
+        output directory instead of being compiled and keyed again.
+        """
+        return self._key_store
+
+    @key_store.setter
+    def key_store(self, val: bool):
+        _type_check(val, bool)
+        self._key_store = val
+
+    @property
+    def key_store_size_limit(self) -> int:
+        """Maximum size (in MiB) of the key store, the least recently used circuits are evicted when it is exceeded."""
+        return self._key_store_size_limit
+
+    @key_store_size_limit.setter
+    def key_store_size_limit(self, val: int):
+        _type_check(val, int)
+        if val < 0:
+            raise ValueError('Key store size limit must not be negative')
+        self._key_store_size_limit = val
+
     @property
     def log_dir(self) -> str:
         """Path to default log directory."""
@@ -6,4 +6,7 @@ Submodules
 ==========
 * :py:mod:`.jsnark_interface`: Jsnark circuit compilation and evaluation (preparation steps for key and proof generation).
 * :py:mod:`.libsnark_interface`: Libsnark key and proof generation.
+* :py:mod:`.java_server`: Infrastructure for persistent jvm helper processes.
+* :py:mod:`.crypto_server`: Persistent jvm process for ecdh key derivation and chaskey encryption.
+* :py:mod:`.prover_server`: Persistent jvm process for circuit evaluation during proof generation.
 """
\ No newline at end of file
@@ -0,0 +1,103 @@
+"""
+Long-lived jvm process which serves the ecdh key derivation and chaskey encryption requests of the crypto backends.
+
+Spawning a new jvm for every single key derivation / encryption dominates the offchain transaction latency.
+The server defined here is started lazily on first use, kept alive for the remaining lifetime of the python process
+and reused across transactions (and runtime resets).
+
+Protocol (line based, one request per line on stdin, one response per line on stdout):
+
+* ``keygen <rnd>`` -> ``ok <pk> <sk>``
+* ``ecdh <my_sk> <other_pk>`` -> ``ok <shared_key>``
+* ``enc|dec <key> <iv> <data>`` -> ``ok <output>``
+
+All arguments and results are hex strings. If a request fails, the response is ``err <message>``.
+"""
+
+import atexit
+from typing import Tuple
+
+from zkay.jsnark_interface.java_server import JavaServer
+
+_server_classname = 'ZkayCryptoServer'
+
+_server_class_str = '' + '''\
+import java.io.*;
+import java.math.BigInteger;
+import java.nio.charset.StandardCharsets;
+
+import zkay.ChaskeyLtsCbc;
+import zkay.ZkayECDHGenerator;
+import zkay.ZkayUtil;
+
+public class ZkayCryptoServer {
+    public static void main(String[] args) throws IOException {
+        // Keep diagnostic output of jsnark away from the response channel
+        PrintStream out = new PrintStream(new FileOutputStream(FileDescriptor.out), true, "UTF-8");
+        System.setOut(System.err);
+
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        String line;
+        while ((line = in.readLine()) != null) {
+            String response;
+            try {
+                response = "ok " + handle(line.trim().split(" "));
+            } catch (Exception e) {
+                response = "err " + String.valueOf(e).replace('\\n', ' ');
+            }
+            out.println(response);
+        }
+    }
+
+    private static byte[] parse(String hex, int len) {
+        return ZkayUtil.unsignedBigintToBytes(new BigInteger(hex, 16), len);
+    }
+
+    private static String handle(String[] req) throws Exception {
+        switch (req[0]) {
+            case "keygen": {
+                BigInteger sk = ZkayECDHGenerator.rnd_to_secret(req[1]);
+                return ZkayECDHGenerator.derivePk(sk) + " " + sk.toString(16);
+            }
+            case "ecdh":
+                return ZkayECDHGenerator.getSharedSecret(new BigInteger(req[2], 16), new BigInteger(req[1], 16));
+            case "enc":
+            case "dec": {
+                byte[] res = ChaskeyLtsCbc.crypt(req[0].equals("enc"), parse(req[1], 16), parse(req[2], 16), parse(req[3], 32));
+                return ZkayUtil.unsignedBytesToBigInt(res).toString(16);
+            }
+            default:
+                throw new IllegalArgumentException("Unknown request '" + req[0] + "'");
+        }
+    }
+}
+'''
+"""Java source of the crypto server"""
+
+
+class JsnarkCryptoServer(JavaServer):
+    """Handle to a (lazily started) crypto server jvm process."""
+
+    def __init__(self):
+        super().__init__(_server_classname, _server_class_str)
+
+    def ecdh_keypair(self, rnd: bytes) -> Tuple[int, int]:
+        """Derive ecdh (public key, secret key) from 32 bytes of randomness."""
+        pk, sk = self.request('keygen', rnd.hex())
+        return int(pk, 16), int(sk, 16)
+
+    def ecdh_sha256(self, other_pk: int, my_sk: int) -> bytes:
+        """Compute the 128 bit symmetric key shared between my_sk and other_pk."""
+        key, = self.request('ecdh', hex(my_sk)[2:], hex(other_pk)[2:])
+        return int(key, 16).to_bytes(16, byteorder='big')
+
+    def chaskey_lts_cbc(self, mode: str, key: bytes, iv: bytes, data: bytes) -> bytes:
+        """Encrypt (mode == 'enc') or decrypt (mode == 'dec') 32 bytes of data using chaskey-lts in cbc mode."""
+        out, = self.request(mode, key.hex(), iv.hex(), data.hex())
+        return int(out, 16).to_bytes(32, byteorder='big')
+
+
+crypto_server = JsnarkCryptoServer()
+"""Process-wide crypto server instance"""
+
+atexit.register(crypto_server.shutdown)
@@ -0,0 +1,120 @@
+"""
+Infrastructure for long-lived jvm helper processes, which serve requests from zkay over a line based protocol.
+
+Spawning a new jvm for every request dominates the latency of small jsnark tasks. A server is started lazily on first use
+and then kept alive until it is explicitly shut down (it is restarted automatically if it dies).
+
+Protocol (one request per line on stdin, one response per line on stdout):
+
+* ``<request type> <arg1> <arg2> ...`` -> ``ok <val1> <val2> ...`` or ``err <message>``
+"""
+
+import os
+import subprocess
+import tempfile
+import threading
+from typing import Optional, List
+
+from zkay.config import cfg
+from zkay.jsnark_interface.jsnark_interface import circuit_builder_jar, circuit_builder_jar_hash
+from zkay.utils.helpers import hash_string
+from zkay.utils.run_command import run_command
+
+
+def get_server_class_dir(classname: str, source: str) -> str:
+    """
+    Return directory which contains the compiled server class (compile it if necessary).
+
+    The class is cached in the user data directory and only recompiled when the server code or the circuit builder jar changes.
+
+    :param classname: name of the (public) server class
+    :param source: java source of the server class
+    :raise SubprocessError: if compilation fails
+    :return: path to the class directory
+    """
+    version = hash_string((circuit_builder_jar_hash + source).encode('utf-8')).hex()[:16]
+    class_dir = os.path.join(cfg.data_dir, 'java_server', classname, version)
+    if not os.path.exists(os.path.join(class_dir, f'{classname}.class')):
+        os.makedirs(class_dir, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=class_dir) as build_dir:
+            jfile = os.path.join(build_dir, f'{classname}.java')
+            with open(jfile, 'w') as f:
+                f.write(source)
+            run_command(['javac', '-cp', f'{circuit_builder_jar}', jfile], cwd=build_dir)
+
+            # Atomic, concurrent zkay processes might compile the server at the same time
+            os.replace(os.path.join(build_dir, f'{classname}.class'), os.path.join(class_dir, f'{classname}.class'))
+    return class_dir
+
+
+class JavaServer:
+    """Handle to a (lazily started) jvm server process."""
+
+    def __init__(self, classname: str, source: str, *, classpath: List[str] = (), server_args: List[str] = (),
+                 jvm_args: List[str] = ('-Xmx16384m', )):
+        """
+        Create a new server handle (the process is only started with the first request).
+
+        :param classname: name of the server class
+        :param source: java source of the server class
+        :param classpath: additional class path entries
+        :param server_args: arguments which are passed to the server's main method
+        :param jvm_args: arguments which are passed to the jvm (e.g. memory limits)
+        """
+        self._classname = classname
+        self._source = source
+        self._classpath = list(classpath)
+        self._server_args = list(server_args)
+        self._jvm_args = list(jvm_args)
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.RLock()
+
+    def _start(self, cwd: Optional[str] = None):
+        class_dir = get_server_class_dir(self._classname, self._source)
+        classpath = ':'.join([circuit_builder_jar, *self._classpath, class_dir])
+        stderr = None if cfg.verbosity >= 2 and not cfg.is_unit_test else subprocess.DEVNULL
+        self._process = subprocess.Popen(['java', *self._jvm_args, '-cp', classpath, self._classname, *self._server_args],
+                                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr, cwd=cwd,
+                                         universal_newlines=True, bufsize=1)
+
+    @property
+    def is_running(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def request(self, *args: str) -> List[str]:
+        """
+        Send a request to the server (start the server if it is not running) and wait for the response.
+
+        :param args: request type and arguments
+        :raise SubprocessError: if the server failed to process the request
+        :return: the values contained in the response
+        """
+        with self._lock:
+            if not self.is_running:
+                self._start()
+
+            try:
+                self._process.stdin.write(' '.join(args) + '\n')
+                self._process.stdin.flush()
+                response = self._process.stdout.readline()
+            except BrokenPipeError:
+                response = ''
+
+            if not response:
+                self._process = None
+                raise subprocess.SubprocessError(f'{self._classname} terminated unexpectedly while processing "{args[0]}" request')
+            status, *vals = response.split()
+            if status != 'ok':
+                raise subprocess.SubprocessError(f'{self._classname} failed to process "{args[0]}" request:\n{" ".join(vals)}')
+            return vals
+
+    def shutdown(self):
+        """Terminate the server process (it is restarted automatically on the next request)."""
+        with self._lock:
+            if self._process is not None:
+                self._process.stdin.close()
+                try:
+                    self._process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self._process.kill()
+                self._process = None
@@ -1,5 +1,5 @@
 import os
-from typing import List
+from typing import List, Optional
 
 from zkay.compiler.privacy.circuit_generation.circuit_helper import CircuitHelper
 from zkay.config import cfg
@@ -12,23 +12,67 @@ circuit_builder_jar = os.path.join(os.path.dirname(os.path.realpath(__file__)),
 circuit_builder_jar_hash = hash_file(circuit_builder_jar).hex()
 
 
-def compile_circuit(circuit_dir: str, javacode: str):
+def write_circuit_code(circuit_dir: str, javacode: str) -> str:
+    """Write the circuit java code to circuit_dir and return the path of the java file."""
+    jfile = os.path.join(circuit_dir, cfg.jsnark_circuit_classname + ".java")
+    with open(jfile, 'w') as f:
+        f.write(javacode)
+    return jfile
+
+
+def compile_circuit(circuit_dir: str, javacode: str, reserved_memory: Optional[int] = None):
     """
     Compile the given circuit java code and then compile the circuit which it describes using jsnark.
 
+    The jvm heap is limited to the reserved memory, such that parallel compilations stay within cfg.circuit_compilation_memory_limit.
+    If the reservation was too small, compilation fails and the caller may retry with a larger reservation.
+
     :param circuit_dir: output directory
     :param javacode: circuit code (java class which uses the custom jsnark wrapper API)
+    :param reserved_memory: memory in MiB which was reserved for this compilation (default: cfg.circuit_compilation_memory_limit)
     :raise SubprocessError: if compilation fails
     """
-    jfile = os.path.join(circuit_dir, cfg.jsnark_circuit_classname + ".java")
-    with open(jfile, 'w') as f:
-        f.write(javacode)
+    jfile = write_circuit_code(circuit_dir, javacode)
 
     # Compile the circuit java file
     run_command(['javac', '-cp', f'{circuit_builder_jar}', jfile], cwd=circuit_dir)
 
     # Run jsnark to generate the circuit
-    run_command(['java', '-Xms4096m', '-Xmx16384m', '-cp', f'{circuit_builder_jar}:{circuit_dir}', cfg.jsnark_circuit_classname, 'compile'], cwd=circuit_dir, allow_verbose=True)
+    max_heap = cfg.circuit_compilation_memory_limit
+    if reserved_memory:
+        max_heap = min(max_heap, reserved_memory)
+    run_command(['java'] + get_compilation_jvm_memory_args(max_heap) + ['-cp', f'{circuit_builder_jar}:{circuit_dir}', cfg.jsnark_circuit_classname, 'compile'],
+                cwd=circuit_dir, allow_verbose=True)
+
+
+def estimate_compilation_memory(circuit_dir: str, constraint_count: Optional[int] = None) -> int:
+    """
+    Return a rough estimate of the jvm heap size (in MiB) which jsnark requires to compile the circuit in circuit_dir.
+
+    The estimate is based on the size of the circuit.arith file of a previous compilation, if there is none, it is based on
+    the estimated constraint_count (1 KiB per constraint). If neither is available, 4096 MiB are assumed.
+    """
+    arith_file = os.path.join(circuit_dir, 'circuit.arith')
+    if not os.path.exists(arith_file):
+        return 4096 if constraint_count is None else 512 + (constraint_count >> 10)
+    return 512 + 16 * (os.path.getsize(arith_file) >> 20)
+
+
+def get_compilation_jvm_memory_args(max_heap: Optional[int] = None) -> List[str]:
+    """
+    Return the jvm heap size arguments for circuit compilation.
+
+    :param max_heap: maximum heap size in MiB (default: cfg.circuit_compilation_memory_limit)
+    """
+    if max_heap is None:
+        max_heap = cfg.circuit_compilation_memory_limit
+    return [f'-Xms{min(4096, max_heap)}m', f'-Xmx{max_heap}m']
+
+
+def get_proving_jvm_memory_args() -> List[str]:
+    """Return the jvm heap size arguments for circuit evaluation, cfg.proof_generation_memory_limit is split among all workers."""
+    max_heap = max(cfg.proof_generation_memory_limit // cfg.proof_generation_workers, 1)
+    return [f'-Xms{min(4096, max_heap)}m', f'-Xmx{max_heap}m']
 
 
 def prepare_proof(circuit_dir: str, output_dir: str, serialized_args: List[int]):
@@ -43,7 +87,7 @@ def prepare_proof(circuit_dir: str, output_dir: str, serialized_args: List[int])
     serialized_arg_str = [format(arg, 'x') for arg in serialized_args]
 
     # Run jsnark to evaluate the circuit and compute prover inputs
-    run_command(['java', '-Xms4096m', '-Xmx16384m', '-cp', f'{circuit_builder_jar}:{circuit_dir}', cfg.jsnark_circuit_classname, 'prove', *serialized_arg_str], cwd=output_dir, allow_verbose=True)
+    run_command(['java', *get_proving_jvm_memory_args(), '-cp', f'{circuit_builder_jar}:{circuit_dir}', cfg.jsnark_circuit_classname, 'prove', *serialized_arg_str], cwd=output_dir, allow_verbose=True)
 
 
 _class_template_str = '' + '''\
@@ -25,6 +25,13 @@ def generate_keys(input_dir: str, output_dir: str, proving_scheme: str):
     run_command([libsnark_runner, 'keygen', input_dir, output_dir, str(proving_scheme_map[proving_scheme])], allow_verbose=True)
 
 
+def estimate_keygen_memory(input_dir: str) -> int:
+    """Return a rough estimate of the memory (in MiB) which key generation for the circuit.arith file in input_dir requires."""
+    arith_file = os.path.join(input_dir, 'circuit.arith')
+    size = os.path.getsize(arith_file) >> 20 if os.path.exists(arith_file) else 0
+    return 256 + 32 * size
+
+
 def generate_proof(key_dir: str, input_dir: str, output_path: str, proving_scheme: str):
     """
     Generate a NIZK-proof for the circuit and input files in output_dir.
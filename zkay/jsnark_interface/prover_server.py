@@ -0,0 +1,141 @@
+"""
+Long-lived jvm process which evaluates a compiled jsnark circuit to prepare the libsnark proof inputs.
+
+Running ``java <circuit> prove`` for every proof pays jvm startup, class loading and the construction of the whole circuit
+(gadgets, wires and evaluation queue) each time. A prover server is started per circuit directory. It builds the circuit
+once, with the first request, and then only evaluates the witness for every further request.
+It is shut down after cfg.jsnark_prover_idle_timeout seconds without requests, or earlier if the prover needs room for
+a server of another circuit (see JsnarkProver, at most cfg.proof_generation_workers servers exist at the same time).
+
+Protocol (line based, one request per line on stdin, one response per line on stdout):
+
+* ``prove <arg1> <arg2> ...`` -> ``ok``
+
+The arguments are the serialized circuit arguments as hex strings. The circuit.arith file is written to the working
+directory of the server when the circuit is built, the circuit.in file for every request. From there, the files are
+linked or moved to the requested output directory. If a request fails, the response is ``err <message>``.
+
+Only the jsnark part of proof generation is resident. libsnark proof generation (run_snark proofgen) still runs as a
+separate process for every proof and loads proving.key from disk each time, since the prebuilt run_snark binary has no
+request/response mode which would allow keeping the deserialized proving key in memory.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+from typing import List, Optional
+
+from zkay.config import cfg
+from zkay.jsnark_interface.java_server import JavaServer
+from zkay.jsnark_interface.jsnark_interface import get_proving_jvm_memory_args
+from zkay.utils.helpers import link_or_copy
+
+_server_classname = 'ZkayProverServer'
+
+_server_class_str = '' + '''\
+import java.io.*;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.nio.charset.StandardCharsets;
+import java.util.Arrays;
+import java.util.List;
+
+import zkay.ZkayCircuitBase;
+
+public class ZkayProverServer {
+    public static void main(String[] args) throws Exception {
+        // Keep diagnostic output of jsnark away from the response channel
+        PrintStream out = new PrintStream(new FileOutputStream(FileDescriptor.out), true, "UTF-8");
+        System.setOut(System.err);
+
+        Class<? extends ZkayCircuitBase> circuitClass = Class.forName(args[0]).asSubclass(ZkayCircuitBase.class);
+        Method compileCircuit = ZkayCircuitBase.class.getDeclaredMethod("compileCircuit");
+        Method parseInputs = ZkayCircuitBase.class.getDeclaredMethod("parse_inputs", List.class);
+        compileCircuit.setAccessible(true);
+        parseInputs.setAccessible(true);
+
+        ZkayCircuitBase circuit = null;
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        String line;
+        while ((line = in.readLine()) != null) {
+            String response;
+            try {
+                String[] req = line.trim().split(" ");
+                if (!req[0].equals("prove")) {
+                    throw new IllegalArgumentException("Unknown request '" + req[0] + "'");
+                }
+                if (circuit == null) {
+                    // Build the circuit only once, its structure does not depend on the inputs
+                    ZkayCircuitBase c = circuitClass.getDeclaredConstructor().newInstance();
+                    compileCircuit.invoke(c);
+                    c.writeCircuitFile();
+                    circuit = c;
+                }
+                parseInputs.invoke(circuit, Arrays.asList(req).subList(1, req.length));
+                circuit.evalCircuit();
+                circuit.getCircuitEvaluator().writeInputFile();
+                response = "ok";
+            } catch (InvocationTargetException e) {
+                response = "err " + String.valueOf(e.getCause()).replace('\\n', ' ');
+            } catch (Exception e) {
+                response = "err " + String.valueOf(e).replace('\\n', ' ');
+            }
+            out.println(response);
+        }
+    }
+}
+'''
+"""Java source of the prover server"""
+
+
+class JsnarkProverServer(JavaServer):
+    """Handle to a (lazily started) prover server jvm process for a particular circuit."""
+
+    def __init__(self, circuit_dir: str):
+        super().__init__(_server_classname, _server_class_str, classpath=[circuit_dir], server_args=[cfg.jsnark_circuit_classname],
+                         jvm_args=get_proving_jvm_memory_args())
+        self.__class_file = os.path.join(circuit_dir, f'{cfg.jsnark_circuit_classname}.class')
+        self.__class_version: Optional[int] = None
+        self.__work_dir: Optional[str] = None
+        self.__idle_timer: Optional[threading.Timer] = None
+
+    def _start(self, cwd: Optional[str] = None):
+        self.__class_version = os.stat(self.__class_file).st_mtime_ns
+        if self.__work_dir is None:
+            self.__work_dir = tempfile.mkdtemp()
+        super()._start(cwd=self.__work_dir)
+
+    def prepare_proof(self, output_dir: str, serialized_args: List[int]):
+        """
+        Generate the libsnark circuit input files by evaluating the circuit using the provided input values.
+
+        :param output_dir: directory, where to store the jsnark output files
+        :param serialized_args: public inputs, public outputs and private inputs in the order in which they are defined in the circuit
+        :raise SubprocessError: if circuit evaluation fails
+        """
+        with self._lock:
+            if self.__idle_timer is not None:
+                self.__idle_timer.cancel()
+            if self.is_running and os.stat(self.__class_file).st_mtime_ns != self.__class_version:
+                # Circuit was recompiled
+                self.shutdown()
+
+            try:
+                self.request('prove', *[format(arg, 'x') for arg in serialized_args])
+                link_or_copy(os.path.join(self.__work_dir, 'circuit.arith'), os.path.join(output_dir, 'circuit.arith'))
+                shutil.move(os.path.join(self.__work_dir, 'circuit.in'), os.path.join(output_dir, 'circuit.in'))
+            finally:
+                self.__idle_timer = threading.Timer(cfg.jsnark_prover_idle_timeout, self.shutdown)
+                self.__idle_timer.daemon = True
+                self.__idle_timer.start()
+
+    def shutdown(self):
+        with self._lock:
+            if self.__idle_timer is not None:
+                self.__idle_timer.cancel()
+                self.__idle_timer = None
+            super().shutdown()
+            if self.__work_dir is not None:
+                shutil.rmtree(self.__work_dir, ignore_errors=True)
+                self.__work_dir = None
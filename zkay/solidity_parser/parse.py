@@ -1,9 +1,12 @@
-from antlr4 import CommonTokenStream, InputStream
+from antlr4 import CommonTokenStream, InputStream, PredictionMode
 from antlr4.error.ErrorListener import ErrorListener
+from antlr4.error.ErrorStrategy import BailErrorStrategy, DefaultErrorStrategy
+from antlr4.error.Errors import ParseCancellationException
 
 from zkay.errors.exceptions import ZkaySyntaxError
 from zkay.solidity_parser.generated.SolidityLexer import SolidityLexer
 from zkay.solidity_parser.generated.SolidityParser import SolidityParser
+from zkay.utils.timer import time_measure
 
 
 class SyntaxException(ZkaySyntaxError):
@@ -42,8 +45,30 @@ class MyParser:
         self.lexer._listeners = [MyErrorListener(code)]
         self.tokens = CommonTokenStream(self.lexer)
         self.parser = SolidityParser(self.tokens)
+        self.tree = self._parse(code)
+
+    def _parse(self, code):
+        """
+        Two-stage parsing: SLL prediction is much faster than full LL prediction and succeeds for almost all inputs.
+
+        Only if SLL parsing fails (which can be due to a syntax error or due to the weaker prediction), the input is
+        parsed again using LL prediction, which reports the first syntax error (if any).
+        """
+        self.parser._interp.predictionMode = PredictionMode.SLL
+        self.parser._errHandler = BailErrorStrategy()
+        self.parser._listeners = []
+        try:
+            with time_measure('parse_sll'):
+                return self.parser.sourceUnit()
+        except ParseCancellationException:
+            pass
+
+        self.parser.reset()
+        self.parser._interp.predictionMode = PredictionMode.LL
+        self.parser._errHandler = DefaultErrorStrategy()
         self.parser._listeners = [MyErrorListener(code)]
-        self.tree = self.parser.sourceUnit()
+        with time_measure('parse_ll'):
+            return self.parser.sourceUnit()
 
 
 def get_parse_tree(code):
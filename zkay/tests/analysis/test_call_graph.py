@@ -0,0 +1,99 @@
+import os
+import time
+import unittest
+
+from zkay.tests.zkay_unit_test import ZkayTestCase
+from zkay.zkay_ast.analysis.call_graph import strongly_connected_components, call_graph_analysis
+from zkay.zkay_ast.analysis.side_effects import compute_modified_sets
+from zkay.zkay_ast.build_ast import build_ast
+from zkay.zkay_ast.pointers.parent_setter import set_parents
+from zkay.zkay_ast.pointers.symbol_table import link_identifiers
+from zkay.zkay_ast.process_ast import get_processed_ast
+
+
+def _call_chain_code(length: int) -> str:
+    """Contract with a chain of internal calls f0 -> ... -> f<length>, each function is defined before its callee."""
+    chain = ''.join(f"""
+    function f{i}() internal {{
+        f{i + 1}();
+    }}
+""" for i in range(length))
+    return f"""pragma zkay >=0.2.0;
+
+contract Chain {{
+    uint x;
+    uint y;
+    uint z;
+
+    function g() internal {{
+        y = z;
+        h();
+    }}
+
+    function h() internal {{
+        if (y == 0) {{
+            g();
+        }}
+    }}
+{chain}
+    function f{length}() internal {{
+        x = 1;
+        g();
+    }}
+}}
+"""
+
+
+def _state_names(values):
+    return {v.target.idf.name for v in values}
+
+
+class TestCallGraph(ZkayTestCase):
+
+    def test_strongly_connected_components(self):
+        graph = {1: [2], 2: [3, 4], 3: [2], 4: [5], 5: [], 6: [6, 1]}
+        components = strongly_connected_components(graph.keys(), graph.__getitem__)
+        self.assertEqual(sorted(map(sorted, components)), [[1], [2, 3], [4], [5], [6]])
+        position = {node: i for i, component in enumerate(components) for node in component}
+        for node, successors in graph.items():
+            for succ in successors:
+                self.assertLessEqual(position[succ], position[node])
+
+    def test_deep_call_chain(self):
+        length = 50
+        ast = get_processed_ast(_call_chain_code(length), type_check=False, solc_check=False)
+        c = ast['Chain']
+        f0, g, h = c['f0'], c['g'], c['h']
+
+        self.assertEqual({fct.name for fct in f0.called_functions}, {f'f{i}' for i in range(1, length + 1)} | {'g', 'h'})
+        self.assertFalse(f0.is_recursive)
+        self.assertFalse(f0.has_static_body)
+        self.assertTrue(g.is_recursive)
+        self.assertTrue(h.is_recursive)
+        self.assertEqual(set(g.called_functions), {g, h})
+
+        # State accessed at the end of the chain is propagated to all callers
+        self.assertEqual(_state_names(f0.modified_values), {'x', 'y'})
+        self.assertEqual(_state_names(f0.read_values), {'y', 'z'})
+        self.assertEqual(_state_names(f0.body.statements[0].modified_values), {'x', 'y'})
+
+        # Mutually recursive functions access the same state
+        self.assertEqual(_state_names(h.modified_values), {'y'})
+        self.assertEqual(_state_names(h.read_values), {'y', 'z'})
+        self.assertEqual(_state_names(g.read_values), {'y', 'z'})
+
+
+@unittest.skipUnless(os.environ.get('ZKAY_RUN_BENCHMARKS') == '1', 'benchmarks disabled')
+class BenchmarkCallGraph(ZkayTestCase):
+    def test_benchmark_call_chain(self):
+        for length in [100, 200, 400]:
+            ast = build_ast(_call_chain_code(length))
+            set_parents(ast)
+            link_identifiers(ast)
+            start = time.perf_counter()
+            call_graph_analysis(ast)
+            t_call_graph = time.perf_counter() - start
+            start = time.perf_counter()
+            compute_modified_sets(ast)
+            t_modified_sets = time.perf_counter() - start
+            print(f'\nCall chain of length {length}: call graph {t_call_graph:.3f}s, modified sets {t_modified_sets:.3f}s')
@@ -79,3 +79,36 @@ class TestPartitionState(ZkayTestCase):
 
         for i in range(5, 10):
             self.assertTrue(s.same_partition(0, i))
+
+    def test_copy_is_independent(self):
+        s = PartitionState()
+
+        for i in range(4):
+            s.insert(i)
+        s.merge(0, 1)
+
+        c = s.copy()
+        c.merge(0, 2)
+        s.move_to(3, 1)
+        c.remove(1)
+
+        self.assertTrue(c.same_partition(0, 2))
+        self.assertFalse(c.has(1))
+        self.assertFalse(c.same_partition(0, 3))
+        self.assertFalse(s.same_partition(0, 2))
+        self.assertTrue(s.same_partition(0, 3))
+        self.assertTrue(s.same_partition(1, 3))
+
+    def test_join(self):
+        s = PartitionState()
+
+        for x in 'abcx':
+            s.insert(x)
+        o = s.copy()
+
+        s.merge('a', 'b')
+        s.merge('a', 'c')
+        o.merge('a', 'b')
+        o.merge('c', 'x')
+
+        self.assertEqual(str(s.join(o)), "[['a', 'b'], ['c'], ['x']]")
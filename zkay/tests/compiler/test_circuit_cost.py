@@ -0,0 +1,87 @@
+import tempfile
+
+from zkay.compiler.privacy.circuit_generation.circuit_cost import CircuitCostEstimator, SHA256_BLOCK_CONSTRAINTS
+from zkay.compiler.privacy.transformation.zkay_contract_transformer import transform_ast
+from zkay.config import cfg
+from zkay.jsnark_interface import jsnark_interface as jsnark
+from zkay.tests.zkay_unit_test import ZkayTestCase
+from zkay.zkay_ast.process_ast import get_processed_ast
+
+_code = f'''\
+pragma zkay >={cfg.zkay_version};
+
+contract Costs {{
+    final address owner;
+    uint32@owner a;
+    uint32@owner b;
+
+    constructor() public {{
+        owner = me;
+    }}
+
+    function set_a(uint32 v) public {{
+        require(owner == me);
+        a = v + 1;
+    }}
+
+    function set_a_b(uint32 v) public {{
+        require(owner == me);
+        a = v + 1;
+        b = v + 2;
+    }}
+
+    function set_max(uint32 v) public {{
+        require(owner == me);
+        a = v > b ? v + 1 : b;
+    }}
+}}
+'''
+
+
+class TestCircuitCost(ZkayTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.old_settings = cfg.crypto_backend, cfg.opt_hash_threshold
+        cfg.opt_hash_threshold = 1000
+
+    def tearDown(self) -> None:
+        cfg.crypto_backend, cfg.opt_hash_threshold = self.old_settings
+        super().tearDown()
+
+    @staticmethod
+    def _estimate_all():
+        _, circuits = transform_ast(get_processed_ast(_code, solc_check=False))
+        estimator = CircuitCostEstimator(circuits)
+        return {c.fct.name: estimator.estimate(c) for c in circuits.values() if c.fct.name in ['set_a', 'set_a_b', 'set_max']}
+
+    def test_relative_cost(self):
+        cfg.crypto_backend = 'ecdh-chaskey'
+        costs = self._estimate_all()
+        self.assertGreater(costs['set_a'].constraints, 0)
+        self.assertGreater(costs['set_a'].wires, costs['set_a'].constraints)
+        self.assertGreater(costs['set_max'].constraints, costs['set_a'].constraints)
+
+        # The second encryption for the owner reuses the shared key
+        extra = costs['set_a_b'].constraints - costs['set_a'].constraints
+        self.assertGreater(extra, 0)
+        self.assertLess(extra, SHA256_BLOCK_CONSTRAINTS)
+
+    def test_crypto_backend(self):
+        cfg.crypto_backend = 'ecdh-chaskey'
+        chaskey = self._estimate_all()
+        cfg.crypto_backend = 'rsa-oaep'
+        rsa = self._estimate_all()
+        self.assertGreater(rsa['set_a'].constraints, chaskey['set_a'].constraints)
+
+    def test_input_hashing(self):
+        cfg.crypto_backend = 'dummy'
+        without_hashing = self._estimate_all()
+        cfg.opt_hash_threshold = 0
+        with_hashing = self._estimate_all()
+        self.assertGreater(with_hashing['set_a'].constraints - without_hashing['set_a'].constraints, SHA256_BLOCK_CONSTRAINTS)
+
+    def test_compilation_memory(self):
+        with tempfile.TemporaryDirectory() as d:
+            self.assertEqual(jsnark.estimate_compilation_memory(d), 4096)
+            self.assertEqual(jsnark.estimate_compilation_memory(d, 1 << 20), 512 + 1024)
@@ -0,0 +1,174 @@
+import json
+import os
+import tempfile
+from typing import List
+from unittest import mock
+
+from zkay.compiler.privacy.circuit_generation.backends.jsnark_generator import JsnarkGenerator
+from zkay.compiler.privacy.circuit_generation.circuit_generator import CircuitGenerator
+from zkay.compiler.privacy.manifest import Manifest
+from zkay.compiler.privacy.proving_scheme.backends.groth16 import ProvingSchemeGroth16
+from zkay.compiler.privacy.transformation.zkay_contract_transformer import transform_ast
+from zkay.config import cfg
+from zkay.tests.zkay_unit_test import ZkayTestCase
+from zkay.transaction.blockchain.web3py import Web3TesterBlockchain
+from zkay.transaction.interface import ZkayProverInterface
+from zkay.transaction.types import AddressValue
+from zkay.zkay_ast.process_ast import get_processed_ast
+
+_code = f'''\
+pragma zkay >={cfg.zkay_version};
+
+contract Roles {{
+    final address owner;
+    uint@owner a;
+    uint@owner b;
+
+    constructor() public {{
+        owner = me;
+    }}
+
+    function set_a(uint@me v) public {{
+        require(owner == me);
+        a = v + 1;
+    }}
+
+    function set_b(uint@me v) public {{
+        require(owner == me);
+        b = v + 1;
+    }}
+
+    function set_c(uint@me v) public {{
+        require(owner == me);
+        a = v + 2;
+    }}
+}}
+'''
+
+
+class DummyJsnarkGenerator(JsnarkGenerator):
+    """Jsnark generator which writes fake circuit and key files instead of invoking jsnark and libsnark."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.compiled = []
+
+    def _generate_zkcircuit(self, import_keys, circuit, memory_limit):
+        output_dir = self._get_circuit_output_dir(circuit)
+        os.makedirs(output_dir, exist_ok=True)
+        for fname in self._get_key_store_filenames():
+            with open(os.path.join(output_dir, fname), 'w') as f:
+                f.write(circuit.get_verification_contract_name())
+        self.compiled.append(circuit.get_verification_contract_name())
+        return False
+
+    def _parse_verification_key(self, circuit):
+        vk = self.proving_scheme.VerifyingKey.create_dummy_key()
+        vk.gamma_abc = vk.gamma_abc[:1] * (len(self._get_primary_inputs(circuit)) + 1)
+        return vk
+
+
+class TestCircuitDeduplication(ZkayTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.old_key_store = cfg.key_store
+        cfg.key_store = False
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        ast = get_processed_ast(_code, solc_check=False)
+        _, circuits = transform_ast(ast)
+        self.generator = DummyJsnarkGenerator(list(circuits.values()), ProvingSchemeGroth16(), self.tmp_dir.name)
+        self.circuits = {c.fct.name: c for c in self.generator.circuits_to_prove}
+
+    def tearDown(self) -> None:
+        cfg.key_store = self.old_key_store
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    def test_canonical_digest(self):
+        digests = {name: self.generator._get_canonical_circuit_digest(c) for name, c in self.circuits.items()}
+        self.assertEqual(digests['set_a'], digests['set_b'])
+        self.assertNotEqual(digests['set_a'], digests['set_c'])
+
+    def test_shared_circuit(self):
+        self.generator.generate_circuits(import_keys=False)
+        self.assertEqual(sorted(self.generator.compiled), ['zk__Verify_Roles_set_a', 'zk__Verify_Roles_set_c'])
+
+        a_dir = self.generator._get_circuit_output_dir(self.circuits['set_a'])
+        b_dir = self.generator._get_circuit_output_dir(self.circuits['set_b'])
+        for fname in self.generator._get_key_store_filenames():
+            with open(os.path.join(b_dir, fname)) as f:
+                self.assertEqual(f.read(), 'zk__Verify_Roles_set_a')
+            self.assertTrue(os.path.samefile(os.path.join(a_dir, fname), os.path.join(b_dir, fname)))
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir.name, self.circuits['set_b'].verifier_contract_filename)))
+
+    def test_shared_circuits(self):
+        self.assertEqual(self.generator.get_shared_circuits(), {self.circuits['set_b']: self.circuits['set_a']})
+
+    def test_share_circuit_required(self):
+        with self.assertRaises(TypeError):
+            class _Generator(CircuitGenerator):
+                def _get_canonical_circuit_digest(self, circuit):
+                    return ''
+
+
+class _RecordingProver(ZkayProverInterface):
+    def __init__(self):
+        super().__init__()
+        self.verifier_dirs = []
+
+    def _generate_proof(self, verifier_dir: str, priv_values: List[int], in_vals: List[int], out_vals: List[int]) -> List[int]:
+        self.verifier_dirs.append(os.path.basename(verifier_dir))
+        return []
+
+    def get_prover_key_hash(self, verifier_directory: str) -> bytes:
+        return bytes(32)
+
+
+class TestSharedVerifiers(ZkayTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.project_dir = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.project_dir.name, 'contract.zkay'), 'w') as f:
+            f.write(_code)
+        with open(os.path.join(self.project_dir.name, 'manifest.json'), 'w') as f:
+            f.write(json.dumps({
+                Manifest.contract_hash: Manifest.get_contract_hash(_code),
+                Manifest.verifier_names: ['zk__Verify_Roles_set_a', 'zk__Verify_Roles_set_b', 'zk__Verify_Roles_set_c'],
+                Manifest.shared_verifiers: {'zk__Verify_Roles_set_b': 'zk__Verify_Roles_set_a'},
+            }))
+
+    def tearDown(self) -> None:
+        self.project_dir.cleanup()
+        super().tearDown()
+
+    def test_manifest(self):
+        self.assertEqual(Manifest.get_shared_verifiers(self.project_dir.name), {'zk__Verify_Roles_set_b': 'zk__Verify_Roles_set_a'})
+        with open(os.path.join(self.project_dir.name, 'contract.zkay'), 'a') as f:
+            f.write('\n')
+        self.assertEqual(Manifest.get_shared_verifiers(self.project_dir.name), {})
+
+    def test_proof_uses_representative(self):
+        prover = _RecordingProver()
+        prover.generate_proof(self.project_dir.name, 'Roles', 'set_b', [], [1], [2])
+        prover.generate_proof(self.project_dir.name, 'Roles', 'set_c', [], [1], [2])
+        self.assertEqual(prover.verifier_dirs, ['zk__Verify_Roles_set_a_out', 'zk__Verify_Roles_set_c_out'])
+
+    def test_deploy_representatives_only(self):
+        chain = Web3TesterBlockchain.__new__(Web3TesterBlockchain)
+        chain._lib_addresses = {}
+        chain._pki_contract = mock.Mock(address=AddressValue(1).val)
+        deployed = []
+
+        def deploy_contract(sender, cout, *args, **kwargs):
+            deployed.append(cout)
+            return mock.Mock(address=AddressValue(len(deployed) + 1).val)
+
+        with mock.patch.object(Web3TesterBlockchain, 'compile_contracts', side_effect=lambda files, names, libs: names), \
+                mock.patch.object(chain, '_deploy_contract', side_effect=deploy_contract):
+            addresses = chain._deploy_dependencies(None, self.project_dir.name, Manifest.get_verifier_names(self.project_dir.name))
+
+        self.assertEqual(deployed, ['zk__Verify_Roles_set_a', 'zk__Verify_Roles_set_c'])
+        self.assertEqual(addresses['zk__Verify_Roles_set_b'], addresses['zk__Verify_Roles_set_a'])
+        self.assertNotEqual(addresses['zk__Verify_Roles_set_c'], addresses['zk__Verify_Roles_set_a'])
@@ -0,0 +1,175 @@
+import tempfile
+from unittest import mock
+
+from zkay.compiler.privacy.circuit_generation.backends.jsnark_generator import JsnarkVisitor, JsnarkGenerator
+from zkay.compiler.privacy.circuit_generation.circuit_constraints import CircVarDecl, CircEqConstraint, CircGuardModification, \
+    CircIndentBlock, CircComment
+from zkay.compiler.privacy.circuit_generation.circuit_optimizer import optimize_circuit
+from zkay.compiler.privacy.proving_scheme.backends.groth16 import ProvingSchemeGroth16
+from zkay.compiler.privacy.transformation.zkay_contract_transformer import transform_ast
+from zkay.config import cfg
+from zkay.tests.zkay_unit_test import ZkayTestCase
+from zkay.zkay_ast.ast import HybridArgumentIdf, HybridArgType, TypeName, FunctionCallExpr, BuiltinFunction, UintTypeName, \
+    BooleanLiteralExpr, NumberLiteralExpr, PrimitiveCastExpr
+from zkay.zkay_ast.process_ast import get_processed_ast
+
+_code = f'''\
+pragma zkay >={cfg.zkay_version};
+
+contract Pair {{
+    final address owner;
+    uint32@owner a;
+    uint32@owner b;
+
+    constructor() public {{
+        owner = me;
+    }}
+
+    function set() public {{
+        require(owner == me);
+        a = b * b + 1;
+        b = b * b + 1;
+    }}
+}}
+'''
+
+
+def _idf(name: str, arg_type=HybridArgType.TMP_CIRCUIT_VAL, t=None) -> HybridArgumentIdf:
+    return HybridArgumentIdf(name, TypeName.uint_type() if t is None else t, arg_type)
+
+
+def _add(a: HybridArgumentIdf, b: HybridArgumentIdf):
+    return FunctionCallExpr(BuiltinFunction('+'), [a.get_idf_expr(), b.get_idf_expr()]).as_type(TypeName.uint_type())
+
+
+def _op(op: str, t: TypeName, *args):
+    args = [arg.get_idf_expr() if isinstance(arg, HybridArgumentIdf) else arg for arg in args]
+    return FunctionCallExpr(BuiltinFunction(op), args).as_type(t)
+
+
+def _const(value: int, t: TypeName):
+    return PrimitiveCastExpr(t, NumberLiteralExpr(value), is_implicit=True).as_type(t)
+
+
+class TestCircuitOptimizer(ZkayTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.a, self.b = _idf('a', HybridArgType.PRIV_CIRCUIT_VAL), _idf('b', HybridArgType.PRIV_CIRCUIT_VAL)
+        self.out0, self.out1 = _idf('out0', HybridArgType.PUB_CIRCUIT_ARG), _idf('out1', HybridArgType.PUB_CIRCUIT_ARG)
+        self.cond = _idf('cond', HybridArgType.PUB_CIRCUIT_ARG, TypeName.bool_type())
+
+    @staticmethod
+    def _code(phi):
+        return '\n'.join(JsnarkVisitor(phi).visitCircuit())
+
+    def test_common_subexpression(self):
+        t0, t1 = _idf('t0'), _idf('t1')
+        phi = [CircVarDecl(t0, _add(self.a, self.b)), CircEqConstraint(t0, self.out0),
+               CircVarDecl(t1, _add(self.a, self.b)), CircEqConstraint(t1, self.out1)]
+        stats = optimize_circuit(phi)
+        self.assertEqual(stats.common_subexpressions, 1)
+        self.assertEqual(self._code(phi), '\n'.join([
+            'decl("t0", o_(get("a"), \'+\', get("b")));',
+            'checkEq("t0", "out0");',
+            'checkEq("t0", "out1");',
+        ]))
+
+    def test_guarded_subexpression(self):
+        # A value computed inside a guarded scope is not reused outside of it
+        t0, t1 = _idf('t0'), _idf('t1')
+        phi = [CircGuardModification(self.cond, True), CircVarDecl(t0, _add(self.a, self.b)), CircEqConstraint(t0, self.out0),
+               CircGuardModification(None), CircVarDecl(t1, _add(self.a, self.b)), CircEqConstraint(t1, self.out1)]
+        stats = optimize_circuit(phi)
+        self.assertEqual(stats.common_subexpressions, 0)
+        self.assertEqual(len(phi), 6)
+
+    def test_duplicate_constraint(self):
+        t0 = _idf('t0')
+        phi = [CircVarDecl(t0, _add(self.a, self.b)), CircEqConstraint(t0, self.out0), CircEqConstraint(t0, self.out0)]
+        stats = optimize_circuit(phi)
+        self.assertEqual(stats.duplicate_constraints, 1)
+        self.assertEqual(len(phi), 2)
+
+    def test_dead_code(self):
+        t0, t1, t2 = _idf('t0'), _idf('t1'), _idf('t2')
+        phi = [CircVarDecl(t0, _add(self.a, self.b)),
+               CircComment('{'),
+               CircGuardModification(self.cond, True),
+               CircIndentBlock('dead', [CircVarDecl(t1, _add(t0, self.b))]),
+               CircGuardModification(None),
+               CircVarDecl(t2, _add(self.a, self.a)),
+               CircEqConstraint(t2, self.out0)]
+        stats = optimize_circuit(phi)
+        self.assertEqual(stats.dead_statements, 4)
+        self.assertEqual(self._code(phi), '\n'.join([
+            '// {',
+            'decl("t2", o_(get("a"), \'+\', get("a")));',
+            'checkEq("t2", "out0");',
+        ]))
+
+    def test_constant_folding(self):
+        uint8 = UintTypeName('uint8')
+        c0, c1, t0, t1 = _idf('c0', t=uint8), _idf('c1', t=uint8), _idf('t0', t=uint8), _idf('t1', t=TypeName.bool_type())
+        phi = [CircVarDecl(c0, _const(200, uint8)), CircVarDecl(c1, _const(100, uint8)),
+               CircVarDecl(t0, _op('+', uint8, c0, c1)), CircEqConstraint(t0, self.out0),
+               CircVarDecl(t1, _op('<', TypeName.bool_type(), c1, c0)), CircEqConstraint(t1, self.out1)]
+        stats = optimize_circuit(phi)
+        self.assertEqual(stats.folded_constants, 2)
+        self.assertEqual(self._code(phi), '\n'.join([
+            'decl("t0", cast(val(44, ZkUint(8)), ZkUint(8)));',
+            'checkEq("t0", "out0");',
+            'decl("t1", val(true));',
+            'checkEq("t1", "out1");',
+        ]))
+
+    def test_constant_ite(self):
+        cond, t0, t1 = _idf('cond', t=TypeName.bool_type()), _idf('t0'), _idf('t1')
+        phi = [CircVarDecl(cond, BooleanLiteralExpr(False)),
+               CircVarDecl(t0, _op('ite', TypeName.uint_type(), cond, self.a, self.b)),
+               CircVarDecl(t1, _add(t0, self.b)), CircEqConstraint(t1, self.out0)]
+        stats = optimize_circuit(phi)
+        self.assertEqual(stats.folded_constants, 1)
+        self.assertEqual(self._code(phi), '\n'.join([
+            'decl("t0", get("b"));',
+            'decl("t1", o_(get("t0"), \'+\', get("b")));',
+            'checkEq("t1", "out0");',
+        ]))
+
+    def test_no_field_arithmetic_folding(self):
+        # uint256 arithmetic is done modulo the field prime in the circuit
+        c0, t0 = _idf('c0'), _idf('t0')
+        phi = [CircVarDecl(c0, NumberLiteralExpr(3)), CircVarDecl(t0, _add(c0, c0)), CircEqConstraint(t0, self.out0)]
+        stats = optimize_circuit(phi)
+        self.assertEqual(stats.folded_constants, 0)
+        self.assertEqual(len(phi), 3)
+
+    def test_logged_constraint_reduction(self):
+        _, circuits = transform_ast(get_processed_ast(_code, solc_check=False))
+        with tempfile.TemporaryDirectory() as d:
+            generator = JsnarkGenerator(list(circuits.values()), ProvingSchemeGroth16(), d)
+            before = generator.cost_estimator.estimate(generator.circuits_to_prove[0]).constraints
+
+            logged = {}
+            with mock.patch('zkay.my_logging.data', lambda key, value: logged.__setitem__(key, value)):
+                after = generator.estimate_circuit_costs()[generator.circuits_to_prove[0]].constraints
+        self.assertLess(after, before)
+        self.assertEqual(logged['circuit_opt_estimated_constraint_reduction'], before - after)
+        self.assertEqual(logged['circuit_opt_folded_constants'], 0)
+        self.assertEqual(logged['circuit_opt_common_subexpressions'], 1)
+        self.assertEqual(logged['circuit_opt_removed_constraints'], 0)
+        self.assertEqual(logged['circuit_opt_removed_dead_statements'], 1)
+
+    def test_disabled_for_old_manifests(self):
+        settings = cfg.export_compiler_settings()
+        try:
+            # Packages compiled before the optimizer existed have unoptimized circuits (and keys)
+            old_settings = dict(settings)
+            del old_settings['opt_simplify_circuits']
+            cfg.import_compiler_settings(old_settings)
+            self.assertFalse(cfg.opt_simplify_circuits)
+
+            cfg.import_compiler_settings(dict(old_settings, opt_simplify_circuits=True))
+            self.assertTrue(cfg.opt_simplify_circuits)
+        finally:
+            cfg.import_compiler_settings(settings)
@@ -0,0 +1,122 @@
+import os
+import tempfile
+from subprocess import SubprocessError
+from unittest import mock
+
+from zkay.compiler.privacy.circuit_generation.backends.jsnark_generator import JsnarkGenerator
+from zkay.compiler.privacy.proving_scheme.backends.groth16 import ProvingSchemeGroth16
+from zkay.compiler.privacy.transformation.zkay_contract_transformer import transform_ast
+from zkay.config import cfg
+from zkay.tests.zkay_unit_test import ZkayTestCase
+from zkay.zkay_ast.process_ast import get_processed_ast
+
+_code = f'''\
+pragma zkay >={cfg.zkay_version};
+
+contract Counter {{
+    final address owner;
+    uint32@owner a;
+
+    constructor() public {{
+        owner = me;
+    }}
+
+    function inc(uint32 v) public {{
+        require(owner == me);
+        a = a + v;
+    }}
+}}
+'''
+
+
+class FakeKeygenJsnarkGenerator(JsnarkGenerator):
+    """Jsnark generator which writes fake key files instead of invoking libsnark."""
+
+    def _generate_keys(self, circuit):
+        for path in self._get_vk_and_pk_paths(circuit):
+            with open(path, 'w') as f:
+                f.write('key')
+
+    def _parse_verification_key(self, circuit):
+        vk = self.proving_scheme.VerifyingKey.create_dummy_key()
+        vk.gamma_abc = vk.gamma_abc[:1] * (len(self._get_primary_inputs(circuit)) + 1)
+        return vk
+
+
+class TestCompilationMemory(ZkayTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.old_settings = cfg.key_store, cfg.circuit_compilation_memory_limit
+        cfg.key_store = False
+        cfg.circuit_compilation_memory_limit = 16384
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        cfg.key_store, cfg.circuit_compilation_memory_limit = self.old_settings
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    def _generator(self, output_dir: str):
+        ast = get_processed_ast(_code, solc_check=False)
+        _, circuits = transform_ast(ast)
+        return FakeKeygenJsnarkGenerator(list(circuits.values()), ProvingSchemeGroth16(), output_dir)
+
+    def test_jvm_heap_follows_reservation(self):
+        generator = self._generator(self.tmp_dir.name)
+
+        commands = []
+        with mock.patch('zkay.jsnark_interface.jsnark_interface.run_command', lambda cmd, **kwargs: commands.append(cmd)):
+            generator.generate_circuits(import_keys=False)
+
+        java_commands = [cmd for cmd in commands if cmd[0] == 'java']
+        self.assertTrue(java_commands)
+        self.assertEqual(len(java_commands), len(generator.circuits_to_prove))
+        for circuit, cmd in zip(generator.circuits_to_prove, java_commands):
+            self.assertTrue(os.path.exists(generator._get_vk_and_pk_paths(circuit)[0]))
+            reserved = generator._estimate_compilation_memory(circuit)
+            self.assertLess(reserved, cfg.circuit_compilation_memory_limit)
+            self.assertIn(f'-Xmx{reserved}m', cmd)
+            self.assertIn(f'-Xms{min(4096, reserved)}m', cmd)
+
+    def test_underestimated_circuit(self):
+        generator = self._generator(self.tmp_dir.name)
+
+        commands = []
+        full_heap = f'-Xmx{cfg.circuit_compilation_memory_limit}m'
+
+        def run_command(cmd, **kwargs):
+            commands.append(cmd)
+            if cmd[0] == 'java' and full_heap not in cmd:
+                raise SubprocessError('java.lang.OutOfMemoryError: Java heap space')
+
+        with mock.patch('zkay.jsnark_interface.jsnark_interface.run_command', run_command):
+            generator.generate_circuits(import_keys=False)
+
+        # Every compilation is retried through the scheduler with the whole budget reserved
+        java_commands = [cmd for cmd in commands if cmd[0] == 'java']
+        self.assertEqual(len(java_commands), 2 * len(generator.circuits_to_prove))
+        self.assertEqual(len([cmd for cmd in java_commands if full_heap in cmd]), len(generator.circuits_to_prove))
+        for circuit in generator.circuits_to_prove:
+            self.assertTrue(os.path.exists(generator._get_vk_and_pk_paths(circuit)[0]))
+
+    def test_failure_with_full_heap(self):
+        generator = self._generator(self.tmp_dir.name)
+
+        commands = []
+
+        def run_command(cmd, **kwargs):
+            commands.append(cmd)
+            if cmd[0] == 'java':
+                raise SubprocessError('java.lang.OutOfMemoryError: Java heap space')
+
+        # The compilation is retried once with the full heap, failures with the full heap are not retried
+        cfg.circuit_compilation_memory_limit = 1024
+        with mock.patch('zkay.jsnark_interface.jsnark_interface.run_command', run_command):
+            with self.assertRaises(SubprocessError):
+                generator.generate_circuits(import_keys=False)
+        java_commands = [cmd for cmd in commands if cmd[0] == 'java']
+        self.assertEqual(len(java_commands), 2)
+        self.assertNotIn('-Xmx1024m', java_commands[0])
+        self.assertEqual(java_commands[1], commands[-1])
+        self.assertIn('-Xmx1024m', commands[-1])
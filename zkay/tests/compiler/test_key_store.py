@@ -0,0 +1,161 @@
+import os
+import stat
+import tempfile
+from unittest import mock
+
+from zkay.compiler.privacy.circuit_generation.backends.jsnark_generator import JsnarkGenerator
+from zkay.compiler.privacy.circuit_generation.key_store import KeyStore
+from zkay.compiler.privacy.proving_scheme.backends.groth16 import ProvingSchemeGroth16
+from zkay.compiler.privacy.transformation.zkay_contract_transformer import transform_ast
+from zkay.config import cfg
+from zkay.tests.zkay_unit_test import ZkayTestCase
+from zkay.zkay_ast.process_ast import get_processed_ast
+
+
+def _code(increment: int) -> str:
+    return f'''\
+pragma zkay >={cfg.zkay_version};
+
+contract Counter {{
+    final address owner;
+    uint32@owner a;
+
+    constructor() public {{
+        owner = me;
+    }}
+
+    function inc(uint32 v) public {{
+        require(owner == me);
+        a = a + v + {increment};
+    }}
+}}
+'''
+
+
+def _write(path: str, content: str):
+    # Emulate the permission check which root does not get
+    if os.path.exists(path) and not os.stat(path).st_mode & stat.S_IWUSR:
+        raise PermissionError(f'Permission denied: {path}')
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+class TestKeyStore(ZkayTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = KeyStore(os.path.join(self.tmp_dir.name, 'store'), 1)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    def _make_dir(self, name: str, contents: dict) -> str:
+        d = os.path.join(self.tmp_dir.name, name)
+        os.makedirs(d)
+        for fname, content in contents.items():
+            with open(os.path.join(d, fname), 'wb') as f:
+                f.write(content)
+        return d
+
+    def test_add_and_fetch(self):
+        src = self._make_dir('a', {'circuit.arith': b'arith', 'proving.key': b'pk'})
+        self.store.add('digest', src, ['circuit.arith', 'proving.key'])
+
+        dst = self._make_dir('b', {'proving.key': b'old'})
+        self.assertTrue(self.store.fetch('digest', dst, ['circuit.arith', 'proving.key']))
+        with open(os.path.join(dst, 'proving.key'), 'rb') as f:
+            self.assertEqual(f.read(), b'pk')
+        self.assertEqual(sorted(os.listdir(dst)), ['circuit.arith', 'proving.key'])
+
+    def test_missing(self):
+        dst = self._make_dir('b', {'proving.key': b'old'})
+        self.assertFalse(self.store.fetch('digest', dst, ['circuit.arith', 'proving.key']))
+        self.assertEqual(os.listdir(dst), ['proving.key'])
+
+    def test_eviction(self):
+        self.store.size_limit = 2
+        for i, digest in enumerate(['first', 'second']):
+            self.store.add(digest, self._make_dir(digest, {'proving.key': b'x' * (800 << 10)}), ['proving.key'])
+            os.utime(self.store.get_entry_dir(digest), (i, i))
+
+        # Using 'first' makes 'second' the least recently used entry
+        self.assertTrue(self.store.fetch('first', self._make_dir('fetch', {}), ['proving.key']))
+        self.store.add('third', self._make_dir('third', {'proving.key': b'x' * (800 << 10)}), ['proving.key'])
+
+        self.assertTrue(os.path.exists(self.store.get_entry_dir('first')))
+        self.assertFalse(os.path.exists(self.store.get_entry_dir('second')))
+        self.assertTrue(os.path.exists(self.store.get_entry_dir('third')))
+
+
+class FakeKeygenJsnarkGenerator(JsnarkGenerator):
+    """Jsnark generator which does not parse the fake verification keys."""
+
+    def _parse_verification_key(self, circuit):
+        vk = self.proving_scheme.VerifyingKey.create_dummy_key()
+        vk.gamma_abc = vk.gamma_abc[:1] * (len(self._get_primary_inputs(circuit)) + 1)
+        return vk
+
+
+def _run_command(cmd, cwd=None, **kwargs):
+    # Fake javac and jsnark, which (re)write their output files
+    if cmd[0] == 'javac':
+        _write(os.path.join(cwd, f'{cfg.jsnark_circuit_classname}.class'), 'class')
+    elif cmd[0] == 'java':
+        with open(os.path.join(cwd, f'{cfg.jsnark_circuit_classname}.java')) as f:
+            _write(os.path.join(cwd, 'circuit.arith'), f.read())
+
+
+def _generate_keys(input_dir: str, output_dir: str, proving_scheme: str):
+    # Fake libsnark, which (re)writes the key files
+    with open(os.path.join(input_dir, 'circuit.arith')) as f:
+        arith = f.read()
+    for fname in FakeKeygenJsnarkGenerator.get_vk_and_pk_filenames():
+        _write(os.path.join(output_dir, fname), arith)
+
+
+class TestKeyStoreRecompilation(ZkayTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.old_key_store = cfg.key_store
+        cfg.key_store = True
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        cfg.key_store = self.old_key_store
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    def _generate(self, code: str) -> FakeKeygenJsnarkGenerator:
+        _, circuits = transform_ast(get_processed_ast(code, solc_check=False))
+        generator = FakeKeygenJsnarkGenerator(list(circuits.values()), ProvingSchemeGroth16(), os.path.join(self.tmp_dir.name, 'out'))
+        generator.key_store = KeyStore(os.path.join(self.tmp_dir.name, 'store'), 1)
+        with mock.patch('zkay.jsnark_interface.jsnark_interface.run_command', _run_command), \
+                mock.patch('zkay.jsnark_interface.libsnark_interface.generate_keys', _generate_keys):
+            generator.generate_circuits(import_keys=False)
+        return generator
+
+    def test_recompile_changed_circuit(self):
+        os.mkdir(os.path.join(self.tmp_dir.name, 'out'))
+        old = self._generate(_code(1))
+        circuit_dir = old._get_circuit_output_dir(old.circuits_to_prove[0])
+        pk_path = os.path.join(circuit_dir, 'proving.key')
+        with open(pk_path) as f:
+            old_pk = f.read()
+        old_entries = os.listdir(old.key_store.store_dir)
+        self.assertEqual(len(old_entries), 1)
+        self.assertTrue(os.path.samefile(pk_path, os.path.join(old.key_store.get_entry_dir(old_entries[0]), 'proving.key')))
+
+        # The files of the project, which are linked into the store, are regenerated for the changed circuit
+        new = self._generate(_code(2))
+        with open(pk_path) as f:
+            self.assertNotEqual(f.read(), old_pk)
+        self.assertEqual(len(os.listdir(new.key_store.store_dir)), 2)
+        for fname in new._get_key_store_filenames():
+            self.assertTrue(os.stat(os.path.join(circuit_dir, fname)).st_mode & stat.S_IWUSR)
+
+        # The store entry of the old circuit is not affected
+        with open(os.path.join(old.key_store.get_entry_dir(old_entries[0]), 'proving.key')) as f:
+            self.assertEqual(f.read(), old_pk)
@@ -1,8 +1,16 @@
+import json
 import os
-from unittest import TestCase
+import tempfile
+from unittest import TestCase, mock
 
-from zkay.compiler.solidity.compiler import compile_solidity_code, compile_solidity_json
+from zkay.compiler.solidity import compiler
+from solcx.exceptions import SolcError
+
+from zkay.compiler.solidity.compiler import compile_solidity_code, compile_solidity_json, compile_solidity_files_json, \
+    check_compilation_of_files, SolcException
+from zkay.config import cfg
 from zkay.examples.examples import others_dir
+from zkay.tests.zkay_unit_test import ZkayTestCase
 
 simple_storage = """
 pragma solidity ^0.6.0;
@@ -29,3 +37,132 @@ class TestCompileSolidity(TestCase):
     def test_compile_with_import(self):
         compile_output = compile_solidity_json(os.path.join(others_dir, 'AddUser.sol'))
         self.assertIsNotNone(compile_output)
+
+
+class TestSolcCache(ZkayTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.old_data_dir, self.old_solc_cache = cfg.data_dir, cfg.solc_cache
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        cfg.data_dir = os.path.join(self.tmp_dir.name, 'data')
+        cfg.solc_cache = True
+        compiler._solc_cache.clear()
+
+        self.main_file = os.path.join(self.tmp_dir.name, 'Main.sol')
+        self.lib_file = os.path.join(self.tmp_dir.name, 'Lib.sol')
+        with open(self.main_file, 'w') as f:
+            f.write('pragma solidity ^0.6.0;\nimport "./Lib.sol";\ncontract Main {}\n')
+        with open(self.lib_file, 'w') as f:
+            f.write('pragma solidity ^0.6.0;\nlibrary Lib {}\n')
+
+        self.solc_calls = 0
+        self.solc_input = None
+
+        def fake_compile_standard(json_in, base_path, allow_paths):
+            self.solc_calls += 1
+            self.solc_base_path = base_path
+            self.solc_input = json_in
+            return {'contracts': {'Main.sol': {'Main': {'run': self.solc_calls}}}}
+        self.patcher = mock.patch.object(compiler, 'compile_standard', fake_compile_standard)
+        self.patcher.start()
+
+    def tearDown(self) -> None:
+        self.patcher.stop()
+        compiler._solc_cache.clear()
+        cfg.data_dir, cfg.solc_cache = self.old_data_dir, self.old_solc_cache
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    def test_cache_hit(self):
+        out = compile_solidity_json(self.main_file)
+        self.assertEqual(out, compile_solidity_json(self.main_file))
+        self.assertEqual(self.solc_calls, 1)
+
+        # Different settings
+        compile_solidity_json(self.main_file, optimizer_runs=10)
+        self.assertEqual(self.solc_calls, 2)
+
+        # On-disk cache
+        compiler._solc_cache.clear()
+        self.assertEqual(out, compile_solidity_json(self.main_file))
+        self.assertEqual(self.solc_calls, 2)
+
+    def test_imported_file_changed(self):
+        compile_solidity_json(self.main_file)
+        with open(self.lib_file, 'a') as f:
+            f.write('library Lib2 {}\n')
+        compile_solidity_json(self.main_file)
+        self.assertEqual(self.solc_calls, 2)
+
+    def test_multiple_files(self):
+        compile_solidity_files_json([self.main_file, self.lib_file], libs={'Lib': '0x0'})
+        self.assertEqual(self.solc_calls, 1)
+        self.assertEqual(sorted(self.solc_input['sources']), ['Lib.sol', 'Main.sol'])
+        self.assertEqual(self.solc_input['settings']['libraries'], {'Lib.sol': {'Lib': '0x0'}, 'Main.sol': {'Lib': '0x0'}})
+
+        # Different set of files
+        compile_solidity_json(self.main_file)
+        self.assertEqual(self.solc_calls, 2)
+
+    def test_disabled(self):
+        cfg.solc_cache = False
+        compile_solidity_json(self.main_file)
+        compile_solidity_json(self.main_file)
+        self.assertEqual(self.solc_calls, 2)
+
+    def test_working_directory(self):
+        cwd = os.getcwd()
+        compile_solidity_json(self.main_file)
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertEqual(self.solc_base_path, os.path.abspath(self.tmp_dir.name))
+        self.assertEqual(self.solc_input['sources']['Main.sol']['urls'], ['Main.sol'])
+
+    def test_memory_cache_eviction(self):
+        with mock.patch.object(compiler, '_solc_memory_cache_entries', 2):
+            for runs in range(3):
+                compile_solidity_json(self.main_file, optimizer_runs=runs)
+            self.assertEqual(len(compiler._solc_cache), 2)
+
+            # Least recently used output was evicted from memory, but is still on disk
+            compile_solidity_json(self.main_file, optimizer_runs=0)
+            self.assertEqual(self.solc_calls, 3)
+            self.assertEqual(len(compiler._solc_cache), 2)
+
+    def test_disk_cache_eviction(self):
+        old_limit = cfg.solc_cache_size_limit
+        cfg.solc_cache_size_limit = 0
+        try:
+            compile_solidity_json(self.main_file, optimizer_runs=0)
+            compile_solidity_json(self.main_file, optimizer_runs=1)
+        finally:
+            cfg.solc_cache_size_limit = old_limit
+        # Only the most recent output is kept
+        self.assertEqual(len(os.listdir(os.path.join(cfg.data_dir, 'solc_cache'))), 1)
+        compiler._solc_cache.clear()
+        compile_solidity_json(self.main_file, optimizer_runs=1)
+        self.assertEqual(self.solc_calls, 2)
+        compile_solidity_json(self.main_file, optimizer_runs=0)
+        self.assertEqual(self.solc_calls, 3)
+
+
+class TestCheckCompilationOfFiles(TestCase):
+
+    def test_errors_reported(self):
+        errors = [
+            {'severity': 'error', 'message': 'm2', 'formattedMessage': 'B.sol:2: m2', 'sourceLocation': {'file': 'B.sol', 'start': 5}},
+            {'severity': 'warning', 'message': 'w', 'formattedMessage': 'A.sol:1: w', 'sourceLocation': {'file': 'A.sol', 'start': 0}},
+            {'severity': 'error', 'message': 'm1', 'formattedMessage': 'A.sol:3: m1', 'sourceLocation': {'file': 'A.sol', 'start': 9}},
+        ]
+
+        def fake_compile_standard(json_in, base_path, allow_paths):
+            raise SolcError('m1\nm2', stdout_data=json.dumps({'errors': errors}))
+
+        with tempfile.TemporaryDirectory() as d, mock.patch.object(compiler, 'compile_standard', fake_compile_standard):
+            files = [os.path.join(d, name) for name in ['A.sol', 'B.sol']]
+            for file in files:
+                with open(file, 'w') as f:
+                    f.write('pragma solidity ^0.6.0;\n')
+            with self.assertRaises(SolcException) as ctx:
+                check_compilation_of_files(files)
+        self.assertEqual(str(ctx.exception), 'A.sol:3: m1\nB.sol:2: m2')
@@ -0,0 +1,33 @@
+from zkay.compiler.privacy.offchain_compiler import PythonOffchainVisitor
+from zkay.compiler.privacy.transformation.zkay_contract_transformer import transform_ast
+from zkay.config import cfg
+from zkay.tests.zkay_unit_test import ZkayTestCase
+from zkay.zkay_ast.process_ast import get_processed_ast
+
+_code = f'''\
+pragma zkay >={cfg.zkay_version};
+
+contract Prefetch {{
+    mapping(uint => uint) m;
+    uint x;
+
+    function g(uint a) public returns (uint) {{
+        return m[a];
+    }}
+
+    function f(uint a, uint b) public returns (uint) {{
+        return g(a + 1) + m[b] + x;
+    }}
+}}
+'''
+
+
+class TestStatePrefetch(ZkayTestCase):
+    def _prefetch_calls(self):
+        ast, circuits = transform_ast(get_processed_ast(_code, solc_check=False))
+        code = PythonOffchainVisitor(list(circuits.values())).visit(ast)
+        return [line.strip() for line in code.splitlines() if 'self.state.prefetch' in line]
+
+    def test_callee_parameter_keys_not_prefetched(self):
+        # m[a] in g is keyed by the parameter of g, which is not the parameter a of f
+        self.assertEqual(self._prefetch_calls(), ['self.state.prefetch(("m", b), ("x", ))'])
@@ -3,7 +3,8 @@ from parameterized import parameterized_class
 
 from zkay.examples.examples import all_examples
 from zkay.tests.utils.test_examples import TestExamples
-from zkay.solidity_parser.parse import MyParser
+from zkay.tests.zkay_unit_test import ZkayTestCase
+from zkay.solidity_parser.parse import MyParser, SyntaxException
 from zkay.solidity_parser.parse import get_parse_tree
 
 
@@ -18,3 +19,12 @@ class TestParse(TestExamples):
         s = Trees.toStringTree(p.tree, None, p.parser)
         self.assertIsNotNone(s)
         self.assertIn(self.name, s)
+
+
+class TestParseErrors(ZkayTestCase):
+
+    def test_syntax_error(self):
+        code = 'pragma zkay >=0.2.0;\n\ncontract C {\n    function f() public {\n        uint x = ;\n    }\n}\n'
+        with self.assertRaises(SyntaxException) as cm:
+            get_parse_tree(code)
+        self.assertIn('uint x = ;', str(cm.exception))
@@ -0,0 +1,143 @@
+import secrets
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from zkay.tests.zkay_unit_test import ZkayTestCase
+from zkay.transaction.crypto import ecdh_curve
+
+# (randomness, public key, secret key) as computed by zkay.ZkayECDHGenerator
+keygen_vectors = [
+    ('00112233445566778899aabbccddeeff00112233445566778899aabbccddeeff',
+     'e9cba5fc36051fbeb8373ebe6f826f4b076d157f666960958e027b895fe0a3c',
+     '10112233445566778899aabbccddeeff00112233445566778899aabbccddeef8'),
+    ('ffeeddccbbaa99887766554433221100ffeeddccbbaa99887766554433221100',
+     '2f8cf9c452ded642227cb00143a3508d32d0538398b97e7f316e3a6b3e5d33d',
+     '1feeddccbbaa99887766554433221100ffeeddccbbaa99887766554433221100'),
+    ('0000000000000000000000000000000000000000000000000000000000000001',
+     '163c93360ebb9ed86f9868448d2802fa77e92f337e1324277bd388127c5170cb',
+     '1000000000000000000000000000000000000000000000000000000000000000'),
+]
+
+# (secret key, other public key, shared key) as computed by zkay.ZkayECDHGenerator
+shared_key_vectors = [
+    ('10112233445566778899aabbccddeeff00112233445566778899aabbccddeef8',
+     '2f8cf9c452ded642227cb00143a3508d32d0538398b97e7f316e3a6b3e5d33d',
+     'd1140d5649ade3050d49d6dea5e8fa29'),
+    ('1feeddccbbaa99887766554433221100ffeeddccbbaa99887766554433221100',
+     'e9cba5fc36051fbeb8373ebe6f826f4b076d157f666960958e027b895fe0a3c',
+     'd1140d5649ade3050d49d6dea5e8fa29'),
+    ('1000000000000000000000000000000000000000000000000000000000000000',
+     '2f8cf9c452ded642227cb00143a3508d32d0538398b97e7f316e3a6b3e5d33d',
+     '54f01a8091660c67f0176d1be46288e0'),
+]
+
+
+class TestEcdhCurve(ZkayTestCase):
+    def test_gen_keypair(self):
+        for rnd, pk, sk in keygen_vectors:
+            self.assertEqual(ecdh_curve.gen_keypair(bytes.fromhex(rnd)), (int(pk, 16), int(sk, 16)))
+
+    def test_ecdh_sha256(self):
+        for sk, pk, key in shared_key_vectors:
+            self.assertEqual(ecdh_curve.ecdh_sha256(int(pk, 16), int(sk, 16)).hex(), key)
+
+    def test_shared_key_symmetric(self):
+        pk1, sk1 = ecdh_curve.gen_keypair(secrets.token_bytes(32))
+        pk2, sk2 = ecdh_curve.gen_keypair(secrets.token_bytes(32))
+        self.assertEqual(ecdh_curve.ecdh_sha256(pk2, sk1), ecdh_curve.ecdh_sha256(pk1, sk2))
+
+    def test_gen_keypair_batch(self):
+        rnds = [bytes.fromhex(rnd) for rnd, _, _ in keygen_vectors]
+        self.assertEqual(ecdh_curve.gen_keypair_batch(rnds), [(int(pk, 16), int(sk, 16)) for _, pk, sk in keygen_vectors])
+
+    def test_scalar_mult_batch(self):
+        sks = [ecdh_curve.rnd_to_secret(secrets.token_bytes(32)) for _ in range(5)]
+        xs = [ecdh_curve.derive_pk(sk) for sk in sks]
+        batch = ecdh_curve.scalar_mult_batch(sks, xs)
+        self.assertEqual(batch, [ecdh_curve.scalar_mult_batch([sk], [x])[0] for sk, x in zip(sks, xs)])
+
+    def test_invalid_point(self):
+        x = next(x for x in range(1, 100) if not ecdh_curve._is_on_curve(x))
+        with self.assertRaises(ValueError):
+            ecdh_curve.scalar_mult(ecdh_curve.rnd_to_secret(secrets.token_bytes(32)), x)
+
+
+@unittest.skipIf(shutil.which('javac') is None, 'requires a java development kit')
+class TestEcdhCurveAgainstJar(ZkayTestCase):
+    def test_random_keys_match_jar(self):
+        from zkay.jsnark_interface.crypto_server import crypto_server
+        for _ in range(3):
+            rnds = [secrets.token_bytes(32) for _ in range(3)]
+            key_pairs = ecdh_curve.gen_keypair_batch(rnds)
+            self.assertEqual([crypto_server.ecdh_keypair(rnd) for rnd in rnds], key_pairs)
+            (pk1, sk1), (pk2, sk2) = key_pairs[:2]
+            self.assertEqual(crypto_server.ecdh_sha256(pk2, sk1), ecdh_curve.ecdh_sha256(pk2, sk1))
+
+
+class TestEcdhKeyCache(ZkayTestCase):
+    def test_cached_keys(self):
+        from zkay.config import cfg
+        from zkay.transaction.crypto.ecdh_base import EcdhBase
+
+        old_size, old_engine = cfg.ecdh_key_cache_size, cfg.ecdh_engine
+        cfg.ecdh_key_cache_size, cfg.ecdh_engine = 2, 'python'
+        try:
+            EcdhBase.clear_key_cache()
+            for sk, pk, key in shared_key_vectors:
+                self.assertEqual(EcdhBase._ecdh_sha256(int(pk, 16), int(sk, 16)).hex(), key)
+            self.assertEqual(len(EcdhBase._key_cache), 2)
+
+            hits = EcdhBase._key_cache_hits
+            sk, pk, key = shared_key_vectors[-1]
+            self.assertEqual(EcdhBase._ecdh_sha256(int(pk, 16), int(sk, 16)).hex(), key)
+            self.assertEqual(EcdhBase._key_cache_hits, hits + 1)
+
+            with mock.patch('zkay.my_logging.data') as log_data:
+                EcdhBase.clear_key_cache()
+            log_data.assert_has_calls([mock.call('ecdh_key_cache_hits', 1), mock.call('ecdh_key_cache_misses', len(shared_key_vectors))])
+            self.assertEqual(len(EcdhBase._key_cache), 0)
+            self.assertEqual((EcdhBase._key_cache_hits, EcdhBase._key_cache_misses), (0, 0))
+        finally:
+            cfg.ecdh_key_cache_size, cfg.ecdh_engine = old_size, old_engine
+
+    def test_concurrent_lookups(self):
+        from zkay.config import cfg
+        from zkay.transaction.crypto.ecdh_base import EcdhBase
+
+        old_size, old_engine = cfg.ecdh_key_cache_size, cfg.ecdh_engine
+        cfg.ecdh_key_cache_size, cfg.ecdh_engine = 2, 'python'
+        try:
+            EcdhBase.clear_key_cache()
+            with ThreadPoolExecutor(4) as executor:
+                keys = list(executor.map(lambda v: EcdhBase._ecdh_sha256(int(v[1], 16), int(v[0], 16)).hex(), shared_key_vectors * 8))
+            self.assertEqual(keys, [key for _, _, key in shared_key_vectors] * 8)
+            self.assertEqual(len(EcdhBase._key_cache), 2)
+            self.assertEqual(EcdhBase._key_cache_hits + EcdhBase._key_cache_misses, len(keys))
+        finally:
+            EcdhBase.clear_key_cache()
+            cfg.ecdh_key_cache_size, cfg.ecdh_engine = old_size, old_engine
+
+
+class TestEcdhKeyPairs(ZkayTestCase):
+    def test_generate_or_load_key_pairs(self):
+        from zkay.config import cfg
+        from zkay.transaction.crypto.ecdh_aes import EcdhAesCrypto
+
+        old_engine, old_data_dir = cfg.ecdh_engine, cfg.data_dir
+        cfg.ecdh_engine = 'python'
+        try:
+            with tempfile.TemporaryDirectory() as d:
+                cfg.data_dir = d
+                crypto = EcdhAesCrypto(None)
+                addresses = ['aa' * 20, 'bb' * 20, 'cc' * 20]
+                key_pairs = [(kp.pk[:], kp.sk.val) for kp in crypto._generate_or_load_key_pairs(addresses)]
+                self.assertEqual(len({pk[0] for pk, _ in key_pairs}), 3)
+
+                # Loaded again from the stored randomness
+                reloaded = [crypto._generate_or_load_key_pair(address) for address in addresses]
+                self.assertEqual([(kp.pk[:], kp.sk.val) for kp in reloaded], key_pairs)
+        finally:
+            cfg.ecdh_engine, cfg.data_dir = old_engine, old_data_dir
@@ -108,13 +108,14 @@ class TestOffchainBase(TestScenarios):
 
 
 @contextmanager
-def _mock_config(crypto: str, hash_opt, blockchain: str = 'w3-eth-tester'):
-    old_c, old_h, old_b = cfg.crypto_backend, cfg.should_use_hash, cfg.blockchain_backend
+def _mock_config(crypto: str, hash_opt, blockchain: str = 'w3-eth-tester', state_cache: bool = False):
+    old_c, old_h, old_b, old_s = cfg.crypto_backend, cfg.should_use_hash, cfg.blockchain_backend, cfg.blockchain_state_cache
     cfg.crypto_backend = crypto
     cfg.should_use_hash = (lambda _: hash_opt) if isinstance(hash_opt, bool) else hash_opt
     cfg.blockchain_backend = blockchain
+    cfg.blockchain_state_cache = state_cache
     yield
-    cfg.crypto_backend, cfg.should_use_hash, cfg.blockchain_backend = old_c, old_h, old_b
+    cfg.crypto_backend, cfg.should_use_hash, cfg.blockchain_backend, cfg.blockchain_state_cache = old_c, old_h, old_b, old_s
 
 
 #@parameterized_class(('name', 'scenario'), get_scenario('.py'))
@@ -134,6 +135,13 @@ class TestOffchainWithHashing(TestOffchainBase):
             self.run_scenario(suffix='WithHashing')
 
 
+@parameterized_class(('name', 'scenario'), all_scenarios)
+class TestOffchainWithStateCache(TestOffchainBase):
+    def test_offchain_simulation_dummy_with_state_cache(self):
+        with _mock_config('dummy', False, state_cache=True):
+            self.run_scenario(suffix='WithStateCache')
+
+
 @parameterized_class(('name', 'scenario'), enc_scenarios)
 class TestOffchainEcdhChaskeyEnc(TestOffchainBase):
     @unittest.skipIf(False or 'ZKAY_SKIP_REAL_ENC_TESTS' in os.environ and os.environ['ZKAY_SKIP_REAL_ENC_TESTS'] == '1', 'real encryption tests disabled')
@@ -0,0 +1,211 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from subprocess import SubprocessError
+from typing import List
+from unittest import mock
+
+from zkay.config import cfg
+from zkay.jsnark_interface import jsnark_interface
+from zkay.jsnark_interface.java_server import JavaServer
+from zkay.jsnark_interface.prover_server import JsnarkProverServer
+from zkay.tests.zkay_unit_test import ZkayTestCase
+from zkay.transaction.interface import ZkayProverInterface, ProofGenerationError
+from zkay.transaction.prover.jsnark import JsnarkProver
+
+
+class _SleepingProver(ZkayProverInterface):
+    def __init__(self):
+        super().__init__()
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def _generate_proof(self, verifier_dir: str, priv_values: List[int], in_vals: List[int], out_vals: List[int]) -> List[int]:
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        if in_vals[0] < 0:
+            raise ProofGenerationError('invalid input')
+        return [in_vals[0] + out_vals[0]]
+
+    def get_prover_key_hash(self, verifier_directory: str) -> bytes:
+        return bytes(32)
+
+
+class TestProofGenerationPool(ZkayTestCase):
+    def setUp(self):
+        super().setUp()
+        self.old_workers = cfg.proof_generation_workers
+        cfg.proof_generation_workers = 3
+        self.prover = _SleepingProver()
+
+    def tearDown(self):
+        self.prover.shutdown()
+        cfg.proof_generation_workers = self.old_workers
+        super().tearDown()
+
+    def test_batch_order_and_parallelism(self):
+        requests = [('dir', 'C', 'f', [], [i], [10 * i]) for i in range(7)]
+        proofs = self.prover.generate_proofs_batch(requests)
+        self.assertEqual(proofs, [[11 * i] for i in range(7)])
+        self.assertGreater(self.prover.max_active, 1)
+        self.assertLessEqual(self.prover.max_active, 3)
+
+    def test_async_error(self):
+        future = self.prover.generate_proof_async('dir', 'C', 'f', [], [-1], [0])
+        with self.assertRaises(ProofGenerationError):
+            future.result()
+
+
+class TestJsnarkProverServer(ZkayTestCase):
+    def test_circuit_built_once(self):
+        requests = []
+
+        def request(server: JsnarkProverServer, *args: str):
+            # Simulates the jvm side, which writes circuit.arith only when building the circuit
+            work_dir = server._JsnarkProverServer__work_dir
+            if not requests:
+                server._start()
+                work_dir = server._JsnarkProverServer__work_dir
+                with open(os.path.join(work_dir, 'circuit.arith'), 'w') as f:
+                    f.write('circuit')
+            requests.append(args)
+            with open(os.path.join(work_dir, 'circuit.in'), 'w') as f:
+                f.write(' '.join(args[1:]))
+            return []
+
+        with tempfile.TemporaryDirectory() as circuit_dir, tempfile.TemporaryDirectory() as output_dir:
+            with open(os.path.join(circuit_dir, f'{cfg.jsnark_circuit_classname}.class'), 'w') as f:
+                f.write('class')
+            server = JsnarkProverServer(circuit_dir)
+            with mock.patch.object(JavaServer, '_start'), mock.patch.object(JavaServer, 'request', request):
+                for i in range(3):
+                    proof_dir = os.path.join(output_dir, str(i))
+                    os.mkdir(proof_dir)
+                    server.prepare_proof(proof_dir, [i, 16])
+                    with open(os.path.join(proof_dir, 'circuit.arith')) as f:
+                        self.assertEqual(f.read(), 'circuit')
+                    with open(os.path.join(proof_dir, 'circuit.in')) as f:
+                        self.assertEqual(f.read(), f'{i} 10')
+                server.shutdown()
+        self.assertEqual(requests, [('prove', str(i), '10') for i in range(3)])
+
+
+@unittest.skipIf(shutil.which('javac') is None, 'requires a java development kit')
+class TestJsnarkProverServerWithJar(ZkayTestCase):
+    # out0 = in0 + 1
+    statements = [
+        'addIn("in0", 1, ZkUint(32));',
+        'addOut("out0", 1, ZkUint(32));',
+        'decl("t0", o_(get("in0"), \'+\', val(1, ZkUint(32))));',
+        'checkEq("t0", "out0");',
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.circuit_dir = os.path.join(self.tmp_dir.name, 'circuit')
+        os.mkdir(self.circuit_dir)
+        javacode = jsnark_interface._class_template_str.format(
+            circuit_class_name=cfg.jsnark_circuit_classname, circuit_name='TestVerifier', crypto_backend=cfg.crypto_backend,
+            key_bits=cfg.key_bits, pub_in_size=1, pub_out_size=1, priv_in_size=0, use_input_hashing='false', fdefs='',
+            circuit_statements='\n'.join(self.statements))
+        jsnark_interface.compile_circuit(self.circuit_dir, javacode)
+
+    def _output_dir(self, name: str) -> str:
+        d = os.path.join(self.tmp_dir.name, name)
+        os.mkdir(d)
+        return d
+
+    @staticmethod
+    def _read(d: str, filename: str) -> str:
+        with open(os.path.join(d, filename)) as f:
+            return f.read()
+
+    def test_same_output_as_single_run(self):
+        server = JsnarkProverServer(self.circuit_dir)
+        self.addCleanup(server.shutdown)
+        for i in range(3):
+            expected_dir, server_dir = self._output_dir(f'expected{i}'), self._output_dir(f'server{i}')
+            jsnark_interface.prepare_proof(self.circuit_dir, expected_dir, [i, i + 1])
+            server.prepare_proof(server_dir, [i, i + 1])
+            self.assertEqual(self._read(server_dir, 'circuit.in'), self._read(expected_dir, 'circuit.in'))
+            self.assertEqual(self._read(server_dir, 'circuit.arith'), self._read(self.circuit_dir, 'circuit.arith'))
+
+    def test_invalid_inputs(self):
+        server = JsnarkProverServer(self.circuit_dir)
+        self.addCleanup(server.shutdown)
+        with self.assertRaises(SubprocessError):
+            server.prepare_proof(self._output_dir('invalid'), [1, 3])
+
+        # The server is still usable afterwards
+        valid_dir = self._output_dir('valid')
+        server.prepare_proof(valid_dir, [1, 2])
+        self.assertTrue(os.path.exists(os.path.join(valid_dir, 'circuit.in')))
+
+
+class _FakeServer:
+    def __init__(self, circuit_dir: str):
+        self.circuit_dir = circuit_dir
+        self.running = True
+
+    def shutdown(self):
+        self.running = False
+
+
+class TestJsnarkProverServerPool(ZkayTestCase):
+    def setUp(self):
+        super().setUp()
+        self.old_workers = cfg.proof_generation_workers
+        cfg.proof_generation_workers = 2
+        self.prover = JsnarkProver()
+        self.created = []
+        patcher = mock.patch('zkay.transaction.prover.jsnark.JsnarkProverServer',
+                             lambda d: self.created.append(_FakeServer(d)) or self.created[-1])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        cfg.proof_generation_workers = self.old_workers
+        super().tearDown()
+
+    def acquire(self, circuit_dir: str):
+        return self.prover._JsnarkProver__acquire_server(circuit_dir)
+
+    def test_reuse_and_eviction(self):
+        for d in ['/a', '/b', '/a', '/b']:
+            with self.acquire(d):
+                pass
+        self.assertEqual([s.circuit_dir for s in self.created], ['/a', '/b'])
+
+        # Only two servers may exist, the least recently used idle one is shut down
+        with self.acquire('/c') as server:
+            self.assertEqual(server.circuit_dir, '/c')
+        self.assertEqual([s.running for s in self.created], [False, True, True])
+        with self.acquire('/b') as server:
+            self.assertIs(server, self.created[1])
+
+    def test_wait_for_release(self):
+        acquired = threading.Event()
+
+        def other_circuit():
+            with self.acquire('/c'):
+                acquired.set()
+
+        with self.acquire('/a'), self.acquire('/b'):
+            t = threading.Thread(target=other_circuit)
+            t.start()
+            # All servers are in use
+            self.assertFalse(acquired.wait(0.1))
+        t.join()
+        self.assertTrue(acquired.is_set())
+        self.assertEqual(len(self.created), 3)
+        self.assertEqual(sum(s.running for s in self.created), 2)
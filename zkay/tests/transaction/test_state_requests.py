@@ -0,0 +1,198 @@
+import threading
+import time
+from unittest import mock
+
+from hexbytes import HexBytes
+from web3 import Web3
+
+from zkay.config import cfg
+from zkay.tests.zkay_unit_test import ZkayTestCase
+from zkay.transaction.blockchain.web3py import Web3HttpBlockchain
+from zkay.transaction.interface import ZkayBlockchainInterface, BlockChainError
+from zkay.transaction.offchain import ApiWrapper
+
+
+class _SlowChain(ZkayBlockchainInterface):
+    """Blockchain backend without batch support, each state request takes a while."""
+
+    def __init__(self):
+        super().__init__()
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def _req_state_var(self, contract_handle, name: str, *indices):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        if name == 'missing':
+            raise BlockChainError('no such variable')
+        return sum(indices)
+
+    def _req_state_vars(self, contract_handle, requests):
+        return self._req_state_vars_concurrently(contract_handle, requests)
+
+
+class _SequentialChain(_SlowChain):
+    """Blockchain backend whose connection must not be used concurrently."""
+
+    def _req_state_vars(self, contract_handle, requests):
+        return ZkayBlockchainInterface._req_state_vars(self, contract_handle, requests)
+
+
+_SlowChain.__abstractmethods__ = frozenset()
+_SequentialChain.__abstractmethods__ = frozenset()
+
+
+class TestConcurrentStateRequests(ZkayTestCase):
+    def setUp(self):
+        super().setUp()
+        self.old_workers = cfg.blockchain_request_workers
+        cfg.blockchain_request_workers = 3
+
+    def tearDown(self):
+        cfg.blockchain_request_workers = self.old_workers
+        super().tearDown()
+
+    def test_values_in_order(self):
+        chain = _SlowChain()
+        vals = chain.req_state_vars(object(), [('m', (i, )) for i in range(6)])
+        self.assertEqual(vals, list(range(6)))
+        self.assertEqual(chain.max_active, 3)
+
+    def test_single_worker(self):
+        cfg.blockchain_request_workers = 1
+        chain = _SlowChain()
+        vals = chain.req_state_vars(object(), [('m', (i, 1)) for i in range(3)])
+        self.assertEqual(vals, [1, 2, 3])
+        self.assertEqual(chain.max_active, 1)
+
+    def test_sequential_by_default(self):
+        chain = _SequentialChain()
+        vals = chain.req_state_vars(object(), [('m', (i, )) for i in range(4)])
+        self.assertEqual(vals, list(range(4)))
+        self.assertEqual(chain.max_active, 1)
+
+    def test_error(self):
+        chain = _SlowChain()
+        with self.assertRaises(BlockChainError):
+            chain.req_state_vars(object(), [('m', (1, )), ('missing', ()), ('m', (2, ))])
+
+
+class _FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+class _FakeSession:
+    """Answers json-rpc batches of eth_call requests with the encoded sum of the arguments."""
+
+    def __init__(self, w3, batch_support=True):
+        self.w3 = w3
+        self.batch_support = batch_support
+        self.batches = []
+
+    def post(self, url, json, timeout):
+        self.batches.append(json)
+        if not self.batch_support:
+            return _FakeResponse({'jsonrpc': '2.0', 'id': None, 'error': {'code': -32600, 'message': 'batch not supported'}})
+        responses = []
+        for req in reversed(json):
+            data = HexBytes(req['params'][0]['data'])
+            args = self.w3.codec.decode_abi(['uint256', 'address'], data[4:])
+            responses.append({'jsonrpc': '2.0', 'id': req['id'], 'result': self.w3.codec.encode_abi(['uint256'], [args[0]]).hex()})
+        return _FakeResponse(responses)
+
+
+class TestHttpBatchStateRequests(ZkayTestCase):
+    abi = [{'name': 'bal', 'type': 'function', 'stateMutability': 'view',
+            'inputs': [{'name': 'idx', 'type': 'uint256'}, {'name': 'owner', 'type': 'address'}],
+            'outputs': [{'name': '', 'type': 'uint256'}]}]
+    owner = Web3.toChecksumAddress('0x' + '12' * 20)
+
+    def setUp(self):
+        super().setUp()
+        self.chain = Web3HttpBlockchain.__new__(Web3HttpBlockchain)
+        self.chain.w3 = Web3(Web3.HTTPProvider('http://localhost:8545'))
+        self.contract = self.chain.w3.eth.contract(address=Web3.toChecksumAddress('0x' + 'ab' * 20), abi=self.abi)
+
+    def test_batch(self):
+        self.chain._session = _FakeSession(self.chain.w3)
+        vals = self.chain._req_state_vars(self.contract, [('bal', (i, self.owner)) for i in range(4)])
+        self.assertEqual(vals, list(range(4)))
+        self.assertEqual(len(self.chain._session.batches), 1)
+
+    def test_no_batch_support(self):
+        self.chain._session = _FakeSession(self.chain.w3, batch_support=False)
+        self.chain._req_state_var = lambda contract_handle, name, *indices: indices[0]
+        old_workers, cfg.blockchain_request_workers = cfg.blockchain_request_workers, 2
+        try:
+            vals = self.chain._req_state_vars(self.contract, [('bal', (i, self.owner)) for i in range(3)])
+        finally:
+            cfg.blockchain_request_workers = old_workers
+        self.assertEqual(vals, [0, 1, 2])
+
+
+class _CountingChain:
+    """Blockchain connection which counts the requests sent to the node."""
+
+    def __init__(self):
+        self.block_number_requests = 0
+        self.state_requests = 0
+
+    def get_block_number(self):
+        self.block_number_requests += 1
+        return 1
+
+    def get_special_variables(self, sender, wei_amount):
+        return None, None, None
+
+    def req_state_var(self, contract_handle, name, *indices):
+        self.state_requests += 1
+        return sum(indices)
+
+    def req_state_vars(self, contract_handle, requests):
+        self.state_requests += len(requests)
+        return [sum(indices) for _, indices in requests]
+
+
+class TestStateCacheSync(ZkayTestCase):
+    def setUp(self):
+        super().setUp()
+        self.old_state_cache = cfg.blockchain_state_cache
+        cfg.blockchain_state_cache = True
+        self.chain = _CountingChain()
+        with mock.patch('zkay.transaction.runtime.Runtime.blockchain', return_value=self.chain), \
+                mock.patch('zkay.transaction.runtime.Runtime.keystore'), \
+                mock.patch('zkay.transaction.runtime.Runtime.crypto'), \
+                mock.patch('zkay.transaction.runtime.Runtime.prover'):
+            self.api = ApiWrapper('.', 'Contract', None)
+        self.api._ApiWrapper__contract_handle = object()
+
+    def tearDown(self):
+        cfg.blockchain_state_cache = self.old_state_cache
+        super().tearDown()
+
+    def test_sync_once_per_transaction(self):
+        with self.api.api_function_ctx(0, 0):
+            for _ in range(3):
+                self.api._req_state_var('x', 1)
+                self.api._req_state_vars([('y', (2, ), 0), ('z', (3, ), 2)])
+        self.assertEqual(self.chain.block_number_requests, 1)
+        self.assertEqual(self.chain.state_requests, 4)
+
+    def test_no_sync_outside_transaction(self):
+        for _ in range(3):
+            self.assertEqual(self.api._req_state_var('x', 1), 1)
+            self.assertEqual(self.api._req_state_vars([('y', (2, ), 0)]), [2])
+        self.assertEqual(self.chain.block_number_requests, 0)
+        self.assertEqual(self.chain.state_requests, 6)
@@ -1,5 +1,8 @@
+import os
+import tempfile
+
 from zkay.tests.zkay_unit_test import ZkayTestCase
-from zkay.utils.helpers import lines_of_code
+from zkay.utils.helpers import lines_of_code, hash_file, hash_file_cached
 
 example_code = """pragma solidity ^0.6.0;
 
@@ -32,3 +35,22 @@ class TestHelpers(ZkayTestCase):
     def test_lines_of_code(self):
         loc = lines_of_code(example_code)
         self.assertEqual(loc, 22)
+
+    def test_hash_file_cached(self):
+        with tempfile.TemporaryDirectory() as d:
+            filename = os.path.join(d, 'proving.key')
+            with open(filename, 'wb') as f:
+                f.write(b'key')
+            self.assertEqual(hash_file_cached(filename), hash_file(filename))
+            self.assertTrue(os.path.exists(f'{filename}.hash'))
+
+            # Tamper with the cached digest, it is used as long as the file does not change
+            with open(f'{filename}.hash') as f:
+                cached = f.read()
+            with open(f'{filename}.hash', 'w') as f:
+                f.write(cached.replace(hash_file(filename).hex(), '00' * 32))
+            self.assertEqual(hash_file_cached(filename), bytes(32))
+
+            with open(filename, 'wb') as f:
+                f.write(b'new key')
+            self.assertEqual(hash_file_cached(filename), hash_file(filename))
@@ -0,0 +1,96 @@
+import threading
+import time
+
+from zkay.tests.zkay_unit_test import ZkayTestCase
+from zkay.utils.job_scheduler import MemoryAwareScheduler
+
+
+class TestMemoryAwareScheduler(ZkayTestCase):
+
+    def test_dependencies(self):
+        order = []
+        scheduler = MemoryAwareScheduler(4, 1000)
+        a = scheduler.add_job('a', lambda: order.append('a') or 1, 10)
+        b = scheduler.add_job('b', lambda: order.append('b') or a.result + 1, 10, [a])
+        scheduler.add_job('c', lambda: order.append('c'), lambda: 10 * b.result, [b])
+        scheduler.run()
+        self.assertEqual(order, ['a', 'b', 'c'])
+        self.assertEqual(b.result, 2)
+
+    def test_memory_limit(self):
+        lock = threading.Lock()
+        used, max_used = [0], [0]
+
+        def job(memory):
+            def fct():
+                with lock:
+                    used[0] += memory
+                    max_used[0] = max(max_used[0], used[0])
+                time.sleep(0.02)
+                with lock:
+                    used[0] -= memory
+            return fct
+
+        scheduler = MemoryAwareScheduler(8, 100)
+        for i, memory in enumerate([60, 30, 50, 20, 150, 40, 10]):
+            scheduler.add_job(str(i), job(memory), memory)
+        scheduler.run()
+        self.assertTrue(all(job.done for job in scheduler.jobs))
+        # The job which exceeds the limit runs alone
+        self.assertEqual(max_used[0], 150)
+
+        max_used[0] = 0
+        scheduler = MemoryAwareScheduler(8, 100)
+        for i, memory in enumerate([60, 30, 50, 20, 40, 10]):
+            scheduler.add_job(str(i), job(memory), memory)
+        scheduler.run()
+        self.assertLessEqual(max_used[0], 100)
+
+    def test_error(self):
+        def fail():
+            raise ValueError('failed')
+
+        scheduler = MemoryAwareScheduler(1, 100)
+        scheduler.add_job('a', fail, 10)
+        b = scheduler.add_job('b', lambda: None, 10)
+        with self.assertRaises(ValueError):
+            scheduler.run()
+        self.assertFalse(b.done)
+
+    def test_pass_memory(self):
+        scheduler = MemoryAwareScheduler(2, 100)
+        a = scheduler.add_job('a', lambda memory: memory, 30, pass_memory=True)
+        b = scheduler.add_job('b', lambda memory: memory, 150, pass_memory=True)
+        scheduler.run()
+        self.assertEqual((a.result, b.result), (30, 100))
+
+    def test_retry_memory(self):
+        lock = threading.Lock()
+        running, concurrent_with_retry = [0], [False]
+
+        def fct(memory):
+            with lock:
+                running[0] += 1
+                if memory == 100 and running[0] > 1:
+                    concurrent_with_retry[0] = True
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+            if memory < 100:
+                raise ValueError('out of memory')
+            return memory
+
+        scheduler = MemoryAwareScheduler(4, 100)
+        a = scheduler.add_job('a', fct, 20, pass_memory=True, retry_memory=100)
+        b = scheduler.add_job('b', lambda: None, 20)
+        scheduler.run()
+        self.assertEqual(a.result, 100)
+        self.assertTrue(b.done)
+        # The retry reserves the whole budget, so it never runs concurrently with other jobs
+        self.assertFalse(concurrent_with_retry[0])
+
+        scheduler = MemoryAwareScheduler(4, 100)
+        scheduler.add_job('a', fct, 150, pass_memory=True, retry_memory=200)
+        scheduler.add_job('b', fct, 20, pass_memory=True)
+        with self.assertRaises(ValueError):
+            scheduler.run()
@@ -39,3 +39,18 @@ class TestTimer(ZkayTestCase):
         content = read_file(log_file + '_data.log')
         d = json.loads(content)
         self.assertAlmostEqual(0.5, d['value'], 1)
+
+    def test_timer_exception(self):
+        log_file = base_log_file + '_exception'
+        my_logging.prepare_logger(log_file)
+        my_logging.shutdown()
+
+        with self.assertRaises(ValueError):
+            with time_measure('mykey3'):
+                time.sleep(0.2)
+                raise ValueError()
+
+        content = read_file(log_file + '_data.log')
+        d = json.loads(content)
+        self.assertEqual(d['key'], 'mykey3')
+        self.assertAlmostEqual(0.2, d['value'], 1)
@@ -2,10 +2,27 @@ from parameterized import parameterized_class
 
 from zkay.examples.examples import all_examples
 from zkay.tests.utils.test_examples import TestExamples
+from zkay.zkay_ast.ast import AST, IndexExpr, NumberLiteralExpr
 from zkay.zkay_ast.build_ast import build_ast
+from zkay.zkay_ast.pointers.parent_setter import set_parents
+from zkay.zkay_ast.pointers.symbol_table import link_identifiers
+from zkay.zkay_ast.process_ast import get_processed_ast
 from zkay.zkay_ast.visitor.deep_copy import deep_copy
 
 
+def _get_links(ast: AST, links: list):
+    """Collect the pointers set by set_parents and link_identifiers for all nodes in ast."""
+    ids = lambda l: None if l is None else [id(e) for e in l]
+    links.append((
+        type(ast), id(ast.parent), ids(ast.namespace), id(getattr(ast, 'statement', None)), id(getattr(ast, 'function', None)),
+        {name: id(idf) for name, idf in ast.names.items()} if isinstance(ast.names, dict) else None,
+        None if isinstance(ast, IndexExpr) else id(getattr(ast, 'target', None))
+    ))
+    for c in ast.children():
+        _get_links(c, links)
+    return links
+
+
 @parameterized_class(('name', 'example'), all_examples)
 class TestParentSetter(TestExamples):
 
@@ -13,3 +30,33 @@ class TestParentSetter(TestExamples):
         ast = build_ast(self.example.code())
         ast_2 = deep_copy(ast)
         self.assertEqual(str(ast), str(ast_2))
+
+    def test_deep_copy_links(self):
+        ast = get_processed_ast(self.example.code(), type_check=False, solc_check=False)
+        for c in ast.contracts:
+            for fct in c.constructor_definitions + c.function_definitions:
+                body = deep_copy(fct.body, with_types=True, with_analysis=True)
+                links = _get_links(body, [])
+                set_parents(body)
+                link_identifiers(body)
+                self.assertEqual(links, _get_links(body, []))
+
+    def test_deep_copy_share_immutable(self):
+        ast = get_processed_ast(self.example.code(), type_check=False, solc_check=False)
+        ast_2 = deep_copy(ast, share_immutable=True)
+        self.assertEqual(str(ast), str(ast_2))
+        for c, c_2 in zip(ast.contracts, ast_2.contracts):
+            self.assertIsNot(c, c_2)
+            self.assertIsNot(c.idf, c_2.idf)
+            for lit in (n for n in _iter_nodes(c) if isinstance(n, NumberLiteralExpr)):
+                self.assertIs(lit.parent, _find_parent(c, lit))
+
+
+def _iter_nodes(ast: AST):
+    yield ast
+    for c in ast.children():
+        yield from _iter_nodes(c)
+
+
+def _find_parent(root: AST, ast: AST):
+    return next(n for n in _iter_nodes(root) if any(c is ast for c in n.children()))
@@ -0,0 +1,71 @@
+import os
+import pickle
+import tempfile
+
+from zkay.config import cfg
+from zkay.examples.examples import simple_storage, empty
+from zkay.tests.zkay_unit_test import ZkayTestCase
+from zkay.zkay_ast.parse_cache import build_ast_cached, get_cache_file
+
+
+class TestParseCache(ZkayTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.old_data_dir, self.old_parse_cache = cfg.data_dir, cfg.parse_cache
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        cfg.data_dir = self.tmp_dir.name
+        cfg.parse_cache = True
+
+    def tearDown(self) -> None:
+        cfg.data_dir, cfg.parse_cache = self.old_data_dir, self.old_parse_cache
+        self.tmp_dir.cleanup()
+        super().tearDown()
+
+    def test_cache_hit(self):
+        code = simple_storage.code()
+        ast = build_ast_cached(code)
+        self.assertTrue(os.path.exists(get_cache_file(code)))
+
+        cached_ast = build_ast_cached(code)
+        self.assertIsNot(cached_ast, ast)
+        self.assertEqual(str(cached_ast), str(ast))
+        self.assertEqual(cached_ast.original_code, ast.original_code)
+        self.assertEqual(cached_ast.contracts[0].line, ast.contracts[0].line)
+
+    def test_corrupt_cache_file(self):
+        code = simple_storage.code()
+        os.makedirs(os.path.dirname(get_cache_file(code)))
+        with open(get_cache_file(code), 'wb') as f:
+            f.write(b'garbage')
+        ast = build_ast_cached(code)
+        with open(get_cache_file(code), 'rb') as f:
+            self.assertNotEqual(f.read(), b'garbage')
+        self.assertEqual(str(build_ast_cached(code)), str(ast))
+
+    def test_incompatible_cache_file(self):
+        code = simple_storage.code()
+        os.makedirs(os.path.dirname(get_cache_file(code)))
+        with open(get_cache_file(code), 'wb') as f:
+            pickle.dump('not an ast', f)
+        ast = build_ast_cached(code)
+        with open(get_cache_file(code), 'rb') as f:
+            self.assertEqual(str(pickle.load(f)), str(ast))
+
+    def test_size_limit(self):
+        old_limit = cfg.parse_cache_size_limit
+        cfg.parse_cache_size_limit = 0
+        try:
+            build_ast_cached(simple_storage.code())
+            build_ast_cached(empty.code())
+        finally:
+            cfg.parse_cache_size_limit = old_limit
+        # Only the most recent AST is kept
+        self.assertFalse(os.path.exists(get_cache_file(simple_storage.code())))
+        self.assertTrue(os.path.exists(get_cache_file(empty.code())))
+
+    def test_disabled(self):
+        cfg.parse_cache = False
+        code = simple_storage.code()
+        build_ast_cached(code)
+        self.assertFalse(os.path.exists(get_cache_file(code)))
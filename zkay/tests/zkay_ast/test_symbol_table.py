@@ -1,13 +1,56 @@
+import os
+import time
+import unittest
+
 from parameterized import parameterized_class
 
 from zkay.examples.examples import simple, simple_storage, all_examples
 from zkay.tests.utils.test_examples import TestExamples
 from zkay.tests.zkay_unit_test import ZkayTestCase
-from zkay.zkay_ast.ast import SourceUnit, VariableDeclarationStatement, IdentifierExpr, \
+from zkay.zkay_ast.ast import AST, SourceUnit, VariableDeclarationStatement, IdentifierExpr, \
     AssignmentStatement
 from zkay.zkay_ast.build_ast import build_ast
 from zkay.zkay_ast.pointers.parent_setter import set_parents
-from zkay.zkay_ast.pointers.symbol_table import fill_symbol_table, link_identifiers, get_builtin_globals
+from zkay.zkay_ast.pointers.symbol_table import fill_symbol_table, link_identifiers, get_builtin_globals, \
+    link_fragment_identifiers, ScopeIndex, SymbolTableLinker
+
+shadowing_code = """pragma zkay >=0.2.0;
+
+contract Shadowing {
+    uint x;
+
+    function f() public {
+        x = 1;
+        uint y = x + 1;
+        uint x = x + y;
+        x = 2;
+    }
+}
+"""
+
+
+def _nested_code(depth: int, refs: int) -> str:
+    """Contract with blocks nested depth levels deep, each level shadows x and references variables of all enclosing levels."""
+    body = ''
+    for i in range(depth, 0, -1):
+        uses = ' + '.join(f'v{j % i}' for j in range(refs))
+        body = f"""
+        if (x > {i}) {{
+            x = x + v{i - 1};
+            uint v{i} = {uses};
+            uint x = v{i} + x;{body}
+            x = x + v{i};
+        }}"""
+    return f"""pragma zkay >=0.2.0;
+
+contract Nested {{
+    uint x;
+
+    function f(uint v0) public {{{body}
+        x = v0;
+    }}
+}}
+"""
 
 
 class TestSimpleAST(ZkayTestCase):
@@ -73,6 +116,44 @@ class TestSimpleStorageAST(ZkayTestCase):
         self.assertEqual(x.idf.name, 'x')
 
 
+class TestLinkFragment(ZkayTestCase):
+
+    def test_link_fragment_identifiers(self):
+        ast = build_ast(shadowing_code)
+        set_parents(ast)
+        link_identifiers(ast)
+        state_x = ast['Shadowing']['x']
+        stmts = ast['Shadowing']['f'].body.statements
+        local_x, local_y = stmts[2].variable_declaration, stmts[1].variable_declaration
+
+        def relink(old: IdentifierExpr, name: str) -> IdentifierExpr:
+            new = IdentifierExpr(name)
+            new.parent = old.parent
+            link_fragment_identifiers(new)
+            return new
+
+        self.assertIs(relink(stmts[0].lhs, 'x').target, state_x)
+        self.assertIs(relink(stmts[1].expr.args[0], 'x').target, state_x)
+        self.assertIs(relink(stmts[2].expr.args[0], 'x').target, state_x)
+        self.assertIs(relink(stmts[2].expr.args[1], 'y').target, local_y)
+        self.assertIs(relink(stmts[3].lhs, 'x').target, local_x)
+
+        # Fragment with multiple references to the same name
+        fragment = IdentifierExpr('x').binop('+', IdentifierExpr('x'))
+        fragment.parent = stmts[3]
+        set_parents(fragment)
+        link_fragment_identifiers(fragment)
+        self.assertIs(fragment.args[0].target, local_x)
+        self.assertIs(fragment.args[1].target, local_x)
+
+
+def _identifier_exprs(ast: AST):
+    if isinstance(ast, IdentifierExpr):
+        yield ast
+    for c in ast.children():
+        yield from _identifier_exprs(c)
+
+
 @parameterized_class(('name', 'example'), all_examples)
 class TestSymbolTable(TestExamples):
 
@@ -83,3 +164,78 @@ class TestSymbolTable(TestExamples):
         link_identifiers(ast)
         contract = ast.contracts[0]
         self.assertEqual(contract.idf.name, self.name)
+
+    def test_link_fragment_identifiers(self):
+        ast = build_ast(self.example.code())
+        set_parents(ast)
+        link_identifiers(ast)
+        for idf_expr in _identifier_exprs(ast):
+            new = IdentifierExpr(idf_expr.idf.name)
+            new.parent = idf_expr.parent
+            link_fragment_identifiers(new)
+            self.assertIs(new.target, idf_expr.target)
+
+    def test_scope_index(self):
+        ast = build_ast(self.example.code())
+        set_parents(ast)
+        link_identifiers(ast)
+        for c in ast.contracts:
+            for fct in c.constructor_definitions + c.function_definitions:
+                index = ScopeIndex(fct)
+                for idf_expr in _identifier_exprs(fct):
+                    self.assertIs(index.find_identifier_declaration(idf_expr), SymbolTableLinker.find_identifier_declaration(idf_expr))
+                    for idf in list(fct.names.values()) + list(fct.body.names.values()) + list(c.names.values()):
+                        self.assertEqual(index.in_scope_at(idf, idf_expr), SymbolTableLinker.in_scope_at(idf, idf_expr))
+
+
+class _ParentWalkLinker(SymbolTableLinker):
+    """Linker which resolves all references by walking the parent pointers."""
+
+    def visitIdentifierExpr(self, ast: IdentifierExpr):
+        ast.target = self.find_identifier_declaration(ast)
+
+
+class TestScopeIndex(ZkayTestCase):
+
+    def test_deep_nesting(self):
+        ast = build_ast(_nested_code(30, 4))
+        set_parents(ast)
+        link_identifiers(ast)
+        fct = ast['Nested']['f']
+        index = ScopeIndex(fct)
+        idf_exprs = list(_identifier_exprs(fct))
+        self.assertGreater(len(idf_exprs), 30 * 6)
+        for idf_expr in idf_exprs:
+            self.assertIs(idf_expr.target, SymbolTableLinker.find_identifier_declaration(idf_expr))
+            self.assertIs(idf_expr.target, index.find_identifier_declaration(idf_expr))
+
+        # The assignment to x at the start of each level references the x declared one level above
+        state_x = ast['Nested']['x']
+        stmts = fct.body.statements
+        self.assertIs(stmts[1].lhs.target, state_x)
+        inner = stmts[0].then_branch.statements
+        self.assertIs(inner[0].lhs.target, state_x)
+        self.assertIs(inner[3].then_branch.statements[0].lhs.target, inner[2].variable_declaration)
+        self.assertTrue(index.in_scope_at(inner[1].variable_declaration.idf, inner[3].then_branch))
+        self.assertFalse(index.in_scope_at(inner[3].then_branch.statements[1].variable_declaration.idf, inner[4]))
+        self.assertTrue(index.in_scope_at(state_x.idf, inner[4]))
+
+
+@unittest.skipUnless(os.environ.get('ZKAY_RUN_BENCHMARKS') == '1', 'benchmarks disabled')
+class BenchmarkScopeIndex(ZkayTestCase):
+    def test_benchmark_deep_nesting(self):
+        for depth in [10, 25, 50]:
+            ast = build_ast(_nested_code(depth, 32))
+            set_parents(ast)
+            fill_symbol_table(ast)
+
+            # Best of 5 runs
+            t_parent_walk, t_index = float('inf'), float('inf')
+            for _ in range(5):
+                start = time.perf_counter()
+                _ParentWalkLinker().visit(ast)
+                t_parent_walk = min(t_parent_walk, time.perf_counter() - start)
+                start = time.perf_counter()
+                SymbolTableLinker().visit(ast)
+                t_index = min(t_index, time.perf_counter() - start)
+            print(f'\nLink nesting depth {depth}: parent walk {t_parent_walk:.3f}s, scope index {t_index:.3f}s')
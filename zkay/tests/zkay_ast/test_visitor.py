@@ -0,0 +1,85 @@
+import os
+import time
+import unittest
+
+from zkay.examples.examples import code_dir, collect_examples
+from zkay.tests.zkay_unit_test import ZkayTestCase
+from zkay.zkay_ast.ast import AST, Expression, NumberLiteralExpr, BooleanLiteralExpr, LiteralExpr
+from zkay.zkay_ast.build_ast import build_ast
+from zkay.zkay_ast.pointers.parent_setter import set_parents
+from zkay.zkay_ast.visitor.solidity_visitor import to_solidity
+from zkay.zkay_ast.visitor.visitor import AstVisitor, clear_dispatch_tables
+
+
+class _LiteralVisitor(AstVisitor):
+    def visitExpression(self, ast: Expression):
+        return 'expr'
+
+    @staticmethod
+    def visitBooleanLiteralExpr(ast: BooleanLiteralExpr):
+        return 'bool'
+
+
+class _UncachedVisitor(AstVisitor):
+    """Visit function lookup as done before the introduction of dispatch tables."""
+
+    def get_visit_function(self, c):
+        visitor_function = 'visit' + c.__name__
+        if hasattr(self, visitor_function):
+            return getattr(self, visitor_function)
+        else:
+            for base in c.__bases__:
+                f = self.get_visit_function(base)
+                if f:
+                    return f
+        return None
+
+
+class TestVisitorDispatch(ZkayTestCase):
+    def tearDown(self):
+        if hasattr(_LiteralVisitor, 'visitLiteralExpr'):
+            del _LiteralVisitor.visitLiteralExpr
+        clear_dispatch_tables()
+        super().tearDown()
+
+    def test_dispatch(self):
+        v = _LiteralVisitor()
+        self.assertEqual(v.visit(NumberLiteralExpr(1)), 'expr')
+        self.assertEqual(v.visit(BooleanLiteralExpr(True)), 'bool')
+        self.assertIsNone(v.get_visit_function(AST))
+
+    def test_invalidation(self):
+        v = _LiteralVisitor()
+        self.assertEqual(v.visit(NumberLiteralExpr(1)), 'expr')
+
+        _LiteralVisitor.visitLiteralExpr = lambda self, ast: 'literal'
+        clear_dispatch_tables()
+        self.assertEqual(v.visit(NumberLiteralExpr(1)), 'literal')
+        self.assertEqual(v.visit(BooleanLiteralExpr(True)), 'bool')
+        self.assertIsNotNone(v.get_visit_function(LiteralExpr))
+
+
+@unittest.skipUnless(os.environ.get('ZKAY_RUN_BENCHMARKS') == '1', 'benchmarks disabled')
+class BenchmarkVisitorDispatch(ZkayTestCase):
+    def test_benchmark_dispatch(self):
+        asts = []
+        for _, example in collect_examples(code_dir):
+            ast = build_ast(example.code())
+            set_parents(ast)
+            asts.append(ast)
+
+        def run(visitor_cls):
+            start = time.perf_counter()
+            for _ in range(20):
+                for ast in asts:
+                    visitor_cls().visit(ast)
+            return time.perf_counter() - start
+
+        t_uncached, t_cached = run(_UncachedVisitor), run(AstVisitor)
+        print(f'\nVisit examples/code corpus 20x: uncached lookup {t_uncached:.3f}s, dispatch table {t_cached:.3f}s')
+
+        start = time.perf_counter()
+        for _ in range(5):
+            for ast in asts:
+                to_solidity(ast)
+        print(f'Emit solidity code for examples/code corpus 5x: {time.perf_counter() - start:.3f}s')
@@ -7,18 +7,21 @@ from pathlib import Path
 from typing import Any, Dict, Optional, Tuple, List, Union
 
 from eth_tester import PyEVMBackend, EthereumTester
+from eth_utils.abi import collapse_if_tuple
+from hexbytes import HexBytes
+from requests import Session
 from web3 import Web3
 
 from zkay import my_logging
 from zkay.compiler.privacy import library_contracts
-from zkay.compiler.solidity.compiler import compile_solidity_json
+from zkay.compiler.privacy.manifest import Manifest
+from zkay.compiler.solidity.compiler import compile_solidity_json, compile_solidity_files_json
 from zkay.config import cfg, zk_print, zk_print_banner
 from zkay.my_logging.log_context import log_context
 from zkay.transaction.interface import ZkayBlockchainInterface, IntegrityError, BlockChainError, \
     TransactionFailedException
 from zkay.transaction.types import PublicKeyValue, AddressValue, MsgStruct, BlockStruct, TxStruct
 from zkay.utils.helpers import get_contract_names, save_to_file
-from zkay.zkay_ast.process_ast import get_verification_contract_names
 
 max_gas_limit = 10000000
 
@@ -34,6 +37,17 @@ class Web3Blockchain(ZkayBlockchainInterface):
     def compile_contract(sol_filename: str, contract_name: str, libs: Optional[Dict] = None, cwd=None):
         solp = Path(sol_filename)
         jout = compile_solidity_json(sol_filename, libs, optimizer_runs=cfg.opt_solc_optimizer_runs, cwd=cwd)['contracts'][solp.name][contract_name]
+        return Web3Blockchain._get_contract_interface(jout)
+
+    @staticmethod
+    def compile_contracts(sol_filenames: List[str], contract_names: List[str], libs: Optional[Dict] = None, cwd=None) -> List[Dict]:
+        """Same as compile_contract for every (sol_filename, contract_name) pair, but using a single solc job."""
+        jout = compile_solidity_files_json(sol_filenames, libs, optimizer_runs=cfg.opt_solc_optimizer_runs, cwd=cwd)['contracts']
+        return [Web3Blockchain._get_contract_interface(jout[Path(sol_filename).name][contract_name])
+                for sol_filename, contract_name in zip(sol_filenames, contract_names)]
+
+    @staticmethod
+    def _get_contract_interface(jout: Dict) -> Dict:
         return {
             'abi': json.loads(jout['metadata'])['output']['abi'],
             'bin': jout['evm']['bytecode']['object'],
@@ -64,6 +78,9 @@ class Web3Blockchain(ZkayBlockchainInterface):
         else:
             return cfg.blockchain_default_account
 
+    def _get_block_number(self) -> int:
+        return self.w3.eth.blockNumber
+
     def _get_balance(self, address: Union[bytes, str]) -> int:
         return self.w3.eth.getBalance(address)
 
@@ -109,8 +126,7 @@ class Web3Blockchain(ZkayBlockchainInterface):
         return tx_receipt
 
     def _deploy(self, project_dir: str, sender: Union[bytes, str], contract: str, *actual_args, wei_amount: Optional[int] = None) -> Any:
-        with open(os.path.join(project_dir, 'contract.zkay')) as f:
-            verifier_names = get_verification_contract_names(f.read())
+        verifier_names = Manifest.get_verifier_names(project_dir)
 
         # Deploy verification contracts if not already done
         external_contract_addresses =  self._deploy_dependencies(sender, project_dir, verifier_names)
@@ -138,11 +154,17 @@ class Web3Blockchain(ZkayBlockchainInterface):
     def _deploy_dependencies(self, sender: Union[bytes, str], project_dir: str, verifier_names: List[str]) -> Dict[str, AddressValue]:
         # Deploy verification contracts if not already done
         vf = {}
-        for verifier_name in verifier_names:
+        shared_verifiers = Manifest.get_shared_verifiers(project_dir)
+        deployed_names = [verifier_name for verifier_name in verifier_names if verifier_name not in shared_verifiers]
+        filenames = [os.path.join(project_dir, f'{verifier_name}.sol') for verifier_name in deployed_names]
+        couts = self.compile_contracts(filenames, deployed_names, self.lib_addresses) if deployed_names else []
+        for verifier_name, cout in zip(deployed_names, couts):
             with log_context('transaction', f'deploy_{verifier_name}'):
-                filename = os.path.join(project_dir, f'{verifier_name}.sol')
-                cout = self.compile_contract(filename, verifier_name, self.lib_addresses)
                 vf[verifier_name] = AddressValue(self._deploy_contract(sender, cout).address)
+
+        # Circuits which are identical up to naming share a single verification contract
+        for verifier_name, rep_name in shared_verifiers.items():
+            vf[verifier_name] = vf[rep_name]
         vf[cfg.pki_contract_name] = AddressValue(self.pki_contract.address)
         return vf
 
@@ -314,6 +336,10 @@ class Web3IpcBlockchain(Web3Blockchain):
         assert cfg.blockchain_node_uri is None or isinstance(cfg.blockchain_node_uri, str)
         return Web3(Web3.IPCProvider(cfg.blockchain_node_uri))
 
+    def _req_state_vars(self, contract_handle, requests: List[Tuple[str, List]]) -> List[Any]:
+        # The ipc provider serializes requests on its socket under a lock
+        return self._req_state_vars_concurrently(contract_handle, requests)
+
 
 class Web3WebsocketBlockchain(Web3Blockchain):
     def _create_w3_instance(self) -> Web3:
@@ -326,6 +352,47 @@ class Web3HttpBlockchain(Web3Blockchain):
         assert cfg.blockchain_node_uri is None or isinstance(cfg.blockchain_node_uri, str)
         return Web3(Web3.HTTPProvider(cfg.blockchain_node_uri))
 
+    def _req_state_vars(self, contract_handle, requests: List[Tuple[str, List]]) -> List[Any]:
+        if len(requests) <= 1:
+            return self._req_state_vars_concurrently(contract_handle, requests)
+
+        # Send all eth_call requests in a single json-rpc batch
+        try:
+            batch = [{'jsonrpc': '2.0', 'id': idx, 'method': 'eth_call',
+                      'params': [{'to': contract_handle.address, 'data': contract_handle.encodeABI(fn_name=name, args=indices)}, 'latest']}
+                     for idx, (name, indices) in enumerate(requests)]
+            response = self._batch_session.post(self.w3.provider.endpoint_uri, json=batch, timeout=10)
+            response.raise_for_status()
+            responses = response.json()
+        except Exception as e:
+            raise BlockChainError(e.args)
+
+        if not isinstance(responses, list):
+            # Node does not support batch requests, every http request uses its own connection
+            return self._req_state_vars_concurrently(contract_handle, requests)
+
+        responses = {r['id']: r for r in responses}
+        vals = []
+        for idx, (name, indices) in enumerate(requests):
+            response = responses.get(idx, {'error': 'Missing response'})
+            if 'error' in response:
+                raise BlockChainError(response['error'])
+            try:
+                output_types = [collapse_if_tuple(output) for output in contract_handle.functions[name](*indices).abi['outputs']]
+                output_data = [Web3.toChecksumAddress(val) if t == 'address' else val
+                               for t, val in zip(output_types, self.w3.codec.decode_abi(output_types, HexBytes(response['result'])))]
+            except Exception as e:
+                raise BlockChainError(e.args)
+            vals.append(output_data[0] if len(output_data) == 1 else output_data)
+        return vals
+
+    @property
+    def _batch_session(self) -> Session:
+        # The web3 http provider has no public api for batch requests, they are posted to the same endpoint directly
+        if not hasattr(self, '_session'):
+            self._session = Session()
+        return self._session
+
 
 class Web3HttpGanacheBlockchain(Web3HttpBlockchain):
     def __init__(self) -> None:
@@ -1,31 +1,92 @@
+import atexit
 import os
 import secrets
+import threading
+from collections import OrderedDict
+from typing import Tuple, List
 
+from zkay import my_logging
 from zkay.config import cfg
-from zkay.jsnark_interface.jsnark_interface import circuit_builder_jar
+from zkay.jsnark_interface.crypto_server import crypto_server
+from zkay.transaction.crypto import ecdh_curve
 from zkay.transaction.interface import PrivateKeyValue, PublicKeyValue, KeyPair
 from zkay.transaction.interface import ZkayCryptoInterface
-from zkay.utils.run_command import run_command
 
 
 class EcdhBase(ZkayCryptoInterface):
+    # Process-wide LRU cache of derived symmetric keys, (my_sk, other_pk) -> key
+    _key_cache: 'OrderedDict[Tuple[int, int], bytes]' = OrderedDict()
+    _key_cache_lock = threading.Lock()
+    _key_cache_hits = 0
+    _key_cache_misses = 0
+
     @classmethod
     def is_symmetric_cipher(cls) -> bool:
         return True
 
     @staticmethod
     def _gen_keypair(rnd: bytes):
-        keys, _ = run_command(['java', '-Xms4096m', '-Xmx16384m', '-cp', f'{circuit_builder_jar}', 'zkay.ZkayECDHGenerator', rnd.hex()])
-        keys = keys.splitlines()[-2:]
-        return int(keys[0], 16), int(keys[1], 16)
+        if cfg.ecdh_engine == 'python':
+            return ecdh_curve.gen_keypair(rnd)
+        else:
+            return crypto_server.ecdh_keypair(rnd)
+
+    @staticmethod
+    def _gen_keypairs(rnds: List[bytes]) -> List[Tuple[int, int]]:
+        if cfg.ecdh_engine == 'python':
+            return ecdh_curve.gen_keypair_batch(rnds)
+        else:
+            return [crypto_server.ecdh_keypair(rnd) for rnd in rnds]
 
     @staticmethod
-    def _ecdh_sha256(other_pk: int, my_sk: int):
-        ret, _ = run_command(['java', '-Xms4096m', '-Xmx16384m', '-cp', f'{circuit_builder_jar}', 'zkay.ZkayECDHGenerator', hex(my_sk)[2:], hex(other_pk)[2:]])
-        key = ret.splitlines()[-1]
-        return int(key, 16).to_bytes(16, byteorder='big')
+    def _compute_ecdh_sha256(other_pk: int, my_sk: int) -> bytes:
+        if cfg.ecdh_engine == 'python':
+            return ecdh_curve.ecdh_sha256(other_pk, my_sk)
+        else:
+            return crypto_server.ecdh_sha256(other_pk, my_sk)
+
+    @classmethod
+    def _ecdh_sha256(cls, other_pk: int, my_sk: int) -> bytes:
+        """Return the symmetric key shared between my_sk and other_pk (cached)."""
+        cache_key = (my_sk, other_pk)
+        with cls._key_cache_lock:
+            key = cls._key_cache.get(cache_key)
+            if key is not None:
+                cls._key_cache.move_to_end(cache_key)
+                cls._key_cache_hits += 1
+                return key
+            cls._key_cache_misses += 1
+
+        key = cls._compute_ecdh_sha256(other_pk, my_sk)
+        if cfg.ecdh_key_cache_size > 0:
+            with cls._key_cache_lock:
+                cls._key_cache[cache_key] = key
+                while len(cls._key_cache) > cfg.ecdh_key_cache_size:
+                    cls._key_cache.popitem(last=False)
+        return key
+
+    @classmethod
+    def clear_key_cache(cls):
+        """Remove all derived keys from the shared key cache and log the cache statistics."""
+        with cls._key_cache_lock:
+            cls._key_cache.clear()
+            hits, misses = cls._key_cache_hits, cls._key_cache_misses
+            cls._key_cache_hits, cls._key_cache_misses = 0, 0
+        if hits or misses:
+            my_logging.data('ecdh_key_cache_hits', hits)
+            my_logging.data('ecdh_key_cache_misses', misses)
 
     def _generate_or_load_key_pair(self, address: str) -> KeyPair:
+        # Derive keys from randomness
+        pk, sk = self._gen_keypair(self._generate_or_load_randomness(address))
+        return KeyPair(PublicKeyValue([pk]), PrivateKeyValue(sk))
+
+    def _generate_or_load_key_pairs(self, addresses: List[str]) -> List[KeyPair]:
+        rnds = [self._generate_or_load_randomness(address) for address in addresses]
+        return [KeyPair(PublicKeyValue([pk]), PrivateKeyValue(sk)) for pk, sk in self._gen_keypairs(rnds)]
+
+    @staticmethod
+    def _generate_or_load_randomness(address: str) -> bytes:
         key_file = os.path.join(cfg.data_dir, 'keys', f'ec_{address}.bin')
         os.makedirs(os.path.dirname(key_file), exist_ok=True)
         if not os.path.exists(key_file):
@@ -42,8 +103,7 @@ class EcdhBase(ZkayCryptoInterface):
             print(f'EC secret found, loading from file {key_file}')
             with open(key_file, 'rb') as f:
                 rnd = f.read()
+        return rnd
 
-        # Derive keys from randomness
-        pk, sk = self._gen_keypair(rnd)
 
-        return KeyPair(PublicKeyValue([pk]), PrivateKeyValue(sk))
+atexit.register(EcdhBase.clear_key_cache)
@@ -2,9 +2,8 @@ import secrets
 from typing import Tuple, List, Any
 
 from zkay.config import cfg
-from zkay.jsnark_interface.jsnark_interface import circuit_builder_jar
+from zkay.jsnark_interface.crypto_server import crypto_server
 from zkay.transaction.crypto.ecdh_base import EcdhBase
-from zkay.utils.run_command import run_command
 
 
 class EcdhChaskeyCrypto(EcdhBase):
@@ -16,9 +15,7 @@ class EcdhChaskeyCrypto(EcdhBase):
 
         # Call java implementation
         iv = secrets.token_bytes(16)
-        iv_cipher, _ = run_command(['java', '-Xms4096m', '-Xmx16384m', '-cp', f'{circuit_builder_jar}',
-                                    'zkay.ChaskeyLtsCbc', 'enc', key.hex(), iv.hex(), plain_bytes.hex()])
-        iv_cipher = iv + int(iv_cipher.splitlines()[-1], 16).to_bytes(32, byteorder='big')
+        iv_cipher = iv + crypto_server.chaskey_lts_cbc('enc', key, iv, plain_bytes)
 
         return self.pack_byte_array(iv_cipher, cfg.cipher_chunk_size), None
 
@@ -34,8 +31,6 @@ class EcdhChaskeyCrypto(EcdhBase):
         # Call java implementation
         iv_cipher = self.unpack_to_byte_array(cipher, cfg.cipher_chunk_size, cfg.cipher_bytes_payload)
         iv, cipher_bytes = iv_cipher[:16], iv_cipher[16:]
-        plain, _ = run_command(['java', '-Xms4096m', '-Xmx16384m', '-cp', f'{circuit_builder_jar}',
-                                'zkay.ChaskeyLtsCbc', 'dec', key.hex(), iv.hex(), cipher_bytes.hex()])
-        plain = int(plain.splitlines()[-1], 16)
+        plain = int.from_bytes(crypto_server.chaskey_lts_cbc('dec', key, iv, cipher_bytes), byteorder='big')
 
         return plain, None
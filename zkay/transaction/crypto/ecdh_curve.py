@@ -0,0 +1,119 @@
+"""
+Native python implementation of the elliptic curve diffie-hellman key exchange used by the ecdh crypto backends.
+
+This produces bit-identical keys to zkay.ZkayECDHGenerator in JsnarkCircuitBuilder.jar (and thus to the ecdh gadgets
+used inside the circuits), without having to go through the jvm.
+
+The curve is the montgomery curve y^2 = x^3 + A*x^2 + x over the bn128 scalar field, with base point x = 4.
+Points are only represented by their x coordinate, public keys are the x coordinates of sk * G and the
+shared symmetric key is the first 128 bit of the sha256 hash of the x coordinate of sk * pk.
+"""
+
+import hashlib
+from typing import List, Sequence, Tuple
+
+FIELD_PRIME = 21888242871839275222246405745257275088548364400416034343698204186575808495617
+"""Order of the field over which the curve is defined"""
+
+COEFF_A = 126932
+"""Montgomery coefficient A"""
+
+BASE_POINT_X = 4
+"""X coordinate of the generator"""
+
+_a24 = (COEFF_A + 2) * pow(4, FIELD_PRIME - 2, FIELD_PRIME) % FIELD_PRIME
+_secret_bits = 253
+
+
+def rnd_to_secret(rnd: bytes) -> int:
+    """Derive a secret key from 32 bytes of randomness (the top bit of the 253 bit scalar is set, the low 3 bits are cleared)."""
+    b = bytearray(int.from_bytes(rnd, byteorder='big').to_bytes(32, byteorder='big'))
+    b[0] = (b[0] & 0x0f) | 0x10
+    b[31] &= 0xf8
+    return int.from_bytes(b, byteorder='big')
+
+
+def _is_on_curve(x: int) -> bool:
+    rhs = (x * x * x + COEFF_A * x * x + x) % FIELD_PRIME
+    return rhs == 0 or pow(rhs, (FIELD_PRIME - 1) // 2, FIELD_PRIME) == 1
+
+
+def _ladder(k: int, x1: int) -> Tuple[int, int]:
+    """Montgomery ladder, return projective (X:Z) coordinates of k * (x1, .)."""
+    p = FIELD_PRIME
+    x2, z2, x3, z3 = 1, 0, x1, 1
+    for t in reversed(range(max(k.bit_length(), 1))):
+        if (k >> t) & 1:
+            x2, z2, x3, z3 = x3, z3, x2, z2
+        a, b = x2 + z2, x2 - z2
+        aa, bb = a * a % p, b * b % p
+        e = aa - bb
+        c, d = x3 + z3, x3 - z3
+        da, cb = d * a % p, c * b % p
+        x3, z3 = (da + cb) ** 2 % p, x1 * (da - cb) ** 2 % p
+        x2, z2 = aa * bb % p, e * (bb + _a24 * e) % p
+        if (k >> t) & 1:
+            x2, z2, x3, z3 = x3, z3, x2, z2
+    return x2, z2
+
+
+def scalar_mult_batch(scalars: Sequence[int], xs: Sequence[int]) -> List[int]:
+    """
+    Compute the x coordinates of scalars[i] * (xs[i], .) for all i.
+
+    The projective results are normalized using a single (batched) field inversion.
+
+    :raise ValueError: if one of the points is not on the curve or a result is the point at infinity
+    """
+    if len(scalars) != len(xs):
+        raise ValueError('Number of scalars and points must match')
+    for x in xs:
+        if not 0 <= x < FIELD_PRIME or not _is_on_curve(x):
+            raise ValueError(f'{hex(x)} is not the x coordinate of a point on the curve')
+
+    p = FIELD_PRIME
+    results = [_ladder(k, x) for k, x in zip(scalars, xs)]
+    if any(z == 0 for _, z in results):
+        raise ValueError('Scalar multiplication resulted in the point at infinity')
+
+    # Montgomery's trick: invert all z values at the cost of one inversion
+    prefix = [1]
+    for _, z in results:
+        prefix.append(prefix[-1] * z % p)
+    inv = pow(prefix[-1], p - 2, p)
+    out = [0] * len(results)
+    for i in reversed(range(len(results))):
+        x, z = results[i]
+        out[i] = x * prefix[i] * inv % p
+        inv = inv * z % p
+    return out
+
+
+def scalar_mult(k: int, x: int) -> int:
+    """Compute the x coordinate of k * (x, .)."""
+    return scalar_mult_batch([k], [x])[0]
+
+
+def derive_pk(sk: int) -> int:
+    """Return the public key corresponding to secret key sk."""
+    return scalar_mult(sk, BASE_POINT_X)
+
+
+def gen_keypair(rnd: bytes) -> Tuple[int, int]:
+    """Derive (public key, secret key) from 32 bytes of randomness."""
+    sk = rnd_to_secret(rnd)
+    return derive_pk(sk), sk
+
+
+def gen_keypair_batch(rnds: Sequence[bytes]) -> List[Tuple[int, int]]:
+    """Derive (public key, secret key) from each of rnds, all public keys are derived in one batch."""
+    sks = [rnd_to_secret(rnd) for rnd in rnds]
+    pks = scalar_mult_batch(sks, [BASE_POINT_X] * len(sks))
+    return list(zip(pks, sks))
+
+
+def ecdh_sha256(other_pk: int, my_sk: int) -> bytes:
+    """Compute the 128 bit symmetric key shared between my_sk and other_pk."""
+    shared_x = scalar_mult(my_sk, other_pk)
+    return hashlib.sha256(shared_x.to_bytes(32, byteorder='big')).digest()[:16]
+
@@ -9,13 +9,15 @@ It provides high level functions for
 """
 
 import os
+import threading
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, Future
 from builtins import type
 from typing import Tuple, List, Optional, Union, Any, Dict, Collection
 
 from zkay.compiler.privacy.library_contracts import bn128_scalar_field
+from zkay.compiler.privacy.manifest import Manifest
 from zkay.compiler.privacy.proving_scheme.proving_scheme import ProvingScheme
-from zkay.zkay_ast.process_ast import get_verification_contract_names
 from zkay.zkay_frontend import compile_zkay_file
 from zkay.config import cfg, zk_print, zk_print_banner
 from zkay.transaction.types import AddressValue, MsgStruct, BlockStruct, TxStruct, PublicKeyValue, Value, \
@@ -114,6 +116,10 @@ class ZkayBlockchainInterface(metaclass=ABCMeta):
         """
         pass
 
+    def get_block_number(self) -> int:
+        """Return the number of the most recent block."""
+        return self._get_block_number()
+
     def get_balance(self, address: AddressValue) -> int:
         """Return the balance of the wallet with the designated address (in wei)."""
         return self._get_balance(address.val)
@@ -163,6 +169,23 @@ class ZkayBlockchainInterface(metaclass=ABCMeta):
         zk_print(f'Got value {val} for state variable "{name}"', verbosity_level=2)
         return val
 
+    def req_state_vars(self, contract_handle, requests: List[Tuple[str, Tuple]]) -> List[Union[bool, int, str, bytes]]:
+        """
+        Request multiple contract state variable values from the chain at once.
+
+        Backends which support batched requests fetch all values in a single round trip.
+
+        :param contract_handle: contract from which to read state
+        :param requests: list of (name, indices) tuples, see req_state_var
+        :raise BlockChainError: if request fails
+        :return: The values (in the same order as requests)
+        """
+        assert contract_handle is not None
+        zk_print(f'Requesting {len(requests)} state variable values', verbosity_level=2)
+        vals = self._req_state_vars(contract_handle, [(name, Value.unwrap_values(list(indices))) for name, indices in requests])
+        zk_print(f'Got values {vals}', verbosity_level=2)
+        return vals
+
     def call(self, contract_handle, sender: AddressValue, name: str, *args) -> Union[bool, int, str, bytes, List]:
         """
         Call the specified pure/view function in the given contract with the provided arguments.
@@ -285,8 +308,7 @@ class ZkayBlockchainInterface(metaclass=ABCMeta):
         if not os.path.exists(os.path.join(project_dir, 'contract.sol')):
             compile_zkay_file(zk_file, project_dir, import_keys=True, verifier_names=verifier_names)
         else:
-            with open(zk_file) as f:
-                verifier_names = get_verification_contract_names(f.read())
+            verifier_names = Manifest.get_verifier_names(project_dir)
 
         zk_print(f'Connecting to contract {contract}@{contract_address}')
         contract_on_chain = self._connect(project_dir, contract, contract_address.val)
@@ -308,9 +330,16 @@ class ZkayBlockchainInterface(metaclass=ABCMeta):
             libs = self._verify_library_integrity(libraries, some_vcontract, os.path.join(project_dir, f'{some_vname}.sol'))
             self._lib_addresses = libs
 
+            shared_verifiers = Manifest.get_shared_verifiers(project_dir)
             for verifier in verifier_names:
                 v_address = self._req_state_var(contract_on_chain, f'{verifier}_inst')
                 pki_verifier_addresses[verifier] = AddressValue(v_address)
+                if verifier in shared_verifiers:
+                    # Verified by the (separately checked) verification contract of an identical circuit
+                    rep_address = self._req_state_var(contract_on_chain, f'{shared_verifiers[verifier]}_inst')
+                    if v_address != rep_address:
+                        raise IntegrityError(f'Verification contract of "{verifier}" is not shared with "{shared_verifiers[verifier]}"')
+                    continue
                 vcontract = self._verify_contract_integrity(v_address, os.path.join(project_dir, f'{verifier}.sol'), libraries=libs)
 
                 # Verify prover key
@@ -392,6 +421,10 @@ class ZkayBlockchainInterface(metaclass=ABCMeta):
     def _default_address(self) -> Union[None, bytes, str]:
         pass
 
+    @abstractmethod
+    def _get_block_number(self) -> int:
+        pass
+
     @abstractmethod
     def _get_balance(self, address: Union[bytes, str]) -> int:
         pass
@@ -416,6 +449,19 @@ class ZkayBlockchainInterface(metaclass=ABCMeta):
     def _req_state_var(self, contract_handle, name: str, *indices) -> Union[bool, int, str]:
         pass
 
+    def _req_state_vars(self, contract_handle, requests: List[Tuple[str, List]]) -> List[Union[bool, int, str]]:
+        # Backends which support batched or concurrent requests should override this
+        return [self._req_state_var(contract_handle, name, *indices) for name, indices in requests]
+
+    def _req_state_vars_concurrently(self, contract_handle, requests: List[Tuple[str, List]]) -> List[Union[bool, int, str]]:
+        # Only for backends whose connection can be used from multiple threads at once
+        workers = min(len(requests), cfg.blockchain_request_workers)
+        if workers <= 1:
+            return [self._req_state_var(contract_handle, name, *indices) for name, indices in requests]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='zkay_state') as pool:
+            futures = [pool.submit(self._req_state_var, contract_handle, name, *indices) for name, indices in requests]
+            return [future.result() for future in futures]
+
     @abstractmethod
     def _transact(self, contract_handle, sender: Union[bytes, str], function: str, *actual_args, wei_amount: Optional[int] = None) -> Any:
         pass
@@ -531,6 +577,18 @@ class ZkayCryptoInterface(metaclass=ABCMeta):
         """
         self.keystore.add_keypair(address, self._generate_or_load_key_pair(address.val.hex()))
 
+    def generate_or_load_key_pairs(self, addresses: List[AddressValue]):
+        """
+        Store cryptographic keys for all accounts with the specified addresses in the keystore.
+
+        Same as generate_or_load_key_pair for every address, but backends may derive the keys in a single batch.
+
+        :param addresses: the addresses for which to generate keys
+        """
+        key_pairs = self._generate_or_load_key_pairs([address.val.hex() for address in addresses])
+        for address, key_pair in zip(addresses, key_pairs):
+            self.keystore.add_keypair(address, key_pair)
+
     def enc(self, plain: Union[int, AddressValue], my_addr: AddressValue, target_addr: AddressValue) -> Tuple[CipherValue, Optional[RandomnessValue]]:
         """
         Encrypt plain for receiver with target_addr.
@@ -617,6 +675,10 @@ class ZkayCryptoInterface(metaclass=ABCMeta):
     def _generate_or_load_key_pair(self, address: str) -> KeyPair:
         pass
 
+    def _generate_or_load_key_pairs(self, addresses: List[str]) -> List[KeyPair]:
+        # Backends which can derive multiple keys at once should override this
+        return [self._generate_or_load_key_pair(address) for address in addresses]
+
     @abstractmethod
     def _enc(self, plain: int, my_sk: int, target_pk: int) -> Tuple[List[int], List[int]]:
         pass
@@ -631,6 +693,8 @@ class ZkayProverInterface(metaclass=ABCMeta):
 
     def __init__(self, proving_scheme: str = None):
         self.proving_scheme = cfg.proving_scheme if proving_scheme is None else proving_scheme
+        self.__pool: Optional[ThreadPoolExecutor] = None
+        self.__pool_lock = threading.Lock()
 
     def generate_proof(self, project_dir: str, contract: str, function: str, priv_values: List, in_vals: List, out_vals: List[Union[int, CipherValue]]) -> List[int]:
         """
@@ -664,13 +728,46 @@ class ZkayProverInterface(metaclass=ABCMeta):
             assert int(arg) < bn128_scalar_field, 'argument overflow'
 
         with time_measure(f'generate_proof', True):
-            verify_dir = cfg.get_circuit_output_dir_name(cfg.get_verification_contract_name(contract, function))
+            verifier_name = cfg.get_verification_contract_name(contract, function)
+            verifier_name = Manifest.get_shared_verifiers(project_dir).get(verifier_name, verifier_name)
+            verify_dir = cfg.get_circuit_output_dir_name(verifier_name)
             return self._generate_proof(os.path.join(project_dir, verify_dir), priv_values, in_vals, out_vals)
 
+    def generate_proof_async(self, project_dir: str, contract: str, function: str, priv_values: List, in_vals: List, out_vals: List[Union[int, CipherValue]]) -> Future:
+        """
+        Generate a NIZK-proof in the background, see generate_proof.
+
+        At most cfg.proof_generation_workers proofs are generated at the same time, additional requests are queued.
+
+        :return: future which resolves to the proof (or raises ProofGenerationError)
+        """
+        with self.__pool_lock:
+            if self.__pool is None:
+                self.__pool = ThreadPoolExecutor(max_workers=cfg.proof_generation_workers, thread_name_prefix='zkay_prover')
+            return self.__pool.submit(self.generate_proof, project_dir, contract, function, priv_values, in_vals, out_vals)
+
+    def generate_proofs_batch(self, requests: List[Tuple[str, str, str, List, List, List]]) -> List[List[int]]:
+        """
+        Generate multiple independent NIZK-proofs in parallel.
+
+        :param requests: list of (project_dir, contract, function, priv_values, in_vals, out_vals) tuples, see generate_proof
+        :raise ProofGenerationError: if any of the proofs cannot be generated
+        :return: the proofs (in the same order as requests)
+        """
+        futures = [self.generate_proof_async(*request) for request in requests]
+        return [future.result() for future in futures]
+
     @abstractmethod
     def _generate_proof(self, verifier_dir: str, priv_values: List[int], in_vals: List[int], out_vals: List[int]) -> List[int]:
         pass
 
+    def shutdown(self):
+        """Wait for pending proofs and terminate any background processes of the prover (they are restarted on demand)."""
+        with self.__pool_lock:
+            if self.__pool is not None:
+                self.__pool.shutdown()
+                self.__pool = None
+
     @abstractmethod
     def get_prover_key_hash(self, verifier_directory: str) -> bytes:
         """Return the hash of the prover key stored in the given verification contract output directory."""
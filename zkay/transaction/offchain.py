@@ -56,6 +56,28 @@ class StateDict:
     def get_raw(self, name: str, *indices):
         return self.__get((name, *indices), cache=False)
 
+    def prefetch(self, *keys: Tuple):
+        """
+        Request the values of multiple state locations from the chain at once, before they are accessed.
+
+        Locations which are already present in the local state are skipped.
+        If the request fails, nothing is cached (the values are then requested again on first access).
+
+        :param keys: Tuples with the state variable name and all index key values
+        """
+        keys = [key for key in keys if self.__get_loc(key) not in self.__state]
+        if not keys:
+            return
+
+        requests = [(key[0], key[1:], cfg.cipher_len if self.__constructors[key[0]][0] else 0) for key in keys]
+        try:
+            vals = self.api._req_state_vars(requests)
+        except (BlockChainError, ValueError):
+            return
+        for key, val in zip(keys, vals):
+            is_cipher, constr = self.__constructors[key[0]]
+            self.__state[self.__get_loc(key)] = CipherValue(val) if is_cipher else constr(val)
+
     def __getitem__(self, key: Union[str, Tuple]):
         """
         Return value of the state variable (or index of state variable) key
@@ -74,19 +96,20 @@ class StateDict:
         :param value: Correctly wrapped value which should be assigned to the specified state location
         """
 
+        # Write to state
+        self.__state[self.__get_loc(key)] = value
+
+    @staticmethod
+    def __get_loc(key: Union[str, Tuple]) -> str:
         if not isinstance(key, Tuple):
             key = (key, )
-        var = key[0]
-        loc = var + ''.join(f'[{k}]' for k in key[1:])
-
-        # Write to state
-        self.__state[loc] = value
+        return key[0] + ''.join(f'[{k}]' for k in key[1:])
 
     def __get(self, key: Union[str, Tuple], cache: bool):
         if not isinstance(key, Tuple):
             key = (key, )
         var, indices = key[0], key[1:]
-        loc = var + ''.join(f'[{k}]' for k in key[1:])
+        loc = self.__get_loc(key)
 
         # Retrieve from state scope
         if cache and loc in self.__state:
@@ -105,6 +128,38 @@ class StateDict:
             return val
 
 
+class StateCache:
+    """
+    Cache for raw state values which were read from the chain, shared across transactions.
+
+    Every value is tagged with the number of the block at which it was read, once the chain advances all values are discarded.
+    (Zkay contracts do not emit events, their state can only be changed by transactions, i.e. by new blocks.)
+    """
+
+    def __init__(self) -> None:
+        self.__block_number: Optional[int] = None
+        self.__vals: Dict[Tuple, Any] = {}
+
+    def sync(self, block_number: int):
+        """Discard all cached values if they were not read at block block_number."""
+        if block_number != self.__block_number:
+            self.invalidate()
+            self.__block_number = block_number
+
+    def invalidate(self):
+        self.__vals.clear()
+        self.__block_number = None
+
+    def __contains__(self, loc: Tuple) -> bool:
+        return loc in self.__vals
+
+    def __getitem__(self, loc: Tuple) -> Any:
+        return self.__vals[loc]
+
+    def __setitem__(self, loc: Tuple, val: Any):
+        self.__vals[loc] = val
+
+
 class LocalsDict:
     """
     Dictionary which supports multiple scopes with name shadowing.
@@ -248,8 +303,7 @@ class ContractSimulator:
         :return: if count == 1 -> returns a address, otherwise returns a tuple of count addresses
         """
         accounts = Runtime.blockchain().create_test_accounts(count)
-        for account in accounts:
-            ContractSimulator.initialize_keys_for(account)
+        Runtime.crypto().generate_or_load_key_pairs([AddressValue(account) for account in accounts])
         if len(accounts) == 1:
             return accounts[0]
         else:
@@ -299,6 +353,9 @@ class ApiWrapper:
         self.__contract_handle = None
         """Handle which refers to the deployed contract, this is passed to the blockchain interface when e.g. issuing transactions."""
 
+        self.__state_cache = StateCache()
+        """State values which were read from the chain, reused across transactions if cfg.blockchain_state_cache is enabled"""
+
         self.__user_addr = user_addr
         """From address for all transactions which are issued by this ContractSimulator"""
 
@@ -364,13 +421,16 @@ class ApiWrapper:
         return val
 
     def deploy(self, actual_args: List, should_encrypt: List[bool], wei_amount: Optional[int] = None):
+        self.__state_cache.invalidate()
         self.__contract_handle = self.__conn.deploy(self.__project_dir, self.__user_addr, self.__contract_name,
                                                     actual_args, should_encrypt, wei_amount=wei_amount)
 
     def connect(self, address: AddressValue):
+        self.__state_cache.invalidate()
         self.__contract_handle = self.__conn.connect(self.__project_dir, self.__contract_name, address, self.user_address)
 
     def transact(self, fname: str, args: List, should_encrypt: List[bool], wei_amount: Optional[int] = None) -> Any:
+        self.__state_cache.invalidate()
         return self.__conn.transact(self.__contract_handle, self.__user_addr, fname, args, should_encrypt, wei_amount=wei_amount)
 
     def call(self, fname: str, args: List, ret_val_constructors: List[Tuple[bool, Callable]]):
@@ -407,12 +467,57 @@ class ApiWrapper:
             # TODO check this statically in the type checker
             raise ValueError(f'Cannot read state variable {name} within constructor before it is assigned a value.')
 
+        use_cache = self.__use_state_cache()
+        if use_cache and (name, indices, count) in self.__state_cache:
+            return self.__state_cache[(name, indices, count)]
+
         if count == 0:
             val = self.__conn.req_state_var(self.__contract_handle, name, *indices)
         else:
-            val = [self.__conn.req_state_var(self.__contract_handle, name, *indices, i) for i in range(count)]
+            val = self.__conn.req_state_vars(self.__contract_handle, [(name, (*indices, i)) for i in range(count)])
+
+        if use_cache:
+            self.__state_cache[(name, indices, count)] = val
         return val
 
+    def _req_state_vars(self, requests: List[Tuple[str, Tuple, int]]) -> List[Any]:
+        """
+        Request multiple state variable values at once.
+
+        :param requests: list of (name, indices, count) tuples, count > 0 -> value consists of count uints (e.g. ciphertexts)
+        :return: the values (in the same order as requests)
+        """
+        if self.__contract_handle is None:
+            raise ValueError('Cannot read state variables within constructor before the contract is deployed.')
+
+        requests = [(name, tuple(indices), count) for name, indices, count in requests]
+        use_cache = self.__use_state_cache()
+        missing = [req for req in requests if not use_cache or req not in self.__state_cache]
+
+        flat_requests = []
+        for name, indices, count in missing:
+            flat_requests += [(name, (*indices, i)) for i in range(count)] if count else [(name, indices)]
+        flat_vals = self.__conn.req_state_vars(self.__contract_handle, flat_requests) if flat_requests else []
+
+        fetched, idx = {}, 0
+        for req in missing:
+            count = req[2]
+            fetched[req] = flat_vals[idx:idx + count] if count else flat_vals[idx]
+            idx += max(count, 1)
+            if use_cache:
+                self.__state_cache[req] = fetched[req]
+        return [fetched[req] if req in fetched else self.__state_cache[req] for req in requests]
+
+    def __use_state_cache(self) -> bool:
+        """
+        Check whether the state cache can be used for the current request.
+
+        The cache is synchronized with the chain once at the start of each transaction simulation (see api_function_ctx).
+        Requests outside of a transaction simulation might each observe a different block, they bypass the cache instead
+        of querying the block number for every single request.
+        """
+        return cfg.blockchain_state_cache and self.is_external is not None
+
     @staticmethod
     def __serialize_val(val: Any, bitwidth: int):
         if isinstance(val, AddressValue):
@@ -471,6 +576,8 @@ class ApiWrapper:
             self.current_all_index = 0
             self.current_priv_values.clear()
             self.update_special_variables(wei_amount)
+            if cfg.blockchain_state_cache:
+                self.__state_cache.sync(self.__conn.get_block_number())
         else:
             self.is_external = False
 
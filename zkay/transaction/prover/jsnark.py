@@ -1,16 +1,27 @@
 import os
+import threading
+from contextlib import contextmanager
 from subprocess import SubprocessError
 from tempfile import TemporaryDirectory
-from typing import List
+from typing import List, Tuple, ContextManager
 
 import zkay.jsnark_interface.jsnark_interface as jsnark
 import zkay.jsnark_interface.libsnark_interface as libsnark
+from zkay.config import cfg
+from zkay.jsnark_interface.prover_server import JsnarkProverServer
 from zkay.transaction.interface import ZkayProverInterface, ProofGenerationError
-from zkay.utils.helpers import hash_file
+from zkay.utils.helpers import hash_file_cached
 from zkay.utils.timer import time_measure
 
 
 class JsnarkProver(ZkayProverInterface):
+    def __init__(self, proving_scheme: str = None):
+        super().__init__(proving_scheme)
+        self.__servers: List[JsnarkProverServer] = []
+        self.__idle_servers: List[Tuple[str, JsnarkProverServer]] = []
+        """(circuit dir, server) for all servers which are not in use, least recently used first"""
+        self.__servers_cv = threading.Condition()
+
     def _generate_proof(self, verifier_dir: str, priv_values: List[int], in_vals: List[int], out_vals: List[int]) -> List[int]:
         args = list(map(int, in_vals + out_vals + priv_values))
 
@@ -19,8 +30,13 @@ class JsnarkProver(ZkayProverInterface):
             proof_path = os.path.join(tempd, 'proof.out')
             try:
                 with time_measure("jsnark_prepare_proof"):
-                    jsnark.prepare_proof(verifier_dir, tempd, args)
+                    if cfg.jsnark_prover_idle_timeout > 0:
+                        with self.__acquire_server(verifier_dir) as server:
+                            server.prepare_proof(tempd, args)
+                    else:
+                        jsnark.prepare_proof(verifier_dir, tempd, args)
 
+                # Separate process which loads the proving key for every proof (see jsnark_interface.prover_server)
                 with time_measure("libsnark_gen_proof"):
                     libsnark.generate_proof(verifier_dir, tempd, proof_path, self.proving_scheme)
             except SubprocessError as e:
@@ -31,5 +47,44 @@ class JsnarkProver(ZkayProverInterface):
         proof = list(map(lambda x: int(x, 0), proof_lines))
         return proof
 
+    @contextmanager
+    def __acquire_server(self, verifier_dir: str) -> ContextManager[JsnarkProverServer]:
+        """
+        Return a prover server for the given circuit which is not in use by another worker.
+
+        At most cfg.proof_generation_workers servers exist at the same time (each jvm gets an equal share of
+        cfg.proof_generation_memory_limit). If a new server is required, the least recently used idle server of another
+        circuit is shut down to make room for it, if all servers are in use, this waits until one is released.
+        """
+        verifier_dir = os.path.realpath(verifier_dir)
+        with self.__servers_cv:
+            while True:
+                server = next((s for d, s in reversed(self.__idle_servers) if d == verifier_dir), None)
+                if server is not None:
+                    self.__idle_servers.remove((verifier_dir, server))
+                    break
+                if len(self.__servers) < cfg.proof_generation_workers:
+                    server = JsnarkProverServer(verifier_dir)
+                    self.__servers.append(server)
+                    break
+                if self.__idle_servers:
+                    _, evicted = self.__idle_servers.pop(0)
+                    self.__servers.remove(evicted)
+                    evicted.shutdown()
+                    continue
+                self.__servers_cv.wait()
+        try:
+            yield server
+        finally:
+            with self.__servers_cv:
+                self.__idle_servers.append((verifier_dir, server))
+                self.__servers_cv.notify()
+
+    def shutdown(self):
+        super().shutdown()
+        with self.__servers_cv:
+            for server in self.__servers:
+                server.shutdown()
+
     def get_prover_key_hash(self, verifier_directory: str) -> bytes:
-        return hash_file(os.path.join(verifier_directory, 'proving.key'))
+        return hash_file_cached(os.path.join(verifier_directory, 'proving.key'))
@@ -54,6 +54,8 @@ class Runtime:
         Runtime.__blockchain = None
         Runtime.__crypto = None
         Runtime.__keystore = None
+        if Runtime.__prover is not None:
+            Runtime.__prover.shutdown()
         Runtime.__prover = None
 
     @staticmethod
@@ -5,6 +5,7 @@ This package contains helper functionality.
 Submodules
 ==========
 * :py:mod:`.helpers`: Miscellaneous operations (file reading, hashing, ...)
+* :py:mod:`.job_scheduler`: Thread pool which runs a DAG of jobs within a memory budget
 * :py:mod:`.multiline_formatter`: Helper class which makes heavy use of operator overloading to facilitate building multiline strings with different indentation levels.
 * :py:mod:`.progress_printer`: Context managers for printing before and after context execution, and for colored terminal output.
 * :py:mod:`.run_command`: Wrapper for executing arbitrary commands with captured output
@@ -1,6 +1,9 @@
 import os
 import re
 import hashlib
+import json
+import shutil
+import threading
 from typing import Optional, List
 from zkay.compiler.solidity.fake_solidity_generator import WS_PATTERN, ID_PATTERN
 
@@ -40,6 +43,74 @@ def hash_file(filename: str, chunk_size: int = 1 << 27) -> bytes:
     return digest[:32]
 
 
+def hash_file_cached(filename: str) -> bytes:
+    """
+    Return hash_file(filename), using a digest which was cached in the sidecar file <filename>.hash if possible.
+
+    The cached digest is only used as long as the size, modification time and inode of the file are unchanged.
+    """
+    st = os.stat(filename)
+    fingerprint = [st.st_size, st.st_mtime_ns, st.st_ino]
+    sidecar = f'{filename}.hash'
+    try:
+        with open(sidecar) as f:
+            cached = json.load(f)
+        if cached['fingerprint'] == fingerprint:
+            return bytes.fromhex(cached['hash'])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    digest = hash_file(filename)
+    try:
+        with open(f'{sidecar}.{os.getpid()}', 'w') as f:
+            json.dump({'fingerprint': fingerprint, 'hash': digest.hex()}, f)
+        os.replace(f'{sidecar}.{os.getpid()}', sidecar)
+    except OSError:
+        # Cache is optional (e.g. read-only directory)
+        pass
+    return digest
+
+
+def link_or_copy(src: str, dst: str):
+    """Atomically replace dst with a hard link to src (or with a copy of src, if linking fails)."""
+    tmp = f'{dst}.{os.getpid()}.{threading.get_ident()}'
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def evict_lru_files(directory: str, suffix: str, size_limit: int, keep: Optional[str] = None):
+    """
+    Remove the least recently modified files ending with suffix from directory (except keep), until their total size is
+    at most size_limit MiB.
+    """
+    entries = []
+    total_size = 0
+    try:
+        for entry in os.scandir(directory):
+            if not entry.name.endswith(suffix):
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, entry.path, stat.st_size))
+            total_size += stat.st_size
+    except OSError:
+        return
+
+    for _, path, size in sorted(entries):
+        if total_size <= size_limit << 20:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            # Already evicted by another process
+            pass
+        total_size -= size
+
+
 def without_extension(filename: str) -> str:
     ext_idx = filename.rfind('.')
     ext_idx = len(filename) if ext_idx == -1 else ext_idx
@@ -0,0 +1,121 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Union, Any
+
+
+class Job:
+    """A unit of work for the MemoryAwareScheduler."""
+
+    def __init__(self, name: str, fct: Callable[..., Any], memory: Union[int, Callable[[], int]], dependencies: List['Job'],
+                 pass_memory: bool = False, retry_memory: Optional[int] = None):
+        self.name = name
+        self.fct = fct
+        self.pass_memory = pass_memory
+        """If true, fct is called with admitted_memory as its only argument"""
+        self.memory = memory
+        """Estimated peak memory consumption in MiB (callable: evaluated when all dependencies are finished)"""
+        self.dependencies = dependencies
+        self.retry_memory = retry_memory
+        """If not None, a failed job which was admitted less memory is run once more with this much memory reserved"""
+        self.result: Any = None
+        self.admitted_memory: Optional[int] = None
+        """Memory reserved for this job while it is running"""
+        self.done = False
+
+
+class MemoryAwareScheduler:
+    """
+    Run a DAG of jobs in a thread pool, such that the estimated memory consumption of all running jobs stays within a budget.
+
+    Jobs are started in the order in which they were added, as soon as all their dependencies are finished and enough memory
+    is available. A job whose estimate exceeds the whole budget is started as soon as no other job is running.
+    The job functions are expected to spend most time in subprocesses (e.g. jsnark or libsnark), so threads are sufficient.
+    """
+
+    def __init__(self, max_workers: int, memory_limit: int):
+        """
+        :param max_workers: maximum number of jobs which run at the same time
+        :param memory_limit: memory budget in MiB
+        """
+        self.max_workers = max(max_workers, 1)
+        self.memory_limit = memory_limit
+        self.jobs: List[Job] = []
+
+        self._cv = threading.Condition()
+        self._running: List[Job] = []
+        self._used_memory = 0
+        self._error: Optional[BaseException] = None
+        self._pending: List[Job] = []
+
+    def add_job(self, name: str, fct: Callable[..., Any], memory: Union[int, Callable[[], int]],
+                dependencies: Optional[List[Job]] = None, pass_memory: bool = False, retry_memory: Optional[int] = None) -> Job:
+        """
+        Add a job, which runs fct once all dependencies are finished.
+
+        :param name: job name (for error messages)
+        :param fct: function to run, its return value is stored in the result field of the job
+        :param memory: estimated peak memory consumption in MiB, or a function which computes the estimate once the dependencies are finished
+        :param dependencies: jobs (added to the same scheduler) which need to finish before this job is started
+        :param pass_memory: if true, fct is called with the memory reserved for the job (in MiB), such that it can limit its
+                            subprocesses to the reservation
+        :param retry_memory: if the job fails while less than retry_memory MiB were reserved for it (i.e. its estimate was too
+                             low), it is queued again with retry_memory MiB reserved instead of failing the whole run
+        :return: the job object
+        """
+        job = Job(name, fct, memory, [] if dependencies is None else dependencies, pass_memory, retry_memory)
+        self.jobs.append(job)
+        return job
+
+    def run(self):
+        """
+        Run all jobs and wait until they are finished.
+
+        If a job raises an exception (and is not retried), no further jobs are started and the exception is re-raised once all
+        running jobs are finished.
+        """
+        self._pending = list(self.jobs)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            with self._cv:
+                while self._pending or self._running:
+                    if self._error is None:
+                        for job in list(self._pending):
+                            if len(self._running) >= self.max_workers:
+                                break
+                            if not all(dep.done for dep in job.dependencies):
+                                continue
+                            if job.admitted_memory is None:
+                                memory = job.memory() if callable(job.memory) else job.memory
+                                job.admitted_memory = max(min(memory, self.memory_limit), 0)
+                            if self._running and self._used_memory + job.admitted_memory > self.memory_limit:
+                                continue
+                            self._pending.remove(job)
+                            self._running.append(job)
+                            self._used_memory += job.admitted_memory
+                            executor.submit(self._run_job, job)
+                    elif not self._running:
+                        break
+                    self._cv.wait()
+
+        if self._error is not None:
+            raise self._error
+
+    def _run_job(self, job: Job):
+        error = None
+        try:
+            job.result = job.fct(job.admitted_memory) if job.pass_memory else job.fct()
+        except BaseException as e:
+            error = e
+        with self._cv:
+            self._running.remove(job)
+            self._used_memory -= job.admitted_memory
+            if isinstance(error, Exception) and job.retry_memory is not None \
+                    and job.admitted_memory < min(job.retry_memory, self.memory_limit):
+                # Retry with the larger reservation, admitted like any other job once enough memory is available
+                job.admitted_memory = min(job.retry_memory, self.memory_limit)
+                self._pending.insert(0, job)
+            elif error is not None:
+                if self._error is None:
+                    self._error = error
+            else:
+                job.done = True
+            self._cv.notify_all()
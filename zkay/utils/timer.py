@@ -8,13 +8,16 @@ from zkay.config import zk_print
 @contextlib.contextmanager
 def time_measure(key, should_print=False):
     start = time.time()
-    yield
-    end = time.time()
-    elapsed = end - start
-
-    if should_print:
-        zk_print(f"Took {elapsed} s")
-    my_logging.data(key, elapsed)
+    try:
+        yield
+    finally:
+        # Also log the time if the measured block raises
+        end = time.time()
+        elapsed = end - start
+
+        if should_print:
+            zk_print(f"Took {elapsed} s")
+        my_logging.data(key, elapsed)
 
 
 class Timer(object):
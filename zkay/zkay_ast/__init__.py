@@ -8,6 +8,7 @@ Submodules
 * :py:mod:`.ast.py`: Defines all AST elements
 * :py:mod:`.build_ast.py`: Parser wrapper, which manually constructs AST elements for which there is no 1:1 correspondence to the antlr parser output.
 * :py:mod:`.global_defs.py`: Definitions for globally accessible solidity builtin functions and variables.
+* :py:mod:`.parse_cache.py`: On-disk cache for parsed ASTs.
 * :py:mod:`.process_ast.py`: Takes a raw AST and performs pre-processing and type-checking.
 
 ===========
@@ -1,7 +1,12 @@
+from collections import OrderedDict
+from typing import TypeVar, Iterable, Callable, List, Dict, Set, Iterator, Tuple
+
 from zkay.zkay_ast.ast import ConstructorOrFunctionDefinition, FunctionCallExpr, BuiltinFunction, LocationExpr, \
-    ConstructorOrFunctionDefinition, ForStatement, WhileStatement
+    ConstructorOrFunctionDefinition, ForStatement, WhileStatement, SourceUnit
 from zkay.zkay_ast.visitor.function_visitor import FunctionVisitor
 
+T = TypeVar('T')
+
 
 def call_graph_analysis(ast):
     """
@@ -18,6 +23,58 @@ def call_graph_analysis(ast):
     v.visit(ast)
 
 
+def strongly_connected_components(nodes: Iterable[T], successors: Callable[[T], Iterable[T]]) -> List[List[T]]:
+    """
+    Compute the strongly connected components of a directed graph (Tarjan's algorithm, without recursion).
+
+    :param nodes: start nodes, all nodes reachable from them are part of the graph
+    :param successors: function which returns the successors of a node
+    :return: list of components in reverse topological order, i.e. every component comes after all components
+             which are reachable from it (for a call graph: callees before callers)
+    """
+    index: Dict[T, int] = {}
+    low: Dict[T, int] = {}
+    stack: List[T] = []
+    on_stack: Set[T] = set()
+    components: List[List[T]] = []
+
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work: List[Tuple[T, Iterator[T]]] = [(root, iter(successors(root)))]
+        while work:
+            node, succs = work[-1]
+            for succ in succs:
+                if succ not in index:
+                    # Descend into succ, continue with the remaining successors of node afterwards
+                    index[succ] = low[succ] = len(index)
+                    stack.append(succ)
+                    on_stack.add(succ)
+                    work.append((succ, iter(successors(succ))))
+                    break
+                elif succ in on_stack:
+                    low[node] = min(low[node], index[succ])
+            else:
+                work.pop()
+                if work:
+                    pred = work[-1][0]
+                    low[pred] = min(low[pred], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.remove(member)
+                        component.append(member)
+                        if member is node:
+                            break
+                    component.reverse()
+                    components.append(component)
+    return components
+
+
 class DirectCalledFunctionDetector(FunctionVisitor):
     def visitFunctionCallExpr(self, ast: FunctionCallExpr):
         if not isinstance(ast.func, BuiltinFunction) and not ast.is_cast:
@@ -37,18 +94,29 @@ class DirectCalledFunctionDetector(FunctionVisitor):
 
 
 class IndirectCalledFunctionDetector(FunctionVisitor):
-    def visitConstructorOrFunctionDefinition(self, ast: ConstructorOrFunctionDefinition):
-        # Fixed point iteration
-        size = 0
-        leaves = ast.called_functions
-        while len(ast.called_functions) > size:
-            size = len(ast.called_functions)
-            leaves = {fct: None for leaf in leaves for fct in leaf.called_functions if fct not in ast.called_functions}
-            ast.called_functions.update(leaves)
-
-        if ast in ast.called_functions:
-            ast.is_recursive = True
-            ast.has_static_body = False
+    """
+    Extend the directly called functions of every function to all transitively called functions.
+
+    The call graph is processed one strongly connected component at a time, callees before callers. All functions
+    of a component (transitively) call the same set of functions, and the called functions outside of the component
+    are already complete when the component is processed.
+    """
+
+    def visitSourceUnit(self, ast: SourceUnit):
+        fcts = [fct for c in ast.contracts for fct in c.constructor_definitions + c.function_definitions]
+        for component in strongly_connected_components(fcts, lambda fct: fct.called_functions):
+            members = set(component)
+            called = OrderedDict()
+            for fct in component:
+                called.update(fct.called_functions)
+            for fct in [fct for fct in called if fct not in members]:
+                called.update(fct.called_functions)
+
+            for fct in component:
+                fct.called_functions.update(called)
+                if fct in called:
+                    fct.is_recursive = True
+                    fct.has_static_body = False
 
 
 class IndirectDynamicBodyDetector(FunctionVisitor):
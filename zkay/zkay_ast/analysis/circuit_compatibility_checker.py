@@ -1,10 +1,11 @@
-from typing import Union
+from typing import Union, Optional
 
 from zkay.config import cfg
 from zkay.type_check.type_exceptions import TypeException
 from zkay.zkay_ast.ast import ConstructorOrFunctionDefinition, FunctionCallExpr, BuiltinFunction, LocationExpr, \
     Statement, AssignmentStatement, ReturnStatement, ReclassifyExpr, StatementList, Expression, FunctionTypeName, IfStatement, \
     NumberLiteralType, BooleanLiteralType, PrimitiveCastExpr, AST, IndexExpr
+from zkay.zkay_ast.pointers.symbol_table import ScopeIndex
 from zkay.zkay_ast.visitor.function_visitor import FunctionVisitor
 
 
@@ -80,6 +81,9 @@ class CircuitComplianceChecker(FunctionVisitor):
         self.priv_setter = PrivateSetter()
         self.inside_privif_stmt = False
 
+        # Scope index of the function which is currently checked (built on first use)
+        self.scope_index: Optional[ScopeIndex] = None
+
     @staticmethod
     def should_evaluate_public_expr_in_circuit(expr: Expression) -> bool:
         assert expr.annotated_type is not None
@@ -139,13 +143,15 @@ class CircuitComplianceChecker(FunctionVisitor):
     def visitIfStatement(self, ast: IfStatement):
         old_in_privif_stmt = self.inside_privif_stmt
         if ast.condition.annotated_type.is_private():
+            if self.scope_index is None or self.scope_index.root is not ast.function:
+                self.scope_index = ScopeIndex(ast.function)
             mod_vals = set(ast.then_branch.modified_values.keys())
             if ast.else_branch is not None:
                 mod_vals = mod_vals.union(ast.else_branch.modified_values)
             for val in mod_vals:
                 if not val.target.annotated_type.zkay_type.type_name.is_primitive_type():
                     raise TypeException('Writes to non-primitive type variables are not allowed inside private if statements', ast)
-                if val.in_scope_at(ast) and not ast.before_analysis.same_partition(val.privacy, Expression.me_expr()):
+                if val.in_scope_at(ast, self.scope_index) and not ast.before_analysis.same_partition(val.privacy, Expression.me_expr()):
                     raise TypeException('If statement with private condition must not contain side effects to variables with owner != me', ast)
             self.inside_privif_stmt = True
             self.priv_setter.set_evaluation(ast, evaluate_privately=True)
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import Set, Dict, Optional, Generic, TypeVar
+from typing import Set, Dict, Optional, Generic, TypeVar, Tuple
 
 T = TypeVar('T')
 
@@ -11,10 +11,17 @@ class PartitionState(Generic[T]):
     * insert: create a new partition with a single element
     * merge: merge partitions
     * ...
+
+    Each element is mapped to the index of its partition, such that lookups take constant time.
+    Merging moves the elements of the smaller partition into the larger one (union by size).
+    Partition sets are shared between copies and only cloned when a copy modifies them (copy-on-write).
     """
 
     def __init__(self):
         self._partitions: Dict[int, Set[T]] = {}
+        self._index: Dict[T, int] = {}
+        self._owned: Set[int] = set()
+        """Indices of the partitions whose sets are not shared with any other state"""
         self._next_unused = 0
 
     def insert(self, x):
@@ -23,8 +30,18 @@ class PartitionState(Generic[T]):
 
     def _insert_partition(self, p):
         self._partitions[self._next_unused] = p
+        self._owned.add(self._next_unused)
+        for x in p:
+            self._index[x] = self._next_unused
         self._next_unused += 1
 
+    def _get_mutable(self, key: int) -> Set[T]:
+        """Return the set of partition key, which may be modified in place."""
+        if key not in self._owned:
+            self._partitions[key] = set(self._partitions[key])
+            self._owned.add(key)
+        return self._partitions[key]
+
     def get_index(self, x: T) -> Optional[int]:
         """
         Return index for element x.
@@ -32,13 +49,10 @@ class PartitionState(Generic[T]):
         :param x:
         :return: the index of the partition containing x
         """
-        for k, p in self._partitions.items():
-            if x in p:
-                return k
-        return None
+        return self._index.get(x)
 
     def has(self, x: T) -> bool:
-        return self.get_index(x) is not None
+        return x in self._index
 
     def same_partition(self, x: T, y: T) -> bool:
         if x == y:
@@ -64,11 +78,18 @@ class PartitionState(Generic[T]):
             # merging not necessary
             return
 
+        # move the elements of the smaller partition
+        if len(self._partitions[xp_key]) < len(self._partitions[yp_key]):
+            xp_key, yp_key = yp_key, xp_key
+
         # remove y
         yp = self._partitions.pop(yp_key)
+        self._owned.discard(yp_key)
 
         # insert y
-        self._partitions[xp_key].update(yp)
+        self._get_mutable(xp_key).update(yp)
+        for e in yp:
+            self._index[e] = xp_key
 
     def remove(self, x: T):
         """
@@ -83,11 +104,13 @@ class PartitionState(Generic[T]):
         assert xp_key is not None, f'element {x} not found'
 
         # remove x
-        self._partitions[xp_key].remove(x)
-
-        # potentially remove whole partition
-        if len(self._partitions[xp_key]) == 0:
+        del self._index[x]
+        if len(self._partitions[xp_key]) == 1:
+            # remove whole partition
             del self._partitions[xp_key]
+            self._owned.discard(xp_key)
+        else:
+            self._get_mutable(xp_key).remove(x)
 
     def move_to(self, x: T, y: T):
         """
@@ -107,7 +130,8 @@ class PartitionState(Generic[T]):
         yp_key = self.get_index(y)
 
         # insert x
-        self._partitions[yp_key].add(x)
+        self._get_mutable(yp_key).add(x)
+        self._index[x] = yp_key
 
     def move_to_separate(self, x: T):
         """
@@ -148,21 +172,15 @@ class PartitionState(Generic[T]):
         s = PartitionState()
 
         # Collect all values
-        my_vals = frozenset([item for subset in self._partitions.values() for item in subset])
-        other_vals = frozenset([item for subset in other._partitions.values() for item in subset])
-        assert not my_vals.symmetric_difference(other_vals), 'joined branches do not contain the same values'
-        values_in_both = my_vals.intersection(other_vals)
-
-        new_parts = set()
-        for val in values_in_both:
-            my_part = self._partitions[self.get_index(val)]
-            other_part = other._partitions[other.get_index(val)]
+        assert self._index.keys() == other._index.keys(), 'joined branches do not contain the same values'
 
-            shared_elems = my_part.intersection(other_part)
-            new_parts.add(frozenset(shared_elems))
+        # Elements stay in the same partition if they share a partition in both states
+        new_parts: Dict[Tuple[int, int], Set[T]] = {}
+        for val, my_key in self._index.items():
+            new_parts.setdefault((my_key, other._index[val]), set()).add(val)
 
-        for part in new_parts:
-            s._insert_partition(set(part))
+        for part in new_parts.values():
+            s._insert_partition(part)
         return s
 
     def copy(self, project=None) -> PartitionState[T]:
@@ -174,11 +192,20 @@ class PartitionState(Generic[T]):
         """
         c = PartitionState()
         c._next_unused = self._next_unused
-        for k, p in self._partitions.items():
-            # shallow copy
-            kept = {x for x in p if project is None or x in project}
-            if len(kept) > 0:
-                c._partitions[k] = kept
+        if project is None:
+            # partition sets are shared until either state modifies them
+            c._partitions = dict(self._partitions)
+            c._index = dict(self._index)
+            self._owned.clear()
+        else:
+            for k, p in self._partitions.items():
+                # shallow copy
+                kept = {x for x in p if x in project}
+                if len(kept) > 0:
+                    c._partitions[k] = kept
+                    c._owned.add(k)
+                    for x in kept:
+                        c._index[x] = k
         return c
 
     def __str__(self):
@@ -1,9 +1,11 @@
-from typing import List, Union
+from collections import OrderedDict
+from typing import List, Union, Dict
 
 from zkay.type_check.type_exceptions import TypeException
+from zkay.zkay_ast.analysis.call_graph import strongly_connected_components
 from zkay.zkay_ast.ast import FunctionCallExpr, LocationExpr, AssignmentStatement, \
     AST, Expression, Statement, StateVariableDeclaration, BuiltinFunction, \
-    TupleExpr, InstanceTarget, VariableDeclaration, Parameter
+    TupleExpr, InstanceTarget, VariableDeclaration, Parameter, SourceUnit, ConstructorOrFunctionDefinition
 from zkay.zkay_ast.visitor.function_visitor import FunctionVisitor
 from zkay.zkay_ast.visitor.visitor import AstVisitor
 
@@ -16,8 +18,8 @@ def compute_modified_sets(ast: AST):
     v = DirectModificationDetector()
     v.visit(ast)
 
-    v = IndirectModificationDetector()
-    v.iterate_until_fixed_point(ast)
+    v = IndirectModificationDetector(v.called_functions)
+    v.visit(ast)
 
 
 def check_for_undefined_behavior_due_to_eval_order(ast: AST):
@@ -46,6 +48,16 @@ class SideEffectsDetector(AstVisitor):
 
 
 class DirectModificationDetector(FunctionVisitor):
+    def __init__(self):
+        super().__init__()
+        self.called_functions: 'Dict[ConstructorOrFunctionDefinition, OrderedDict[ConstructorOrFunctionDefinition, None]]' = {}
+        """Maps function -> directly called functions (call graph)"""
+
+    def visitFunctionCallExpr(self, ast: FunctionCallExpr):
+        self.visitAST(ast)
+        if isinstance(ast.func, LocationExpr) and not ast.is_cast:
+            self.called_functions.setdefault(ast.statement.function, OrderedDict())[ast.func.target] = None
+
     def visitAssignmentStatement(self, ast: AssignmentStatement):
         self.visitAST(ast)
         self.collect_modified_values(ast, ast.lhs)
@@ -78,43 +90,60 @@ class DirectModificationDetector(FunctionVisitor):
 
 
 class IndirectModificationDetector(FunctionVisitor):
-    def __init__(self):
+    """
+    Add the state variables which are read and modified by called functions to the call sites.
+
+    Every function is visited exactly once. The call graph is processed one strongly connected component at a time,
+    callees before callers, such that the read and modified values of all called functions are already complete when a
+    function is visited. Within a component of (mutually) recursive functions, all functions access the same state,
+    which is added to all of them before they are visited.
+    """
+
+    def __init__(self, called_functions: 'Dict[ConstructorOrFunctionDefinition, OrderedDict[ConstructorOrFunctionDefinition, None]]'):
+        """
+        :param called_functions: maps function -> directly called functions, as collected by DirectModificationDetector
+        """
         super().__init__()
-        self.fixed_point_reached = True
+        self.called_functions = called_functions
+
+    def visitSourceUnit(self, ast: SourceUnit):
+        fcts = [fct for c in ast.contracts for fct in c.constructor_definitions + c.function_definitions]
+        successors = lambda fct: self.called_functions.get(fct, ())
+        for component in strongly_connected_components(fcts, successors):
+            head = component[0]
+            if len(component) > 1 or head in successors(head):
+                members = set(component)
+                for fct in component[1:]:
+                    self.add_state_values(head, fct)
+                for fct in component:
+                    for called_fct in successors(fct):
+                        if called_fct not in members:
+                            self.add_state_values(head, called_fct)
+                for fct in component[1:]:
+                    self.add_state_values(fct, head)
+
+            for fct in component:
+                self.visit(fct)
 
-    def iterate_until_fixed_point(self, ast):
-        while True:
-            self.visit(ast)
-            if self.fixed_point_reached:
-                break
-            else:
-                self.fixed_point_reached = True
+    @staticmethod
+    def add_state_values(ast: AST, fdef: AST):
+        """Add the state variables read and modified by fdef to the read and modified values of ast."""
+        # for now no reference types -> only state could have been modified
+        ast.read_values.update({v for v in fdef.read_values if isinstance(v.target, StateVariableDeclaration)})
+        for v in fdef.modified_values:
+            if isinstance(v.target, StateVariableDeclaration):
+                ast.modified_values[v] = None
 
     def visitFunctionCallExpr(self, ast: FunctionCallExpr):
         self.visitAST(ast)
         if isinstance(ast.func, LocationExpr):
-            # for now no reference types -> only state could have been modified
-            fdef = ast.func.target
-            rlen = len(ast.read_values)
-            ast.read_values.update({v for v in fdef.read_values if isinstance(v.target, StateVariableDeclaration)})
-            self.fixed_point_reached &= rlen == len(ast.read_values)
-
-            # update modified values if any
-            mlen = len(ast.modified_values)
-            for v in fdef.modified_values:
-                if isinstance(v.target, StateVariableDeclaration):
-                    ast.modified_values[v] = None
-            self.fixed_point_reached &= mlen == len(ast.modified_values)
+            self.add_state_values(ast, ast.func.target)
 
     def visitAST(self, ast: AST):
-        mlen = len(ast.modified_values)
-        rlen = len(ast.read_values)
         for child in ast.children():
             self.visit(child)
             ast.modified_values.update(child.modified_values)
             ast.read_values.update(child.read_values)
-        self.fixed_point_reached &= mlen == len(ast.modified_values)
-        self.fixed_point_reached &= rlen == len(ast.read_values)
 
 
 class EvalOrderUBChecker(AstVisitor):
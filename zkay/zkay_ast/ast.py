@@ -867,6 +867,9 @@ class StatementList(Statement):
         self.statements = statements
         self.excluded_from_simulation = excluded_from_simulation
 
+        # Maps id(statement) -> position in statements, updated lazily by index_of
+        self._statement_positions: Dict[int, int] = {}
+
         # Special case, if processing a statement returns a list of statements,
         # all statements will be integrated into this block
 
@@ -884,6 +887,20 @@ class StatementList(Statement):
     def __getitem__(self, key: int) -> Statement:
         return self.statements[key]
 
+    def index_of(self, stmt: Statement) -> int:
+        """
+        Return the position of stmt in this statement list (in constant time as long as the list does not change).
+
+        :raise ValueError: if stmt is not contained in this statement list
+        """
+        idx = self._statement_positions.get(id(stmt))
+        if idx is None or idx >= len(self.statements) or self.statements[idx] is not stmt:
+            self._statement_positions = {id(s): i for i, s in enumerate(self.statements)}
+            idx = self._statement_positions.get(id(stmt))
+            if idx is None:
+                raise ValueError('Statement is not contained in statement list')
+        return idx
+
     def __contains__(self, stmt: Statement):
         if stmt in self.statements:
             return True
@@ -1897,7 +1914,14 @@ class InstanceTarget(tuple):
             else:
                 t.value_type.privacy_annotation.privacy_annotation_label()
 
-    def in_scope_at(self, ast: AST) -> bool:
+    def in_scope_at(self, ast: AST, scope_index=None) -> bool:
+        """
+        Check whether the target is in scope at ast.
+
+        :param scope_index: optional ScopeIndex of a subtree which contains ast, to avoid walking the parent pointers
+        """
+        if scope_index is not None:
+            return scope_index.in_scope_at(self.target.idf, ast)
         from zkay.zkay_ast.pointers.symbol_table import SymbolTableLinker
         return SymbolTableLinker.in_scope_at(self.target.idf, ast)
 
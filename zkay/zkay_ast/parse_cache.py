@@ -0,0 +1,99 @@
+"""
+On-disk cache for the ASTs produced by :py:func:`zkay.zkay_ast.build_ast.build_ast`.
+
+Parsing with the python antlr runtime dominates the runtime of short zkay invocations. Parsed (but not yet processed)
+ASTs are therefore pickled to cfg.data_dir/parse_cache, keyed by a hash of the source code, the zkay version, the
+configuration options which influence parsing and the sources of the AST classes and the parser. The least recently used
+ASTs are evicted when the cache exceeds cfg.parse_cache_size_limit.
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+from typing import Optional
+
+from zkay.config import cfg
+from zkay.utils.helpers import evict_lru_files
+from zkay.zkay_ast.ast import SourceUnit
+from zkay.zkay_ast.build_ast import build_ast
+
+_format_digest: Optional[bytes] = None
+
+
+def _get_format_digest() -> bytes:
+    """Return a digest of everything besides the code which determines the AST returned by build_ast."""
+    global _format_digest
+    if _format_digest is None:
+        import zkay.zkay_ast.ast as ast_module
+        import zkay.zkay_ast.build_ast as build_ast_module
+        import zkay.solidity_parser.emit as emit_module
+        import zkay.solidity_parser.parse as parse_module
+        import zkay.solidity_parser.generated.SolidityParser as parser_module
+
+        digest = hashlib.sha256()
+        digest.update(f'{cfg.zkay_version}\0{cfg.reserved_name_prefix}\0{cfg.reserved_conflict_resolution_suffix}\0'.encode())
+        for module in [ast_module, build_ast_module, emit_module, parse_module, parser_module]:
+            with open(module.__file__, 'rb') as f:
+                digest.update(f.read())
+        _format_digest = digest.digest()
+    return _format_digest
+
+
+def get_cache_file(code: str) -> str:
+    """Return the path of the cache file for code."""
+    digest = hashlib.sha256(_get_format_digest())
+    digest.update(str(code).encode())
+    return os.path.join(cfg.data_dir, 'parse_cache', f'{digest.hexdigest()}.pickle')
+
+
+def build_ast_cached(code: str) -> SourceUnit:
+    """
+    Same as build_ast, but reuse the AST from a previous invocation with the same code if cfg.parse_cache is enabled.
+
+    Every call returns a new AST object.
+
+    :raise SyntaxException: if code cannot be parsed (errors are not cached)
+    """
+    if not cfg.parse_cache:
+        return build_ast(code)
+
+    cache_file = get_cache_file(code)
+    try:
+        with open(cache_file, 'rb') as f:
+            ast = pickle.load(f)
+    except FileNotFoundError:
+        pass
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+        # Corrupt or incompatible cache file
+        _remove(cache_file)
+    else:
+        if isinstance(ast, SourceUnit):
+            # Mark as recently used
+            try:
+                os.utime(cache_file)
+            except OSError:
+                pass
+            return ast
+        _remove(cache_file)
+
+    ast = build_ast(code)
+    tmp_file = f'{cache_file}.{os.getpid()}.{threading.get_ident()}'
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(ast, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except (OSError, pickle.PicklingError, RecursionError):
+        # Cache is optional (e.g. read-only data directory or too deeply nested AST)
+        _remove(tmp_file)
+    else:
+        evict_lru_files(os.path.dirname(cache_file), '.pickle', cfg.parse_cache_size_limit, keep=cache_file)
+    return ast
+
+
+def _remove(filename: str):
+    try:
+        os.remove(filename)
+    except OSError:
+        pass
@@ -1,9 +1,10 @@
-from typing import Tuple, Dict, Union
+from bisect import bisect_right
+from typing import Tuple, Dict, Union, Optional, Set, List
 
 from zkay.zkay_ast.ast import AST, SourceUnit, ContractDefinition, VariableDeclaration, \
     SimpleStatement, IdentifierExpr, Block, Mapping, Identifier, Comment, MemberAccessExpr, IndexExpr, LocationExpr, \
     StructDefinition, UserDefinedTypeName, StatementList, Array, ConstructorOrFunctionDefinition, EnumDefinition, \
-    EnumValue, NamespaceDefinition, TargetDefinition, VariableDeclarationStatement, ForStatement, IdentifierDeclaration
+    EnumValue, NamespaceDefinition, TargetDefinition, VariableDeclarationStatement, ForStatement, IdentifierDeclaration, Statement
 from zkay.zkay_ast.global_defs import GlobalDefs, GlobalVars, array_length_member
 from zkay.zkay_ast.pointers.pointer_exceptions import UnknownIdentifierException
 from zkay.zkay_ast.visitor.visitor import AstVisitor
@@ -24,6 +25,17 @@ def link_identifiers(ast):
     link_symbol_table(ast)
 
 
+def link_fragment_identifiers(ast):
+    """
+    Link the identifiers of a fragment which was inserted into an already linked AST (the parent of ast must be set).
+
+    Names which are not declared within the fragment are resolved only once for the entire fragment.
+    """
+    fill_symbol_table(ast)
+    v = SymbolTableLinker(fragment=ast)
+    v.visit(ast)
+
+
 def merge_dicts(*dict_args):
     """
     Given any number of dicts, shallow copy and merge into a new dict.
@@ -106,8 +118,160 @@ class SymbolTableFiller(AstVisitor):
             ast.names = {ast.key_label.name: ast.key_label}
 
 
+class ScopeIndex:
+    """
+    Scope map of a linked function, which allows to resolve names without walking the parent pointers up to the declaration.
+
+    The root and all statements below it are numbered in pre-order once, such that the statements within the subtree of
+    a numbered node n are exactly the ones numbered from pre(n) to end(n). For every name, the declaring scopes (numbered
+    nodes whose symbol table contains the name) are stored sorted by their pre-order number. Within a function, all scopes
+    except the ones of a few non-statement nodes are statements, and statements are nested within statements only.
+
+    Any other node is located via its anchor, the innermost numbered node which contains it. Resolving a reference is then
+    a binary search over the declaring scopes followed by interval checks. Since statements are numbered in program
+    order, a declaration statement precedes a reference iff the anchor of the reference is numbered after its subtree.
+
+    The index must be rebuilt when the subtree is modified.
+    """
+
+    def __init__(self, root: AST):
+        self.root = root
+        self._pre: Dict[int, int] = {}
+        """Maps id of numbered node -> pre-order number"""
+        self._nodes: List[AST] = []
+        """Maps pre-order number -> numbered node"""
+        self._end: List[int] = []
+        """Maps pre-order number -> largest pre-order number within the subtree"""
+        self._scopes: Dict[str, Tuple[List[int], List[Identifier]]] = {}
+        """Maps name -> (sorted pre-order numbers of the declaring scopes, corresponding identifiers)"""
+        self._idf_scopes: Dict[int, int] = {}
+        """Maps id of declared identifier -> pre-order number of the declaring scope"""
+        self._outer_decls: Dict[str, Union[TargetDefinition, Mapping]] = {}
+        """Declarations of names which are not declared within root (valid for all references in the subtree)"""
+        self._outer_in_scope: Dict[int, Optional[bool]] = {}
+        """Maps id of identifier which is not declared by a numbered scope -> whether it is in scope within root (None if declared below root)"""
+
+        self._number(root)
+
+    def _number(self, ast: AST):
+        pre = len(self._nodes)
+        self._pre[id(ast)] = pre
+        self._nodes.append(ast)
+        self._end.append(pre)
+        if ast.names and isinstance(ast.names, dict):
+            for name, idf in ast.names.items():
+                pres, idfs = self._scopes.setdefault(name, ([], []))
+                pres.append(pre)
+                idfs.append(idf)
+                self._idf_scopes[id(idf)] = pre
+        for c in ast.children():
+            if isinstance(c, Statement):
+                self._number(c)
+        self._end[pre] = len(self._nodes) - 1
+
+    def _anchor(self, ast: AST, name: str) -> Optional[int]:
+        """
+        Return the pre-order number of the innermost numbered ancestor of ast.
+
+        :return: None if ast is not within root, or if a non-numbered ancestor in between declares name
+        """
+        anc = ast.parent
+        while anc is not None:
+            pre = self._pre.get(id(anc))
+            if pre is not None and self._nodes[pre] is anc:
+                return pre
+            if name in anc.names:
+                return None
+            anc = anc.parent
+        return None
+
+    def find_identifier_declaration(self, ast: IdentifierExpr) -> Union[TargetDefinition, Mapping]:
+        """Same as SymbolTableLinker.find_identifier_declaration, for an IdentifierExpr within the indexed subtree."""
+        name = ast.idf.name
+        pre = self._anchor(ast, name)
+        if pre is None:
+            return SymbolTableLinker.find_identifier_declaration(ast)
+        end = self._end
+
+        # Declaring scopes which contain the anchor, innermost first
+        pres, idfs = self._scopes.get(name, ((), ()))
+        i = bisect_right(pres, pre) - 1
+        while i >= 0:
+            scope_pre, decl = pres[i], idfs[i].parent
+            i -= 1
+            if pre > end[scope_pre]:
+                # Not an ancestor of ast
+                continue
+
+            stmt = decl.parent if isinstance(decl.parent, VariableDeclarationStatement) else None
+            if stmt is not None:
+                stmt_pre = self._pre.get(id(stmt))
+                if stmt_pre is None:
+                    return SymbolTableLinker.find_identifier_declaration(ast)
+                if stmt_pre <= pre <= end[stmt_pre]:
+                    # Declared names are not available within the declaration statement
+                    continue
+                if pre < stmt_pre and isinstance(self._nodes[scope_pre], (ForStatement, Block)) and isinstance(decl, VariableDeclaration):
+                    if pre != scope_pre:
+                        # Reference comes before the declaration statement
+                        continue
+                    if not isinstance(self._nodes[pre], ForStatement):
+                        return SymbolTableLinker.find_identifier_declaration(ast)
+                    # The only non-statement part of a for statement is the condition, which comes after the initialization
+            elif isinstance(self._nodes[scope_pre], (ForStatement, Block)) and isinstance(decl, VariableDeclaration):
+                return SymbolTableLinker.find_identifier_declaration(ast)
+            return decl
+
+        # Not declared within the indexed subtree
+        if name not in self._outer_decls:
+            try:
+                self._outer_decls[name] = SymbolTableLinker._find_declaration(self.root, name)
+            except UnknownIdentifierException:
+                # Report error at the reference
+                return SymbolTableLinker.find_identifier_declaration(ast)
+        return self._outer_decls[name]
+
+    def in_scope_at(self, target_idf: Identifier, ast: AST) -> bool:
+        """Same as SymbolTableLinker.in_scope_at, for an ast node within the indexed subtree."""
+        key = id(target_idf)
+        scope_pre = self._idf_scopes.get(key)
+        if scope_pre is None:
+            if key not in self._outer_in_scope:
+                decl = target_idf.parent
+                if decl is not None and self.root.is_parent_of(decl):
+                    # Declared by a non-numbered node below root
+                    self._outer_in_scope[key] = None
+                else:
+                    # Same result for all nodes in the subtree
+                    self._outer_in_scope[key] = SymbolTableLinker.in_scope_at(target_idf, self.root)
+            in_scope = self._outer_in_scope[key]
+            return SymbolTableLinker.in_scope_at(target_idf, ast) if in_scope is None else in_scope
+
+        pre = self._pre.get(id(ast))
+        if pre is not None and self._nodes[pre] is ast:
+            # Scopes only contain the names for their descendants
+            return scope_pre < pre <= self._end[scope_pre]
+        pre = self._anchor(ast, target_idf.name)
+        if pre is None:
+            return SymbolTableLinker.in_scope_at(target_idf, ast)
+        return scope_pre <= pre <= self._end[scope_pre]
+
+
 class SymbolTableLinker(AstVisitor):
 
+    def __init__(self, fragment: Optional[AST] = None):
+        super().__init__()
+        self._fragment = fragment
+
+        # Names declared anywhere within the fragment (computed on first use)
+        self._fragment_names: Optional[Set[str]] = None
+
+        # Maps names which are not declared within the fragment -> declaration (None if it has to be resolved per reference)
+        self._outer_decls: Dict[str, Optional[Union[TargetDefinition, Mapping]]] = {}
+
+        # Maps function -> scope index of the function (built on first use)
+        self._scope_indices: Dict[ConstructorOrFunctionDefinition, ScopeIndex] = {}
+
     @staticmethod
     def _find_next_decl(ast: AST, name: str) -> Tuple[AST, TargetDefinition]:
         ancestor = ast.parent
@@ -145,19 +309,50 @@ class SymbolTableLinker(AstVisitor):
     def find_type_declaration(t: UserDefinedTypeName) -> NamespaceDefinition:
         return SymbolTableLinker._find_next_decl(t, t.names[0].name)[1]
 
+    @staticmethod
+    def _index_of(lca: Union[ForStatement, StatementList], stmt: AST) -> int:
+        return lca.index_of(stmt) if isinstance(lca, StatementList) else lca.statements.index(stmt)
+
     @staticmethod
     def find_identifier_declaration(ast: IdentifierExpr) -> Union[TargetDefinition, Mapping]:
-        name = ast.idf.name
+        return SymbolTableLinker._find_declaration(ast, ast.idf.name)
+
+    @staticmethod
+    def _find_declaration(ast: AST, name: str) -> Union[TargetDefinition, Mapping]:
         while True:
             anc, decl = SymbolTableLinker._find_next_decl(ast, name)
             if isinstance(anc, (ForStatement, Block)) and isinstance(decl, VariableDeclaration):
                 # Check if identifier really references this declaration (does not come before declaration)
                 lca, ref_anchor, decl_anchor = SymbolTableLinker._find_lca(ast, decl, anc)
-                if lca.statements.index(ref_anchor) <= lca.statements.index(decl_anchor):
+                if SymbolTableLinker._index_of(lca, ref_anchor) <= SymbolTableLinker._index_of(lca, decl_anchor):
                     ast = anc
                     continue
             return decl
 
+    def _find_fragment_identifier_declaration(self, ast: IdentifierExpr) -> Union[TargetDefinition, Mapping]:
+        name = ast.idf.name
+        if self._fragment_names is None:
+            self._fragment_names = set()
+            self._collect_names(self._fragment)
+
+        if name not in self._fragment_names:
+            # The lookup does not stop within the fragment, so all references in the fragment resolve to the same declaration
+            if name not in self._outer_decls:
+                try:
+                    decl = self._find_declaration(self._fragment, name)
+                    self._outer_decls[name] = None if self._fragment.is_parent_of(decl) else decl
+                except UnknownIdentifierException:
+                    self._outer_decls[name] = None
+            if self._outer_decls[name] is not None:
+                return self._outer_decls[name]
+        return self.find_identifier_declaration(ast)
+
+    def _collect_names(self, ast: AST):
+        if isinstance(ast.names, dict):
+            self._fragment_names.update(ast.names.keys())
+        for c in ast.children():
+            self._collect_names(c)
+
     @staticmethod
     def in_scope_at(target_idf: Identifier, ast: AST) -> bool:
         ancestor = ast.parent
@@ -169,7 +364,18 @@ class SymbolTableLinker(AstVisitor):
         return False
 
     def visitIdentifierExpr(self, ast: IdentifierExpr):
-        decl = self.find_identifier_declaration(ast)
+        if self._fragment is not None:
+            decl = self._find_fragment_identifier_declaration(ast)
+        elif ast.statement is not None and ast.statement.function is not None and ast.statement.parent is not ast.statement.function.body:
+            # References in nested statements are resolved via the scope index of the function (top level statements
+            # are only few parent pointers away from all declarations). The scope index checks that ast is really
+            # within the function, in case the statement pointers are outdated.
+            fct = ast.statement.function
+            if fct not in self._scope_indices:
+                self._scope_indices[fct] = ScopeIndex(fct)
+            decl = self._scope_indices[fct].find_identifier_declaration(ast)
+        else:
+            decl = self.find_identifier_declaration(ast)
         ast.target = decl
         assert (ast.target is not None)
 
@@ -16,7 +16,7 @@ from zkay.zkay_ast.analysis.loop_checker import check_loops
 from zkay.zkay_ast.analysis.return_checker import check_return as r
 from zkay.zkay_ast.analysis.side_effects import compute_modified_sets, check_for_undefined_behavior_due_to_eval_order
 from zkay.zkay_ast.ast import AST, SourceUnit, AstException
-from zkay.zkay_ast.build_ast import build_ast
+from zkay.zkay_ast.parse_cache import build_ast_cached
 from zkay.zkay_ast.pointers.parent_setter import set_parents
 from zkay.zkay_ast.pointers.pointer_exceptions import UnknownIdentifierException
 from zkay.zkay_ast.pointers.symbol_table import link_identifiers as link
@@ -25,7 +25,7 @@ from zkay.zkay_ast.pointers.symbol_table import link_identifiers as link
 def get_parsed_ast_and_fake_code(code, solc_check=True) -> Tuple[AST, str]:
     with print_step("Parsing"):
         try:
-            ast = build_ast(code)
+            ast = build_ast_cached(code)
         except SyntaxException as e:
             raise ZkaySyntaxError(f'\n\nSYNTAX ERROR: {e}')
 
@@ -1,29 +1,35 @@
 import inspect
-from typing import TypeVar
+from typing import TypeVar, Dict, Tuple, FrozenSet, Optional, Set
 
-from zkay.zkay_ast.ast import AST, Expression, Statement, UserDefinedTypeName
+from zkay.zkay_ast.ast import AST, Expression, Statement, UserDefinedTypeName, Identifier, LiteralExpr, ArrayLiteralExpr, \
+    ElementaryTypeName, IdentifierExpr, MemberAccessExpr, LocationExpr, SourceUnit, NamespaceDefinition, \
+    ConstructorOrFunctionDefinition, StatementList, SimpleStatement, ForStatement, Block
 from zkay.zkay_ast.pointers.parent_setter import set_parents
-from zkay.zkay_ast.pointers.symbol_table import link_identifiers
+from zkay.zkay_ast.pointers.symbol_table import link_fragment_identifiers, fill_symbol_table
 from zkay.zkay_ast.visitor.visitor import AstVisitor
 
 T = TypeVar('T')
 
 
-def deep_copy(ast: T, with_types=False, with_analysis=False) -> T:
+def deep_copy(ast: T, with_types=False, with_analysis=False, share_immutable=False) -> T:
     """
 
     :param ast:
     :param with_types: (optional)
+    :param with_analysis: (optional)
+    :param share_immutable: (optional) if True, literal expressions, elementary type names and identifiers which do not
+                            declare a name are not cloned but shared with `ast`. Shared nodes keep their original parent,
+                            so this may only be used when neither tree is modified in place afterwards.
     :return: a deep copy of `ast`
 
-    Only parents and identifiers are updated in the returned ast (e.g., inferred types are not preserved)
+    Only parents and identifiers are updated in the returned ast (e.g., inferred types are not preserved).
+    They are derived from `ast` during copying, so `ast` must have been processed by set_parents and link_identifiers.
     """
     assert isinstance(ast, AST)
-    v = DeepCopyVisitor(with_types, with_analysis)
+    v = DeepCopyVisitor(with_types, with_analysis, share_immutable)
     ast_copy = v.visit(ast)
     ast_copy.parent = ast.parent
-    set_parents(ast_copy)
-    link_identifiers(ast_copy)
+    v.link_copy(ast, ast_copy)
     return ast_copy
 
 
@@ -42,7 +48,7 @@ def _replace_ast(old_ast: AST, new_ast: AST):
     DeepCopyVisitor.copy_ast_fields(old_ast, new_ast)
     if old_ast.parent is not None:
         set_parents(new_ast)
-        link_identifiers(new_ast)
+        link_fragment_identifiers(new_ast)
 
 
 class DeepCopyVisitor(AstVisitor):
@@ -72,6 +78,7 @@ class DeepCopyVisitor(AstVisitor):
         '_size_in_bits',
         'signed',
         '_annotated_type',
+        '_statement_positions',
 
         # Function stuff
         'called_functions',
@@ -95,10 +102,21 @@ class DeepCopyVisitor(AstVisitor):
         'value_type'
     }
 
-    def __init__(self, with_types, with_analysis):
+    references = {
+        # Constructor arguments which reference other ast nodes instead of children (updated when linking the copy)
+        'target',
+    }
+
+    def __init__(self, with_types, with_analysis, share_immutable=False):
         super().__init__('node-or-children')
         self.with_types = with_types
         self.with_analysis = with_analysis
+        self.share_immutable = share_immutable
+
+        self._copies: Dict[int, AST] = {}
+        """Maps id of original ast -> copy"""
+        self._shared: Set[int] = set()
+        """Ids of shared (not copied) ast nodes"""
 
     @staticmethod
     def copy_ast_fields(ast, ast_copy):
@@ -109,17 +127,17 @@ class DeepCopyVisitor(AstVisitor):
 
     def visitChildren(self, ast):
         c = ast.__class__
-        args_names = inspect.getfullargspec(c.__init__).args[1:]
+        args_names, known_fields = _get_copy_fields(c)
         new_fields = {}
         for arg_name in args_names:
             old_field = getattr(ast, arg_name)
-            new_fields[arg_name] = self.copy_field(old_field)
+            new_fields[arg_name] = old_field if arg_name in self.references else self.copy_field(old_field)
 
-        for k in ast.__dict__.keys():
-            if k not in new_fields and k not in self.setting_later and k not in inspect.getfullargspec(c.__bases__[0].__init__).args[1:]:
-                raise ValueError("Not copying", k)
+        if not known_fields.issuperset(ast.__dict__.keys()):
+            raise ValueError("Not copying", next(k for k in ast.__dict__.keys() if k not in known_fields))
         ast_copy = c(**new_fields)
         self.copy_ast_fields(ast, ast_copy)
+        self._copies[id(ast)] = ast_copy
         return ast_copy
 
     def visitAnnotatedTypeName(self, ast):
@@ -127,11 +145,6 @@ class DeepCopyVisitor(AstVisitor):
         ast_copy.had_privacy_annotation = ast.had_privacy_annotation
         return ast_copy
 
-    def visitUserDefinedTypeName(self, ast: UserDefinedTypeName):
-        ast_copy = self.visitChildren(ast)
-        ast_copy.target = ast.target
-        return ast_copy
-
     def visitBuiltinFunction(self, ast):
         ast_copy = self.visitChildren(ast)
         ast_copy.is_private = ast.is_private
@@ -157,5 +170,93 @@ class DeepCopyVisitor(AstVisitor):
             return field
         elif isinstance(field, list):
             return [self.copy_field(e) for e in field]
+        elif self.share_immutable and self._is_immutable(field):
+            self._shared.add(id(field))
+            return field
         else:
             return self.visit(field)
+
+    @staticmethod
+    def _is_immutable(ast: AST) -> bool:
+        if isinstance(ast, LiteralExpr):
+            return not isinstance(ast, ArrayLiteralExpr)
+        elif type(ast) is Identifier:
+            # Declared identifiers are referenced by the symbol table of the copy
+            return isinstance(ast.parent, (IdentifierExpr, MemberAccessExpr, UserDefinedTypeName))
+        else:
+            return isinstance(ast, ElementaryTypeName)
+
+    def _get_copy(self, ast: Optional[AST]) -> Optional[AST]:
+        return self._copies.get(id(ast), ast)
+
+    def link_copy(self, ast: AST, ast_copy: AST):
+        """
+        Link the parents and identifiers of a copy created by this visitor, as set_parents and link_identifiers would.
+
+        Instead of resolving all identifiers again, references to nodes inside the copied subtree are redirected to the
+        corresponding copies, while references to nodes outside of it are kept.
+
+        :param ast: the original ast
+        :param ast_copy: the copy of ast, whose parent was already set
+        """
+        # Root of the copy, its parent is outside of the copied subtree
+        if isinstance(ast_copy, SourceUnit):
+            ast_copy.namespace = []
+        elif isinstance(ast_copy, NamespaceDefinition):
+            ast_copy.namespace = ([] if ast_copy.parent is None else ast_copy.parent.namespace) + [ast_copy.idf]
+        stmt, fct = ast_copy.parent, ast_copy.parent
+        while stmt is not None and not isinstance(stmt, Statement):
+            stmt = stmt.parent
+        while fct is not None and not isinstance(fct, ConstructorOrFunctionDefinition):
+            fct = fct.parent
+
+        # Names declared by the root of the copy might have been moved to the enclosing scope of the original
+        may_be_moved = isinstance(ast.parent, (StatementList, SimpleStatement, ForStatement)) and not isinstance(ast, (Block, ForStatement))
+        self._link_subtree(ast, ast_copy, stmt, fct)
+        if may_be_moved:
+            fill_symbol_table(ast_copy)
+
+    def _link_subtree(self, ast: AST, ast_copy: AST, stmt: Optional[Statement], fct: Optional[ConstructorOrFunctionDefinition]):
+        if isinstance(ast_copy, Statement):
+            if fct is not None:
+                ast_copy.function = fct
+            stmt = ast_copy
+        elif isinstance(ast_copy, Expression) and stmt is not None:
+            ast_copy.statement = stmt
+        if isinstance(ast_copy, ConstructorOrFunctionDefinition):
+            fct = ast_copy
+
+        if isinstance(ast.names, dict):
+            ast_copy.names = {name: self._get_copy(idf) for name, idf in ast.names.items()}
+
+        for c, c_copy in zip(ast.children(), ast_copy.children()):
+            if id(c_copy) in self._shared:
+                continue
+            c_copy.parent = ast_copy
+            c_copy.namespace = ast_copy.namespace
+            if isinstance(c_copy, NamespaceDefinition):
+                c_copy.namespace = ast_copy.namespace + [c_copy.idf]
+            self._link_subtree(c, c_copy, stmt, fct)
+
+        if isinstance(ast_copy, (LocationExpr, UserDefinedTypeName)):
+            ast_copy.target = self._get_copy(ast.target)
+
+
+_copy_fields: Dict[type, Tuple[Tuple[str, ...], FrozenSet[str]]] = {}
+"""Maps AST class -> (names of constructor arguments, names of all fields which may be set)"""
+
+
+def _get_copy_fields(c: type) -> Tuple[Tuple[str, ...], FrozenSet[str]]:
+    """
+    Return the names of the constructor arguments of AST class c and the names of all fields which may be set on c.
+
+    Computed only once per class.
+    """
+    try:
+        return _copy_fields[c]
+    except KeyError:
+        args_names = tuple(inspect.getfullargspec(c.__init__).args[1:])
+        base_args_names = inspect.getfullargspec(c.__bases__[0].__init__).args[1:]
+        known_fields = frozenset(args_names).union(DeepCopyVisitor.setting_later, base_args_names)
+        _copy_fields[c] = args_names, known_fields
+        return _copy_fields[c]
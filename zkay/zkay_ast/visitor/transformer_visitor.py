@@ -1,6 +1,7 @@
 from typing import List, TypeVar
 
 from zkay.zkay_ast.ast import AST
+from zkay.zkay_ast.visitor.visitor import lookup_visit_function
 
 T = TypeVar('T')
 
@@ -35,15 +36,9 @@ class AstTransformerVisitor:
         return self.get_visit_function(ast.__class__)(ast)
 
     def get_visit_function(self, c):
-        visitor_function = 'visit' + c.__name__
-        if hasattr(self, visitor_function):
-            return getattr(self, visitor_function)
-        else:
-            for base in c.__bases__:
-                f = self.get_visit_function(base)
-                if f:
-                    return f
-        assert False
+        f = lookup_visit_function(self.__class__, c)
+        assert f is not None
+        return f.__get__(self, self.__class__)
 
     def visitAST(self, ast: AST):
         return self.visit_children(ast)
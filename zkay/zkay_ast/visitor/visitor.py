@@ -1,3 +1,40 @@
+from typing import Dict, Optional, Any
+
+_dispatch_tables: Dict[type, Dict[type, Optional[Any]]] = {}
+"""Maps visitor class -> (AST class -> visit function descriptor or None), shared by all visitor instances"""
+
+
+def lookup_visit_function(visitor_cls: type, c: type) -> Optional[Any]:
+    """
+    Return the (unbound) visit function of visitor_cls for AST class c.
+
+    The visit function is the one named 'visit' + the name of the most derived class in the mro of c for which a visit
+    function is defined. The result is computed only once per pair of classes. If visit functions are added to a
+    visitor class at runtime, clear_dispatch_tables must be called.
+
+    :return: function descriptor (bind with __get__) or None if there is no matching visit function
+    """
+    table = _dispatch_tables.setdefault(visitor_cls, {})
+    try:
+        return table[c]
+    except KeyError:
+        pass
+
+    f = None
+    for base in c.__mro__:
+        visitor_function = 'visit' + base.__name__
+        f = next((vc.__dict__[visitor_function] for vc in visitor_cls.__mro__ if visitor_function in vc.__dict__), None)
+        if f is not None:
+            break
+    table[c] = f
+    return f
+
+
+def clear_dispatch_tables():
+    """Invalidate the cached visit functions of all visitor classes."""
+    _dispatch_tables.clear()
+
+
 class AstVisitor:
 
     def __init__(self, traversal='post', log=False):
@@ -30,15 +67,8 @@ class AstVisitor:
             return None
 
     def get_visit_function(self, c):
-        visitor_function = 'visit' + c.__name__
-        if hasattr(self, visitor_function):
-            return getattr(self, visitor_function)
-        else:
-            for base in c.__bases__:
-                f = self.get_visit_function(base)
-                if f:
-                    return f
-        return None
+        f = lookup_visit_function(self.__class__, c)
+        return None if f is None else f.__get__(self, self.__class__)
 
     def visitChildren(self, ast):
         for c in ast.children():
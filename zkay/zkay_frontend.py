@@ -10,12 +10,12 @@ import sys
 import tempfile
 import zipfile
 from contextlib import contextmanager
-from copy import deepcopy
 from typing import Tuple, List, Type, Dict, Optional, Any, ContextManager
 
 from zkay import my_logging
 from zkay.compiler.privacy import library_contracts
 from zkay.compiler.privacy.circuit_generation.backends.jsnark_generator import JsnarkGenerator
+from zkay.compiler.privacy.circuit_generation.circuit_cost import CircuitCost
 from zkay.compiler.privacy.circuit_generation.circuit_generator import CircuitGenerator
 from zkay.compiler.privacy.circuit_generation.circuit_helper import CircuitHelper
 from zkay.compiler.privacy.manifest import Manifest
@@ -24,7 +24,7 @@ from zkay.compiler.privacy.proving_scheme.backends.gm17 import ProvingSchemeGm17
 from zkay.compiler.privacy.proving_scheme.backends.groth16 import ProvingSchemeGroth16
 from zkay.compiler.privacy.proving_scheme.proving_scheme import ProvingScheme
 from zkay.compiler.privacy.transformation.zkay_contract_transformer import transform_ast
-from zkay.compiler.solidity.compiler import check_compilation
+from zkay.compiler.solidity.compiler import check_compilation, check_compilation_of_files
 from zkay.config import cfg
 from zkay.utils.helpers import read_file, lines_of_code, without_extension
 from zkay.utils.progress_printer import print_step
@@ -98,18 +98,21 @@ def compile_zkay(code: str, output_dir: str, import_keys: bool = False, **kwargs
     # Type checking
     zkay_ast = get_processed_ast(code)
 
-    # Contract transformation
+    # Verification contract names are derived from the untransformed ast
+    verifier_names = get_verification_contract_names(zkay_ast)
+
+    # Contract transformation (in place, the processed ast is not needed anymore)
     with print_step("Transforming zkay -> public contract"):
-        ast, circuits = transform_ast(deepcopy(zkay_ast))
+        ast, circuits = transform_ast(zkay_ast)
 
-    # Dump libraries
+    # Dump libraries (they are checked together with the other contracts below)
     with print_step("Write library contract files"):
         with cfg.library_compilation_environment():
             # Write pki contract
-            _dump_to_output(library_contracts.get_pki_contract(), output_dir, f'{cfg.pki_contract_name}.sol', dryrun_solc=True)
+            _dump_to_output(library_contracts.get_pki_contract(), output_dir, f'{cfg.pki_contract_name}.sol')
 
             # Write library contract
-            _dump_to_output(library_contracts.get_verify_libs_code(), output_dir, ProvingScheme.verify_libs_contract_filename, dryrun_solc=True)
+            _dump_to_output(library_contracts.get_verify_libs_code(), output_dir, ProvingScheme.verify_libs_contract_filename)
 
     # Write public contract file
     with print_step('Write public solidity code'):
@@ -129,7 +132,6 @@ def compile_zkay(code: str, output_dir: str, import_keys: bool = False, **kwargs
 
     if 'verifier_names' in kwargs:
         assert isinstance(kwargs['verifier_names'], list)
-        verifier_names = get_verification_contract_names(zkay_ast)
         assert sorted(verifier_names) == sorted([cc.verifier_contract_type.code() for cc in cg.circuits_to_prove])
         kwargs['verifier_names'][:] = verifier_names[:]
 
@@ -140,6 +142,10 @@ def compile_zkay(code: str, output_dir: str, import_keys: bool = False, **kwargs
                 Manifest.zkay_version: cfg.zkay_version,
                 Manifest.solc_version: cfg.solc_version,
                 Manifest.zkay_options: cfg.export_compiler_settings(),
+                Manifest.contract_hash: Manifest.get_contract_hash(code),
+                Manifest.verifier_names: verifier_names,
+                Manifest.shared_verifiers: {circ.get_verification_contract_name(): rep.get_verification_contract_name()
+                                            for circ, rep in cg.get_shared_circuits().items()},
             }
             _dump_to_output(json.dumps(manifest), output_dir, 'manifest.json')
     elif not os.path.exists(os.path.join(output_dir, 'manifest.json')):
@@ -148,14 +154,29 @@ def compile_zkay(code: str, output_dir: str, import_keys: bool = False, **kwargs
     # Generate circuits and corresponding verification contracts
     cg.generate_circuits(import_keys=import_keys)
 
-    # Check that all verification contracts and the main contract compile
-    main_solidity_files = cg.get_verification_contract_filenames() + [os.path.join(output_dir, output_filename)]
-    for f in main_solidity_files:
-        check_compilation(f, show_errors=False)
+    # Check that the libraries, all verification contracts and the main contract compile (in a single solc job)
+    library_files = [os.path.join(output_dir, f'{cfg.pki_contract_name}.sol'), os.path.join(output_dir, ProvingScheme.verify_libs_contract_filename)]
+    main_solidity_files = library_files + cg.get_verification_contract_filenames() + [os.path.join(output_dir, output_filename)]
+    check_compilation_of_files(main_solidity_files)
 
     return cg, solidity_code_output
 
 
+def estimate_circuit_costs(code: str) -> Dict[str, CircuitCost]:
+    """
+    Parse, type-check and transform the given zkay code and estimate the size of its proof circuits, without compiling them.
+
+    :param code: zkay code
+    :return: dict which maps the names of all functions which require a proof ('Contract.function') to their estimated circuit size
+    :raise ZkayCompilerError: if type checking fails
+    """
+    _, circuits = transform_ast(get_processed_ast(code))
+
+    # Same preparation as during compilation, nothing is written to the output directory
+    cg = generator_classes[cfg.snark_backend](list(circuits.values()), proving_scheme_classes[cfg.proving_scheme](), os.curdir)
+    return {f'{c.fct.parent.idf.name}.{c.fct.name}': cost for c, cost in cg.estimate_circuit_costs().items()}
+
+
 def use_configuration_from_manifest(contract_dir: str) -> Any:
     from zkay.transaction.runtime import Runtime
     manifest = Manifest.load(contract_dir)
@@ -277,8 +298,7 @@ def _collect_package_contents(contract_dir: str, check_all_files: bool) -> List[
     manifest = Manifest.load(contract_dir)
 
     files = ['contract.zkay', 'manifest.json']
-    with open(zkay_filename) as f:
-        verifier_names = get_verification_contract_names(f.read())
+    verifier_names = Manifest.get_verifier_names(contract_dir)
     with Manifest.with_manifest_config(manifest):
         gen_cls = generator_classes[cfg.snark_backend]
         files += [os.path.join(cfg.get_circuit_output_dir_name(v), k)